@@ -0,0 +1,261 @@
+-- V10__outbox_partitioned_consumers.sql
+USE [OpsGraph];
+GO
+
+-- Stable partition per aggregate: every event of one aggregate lands in the same partition
+IF NOT EXISTS (
+    SELECT 1 FROM sys.columns
+    WHERE object_id = OBJECT_ID('app.Outbox')
+    AND name = 'partition_id'
+)
+BEGIN
+    ALTER TABLE app.Outbox
+    ADD partition_id AS CAST(ABS(CAST(CHECKSUM(aggregate, aggregate_id) AS BIGINT)) % 64 AS INT) PERSISTED;
+END;
+GO
+
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE object_id = OBJECT_ID('app.Outbox')
+    AND name = 'IX_Outbox_PendingByPartition'
+)
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Outbox_PendingByPartition
+    ON app.Outbox(partition_id, event_id)
+    INCLUDE (aggregate, aggregate_id, next_attempt_at)
+    WHERE published = 0;
+END;
+GO
+
+-- Rows that are claimed in flight or backing off; used for reclaim and ordering checks
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE object_id = OBJECT_ID('app.Outbox')
+    AND name = 'IX_Outbox_Scheduled'
+)
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Outbox_Scheduled
+    ON app.Outbox(aggregate, aggregate_id, event_id)
+    INCLUDE (partition_id, published, next_attempt_at)
+    WHERE next_attempt_at IS NOT NULL;
+END;
+GO
+
+-- One lease row per partition
+IF OBJECT_ID('app.OutboxConsumerLeases','U') IS NULL
+CREATE TABLE app.OutboxConsumerLeases (
+    partition_id INT NOT NULL PRIMARY KEY,
+    owner_id NVARCHAR(100) NULL,
+    lease_expires_at DATETIME2(3) NULL,
+    heartbeat_at DATETIME2(3) NULL
+);
+GO
+
+INSERT INTO app.OutboxConsumerLeases (partition_id)
+SELECT n.partition_id
+FROM (
+    SELECT TOP (64) ROW_NUMBER() OVER (ORDER BY (SELECT NULL)) - 1 AS partition_id
+    FROM sys.all_objects
+) n
+WHERE NOT EXISTS (
+    SELECT 1 FROM app.OutboxConsumerLeases l WHERE l.partition_id = n.partition_id
+);
+GO
+
+-- Consumer registry: every consumer heartbeats here whether or not it holds a
+-- lease, so a newly started one counts towards the fair share at once
+IF OBJECT_ID('app.OutboxConsumers','U') IS NULL
+CREATE TABLE app.OutboxConsumers (
+    owner_id NVARCHAR(100) NOT NULL PRIMARY KEY,
+    heartbeat_at DATETIME2(3) NOT NULL
+);
+GO
+
+-- Heartbeat: register the caller, renew its leases, then move towards a fair
+-- share of partitions. Live consumers are those that heartbeated within the
+-- lease period, so running consumers hand back their excess on their next
+-- heartbeat after a new one registers, and the new one picks it up on its next.
+CREATE OR ALTER PROCEDURE app.usp_Outbox_RenewLeases
+    @owner_id NVARCHAR(100),
+    @lease_seconds INT = 60
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+    DECLARE @expires DATETIME2(3) = DATEADD(SECOND, @lease_seconds, @now);
+    DECLARE @partitions INT, @live INT, @share INT, @owned INT;
+
+    BEGIN TRAN;
+
+    UPDATE app.OutboxConsumers
+    SET heartbeat_at = @now
+    WHERE owner_id = @owner_id;
+    IF @@ROWCOUNT = 0
+        INSERT INTO app.OutboxConsumers (owner_id, heartbeat_at) VALUES (@owner_id, @now);
+
+    -- Forget consumers long gone
+    DELETE FROM app.OutboxConsumers
+    WHERE heartbeat_at < DATEADD(SECOND, -10 * @lease_seconds, @now);
+
+    UPDATE app.OutboxConsumerLeases
+    SET lease_expires_at = @expires,
+        heartbeat_at = @now
+    WHERE owner_id = @owner_id;
+    SET @owned = @@ROWCOUNT;
+
+    SELECT @partitions = COUNT(*) FROM app.OutboxConsumerLeases;
+
+    SELECT @live = COUNT(*)
+    FROM app.OutboxConsumers
+    WHERE heartbeat_at > DATEADD(SECOND, -@lease_seconds, @now);
+    IF @live < 1 SET @live = 1;
+
+    SET @share = CEILING(@partitions * 1.0 / @live);
+
+    IF @owned > @share
+    BEGIN
+        -- Hand back the excess; in-flight rows stay claimed so ordering is preserved
+        WITH excess AS (
+            SELECT TOP (@owned - @share) partition_id, owner_id, lease_expires_at, heartbeat_at
+            FROM app.OutboxConsumerLeases
+            WHERE owner_id = @owner_id
+            ORDER BY partition_id DESC
+        )
+        UPDATE excess
+        SET owner_id = NULL,
+            lease_expires_at = NULL,
+            heartbeat_at = NULL;
+    END
+    ELSE IF @owned < @share
+    BEGIN
+        WITH free AS (
+            SELECT TOP (@share - @owned) partition_id, owner_id, lease_expires_at, heartbeat_at
+            FROM app.OutboxConsumerLeases WITH (UPDLOCK, READPAST)
+            WHERE owner_id IS NULL
+            OR lease_expires_at IS NULL
+            OR lease_expires_at <= @now
+            ORDER BY partition_id
+        )
+        UPDATE free
+        SET owner_id = @owner_id,
+            lease_expires_at = @expires,
+            heartbeat_at = @now;
+    END;
+
+    COMMIT TRAN;
+
+    SELECT partition_id
+    FROM app.OutboxConsumerLeases
+    WHERE owner_id = @owner_id
+    ORDER BY partition_id;
+END;
+GO
+
+-- Dequeue from owned partitions only, keeping each aggregate in event order.
+-- A row is skipped while an earlier row of its aggregate is backing off or claimed in flight.
+-- Rows are claimed until @claim_seconds from now; a claim left behind by a dead consumer
+-- expires and the row is delivered again (at-least-once).
+CREATE OR ALTER PROCEDURE app.usp_Outbox_DequeuePartitioned
+    @owner_id NVARCHAR(100),
+    @batch_size INT = 100,
+    @claim_seconds INT = 60
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+
+    BEGIN TRAN;
+    WITH owned AS (
+        SELECT partition_id
+        FROM app.OutboxConsumerLeases
+        WHERE owner_id = @owner_id
+        AND lease_expires_at > @now
+    ),
+    cte AS (
+        SELECT TOP (@batch_size) o.event_id
+        FROM app.Outbox o WITH (UPDLOCK, READPAST)
+        JOIN owned ON o.partition_id = owned.partition_id
+        WHERE (
+            (o.published = 0 AND (o.next_attempt_at IS NULL OR o.next_attempt_at <= @now))
+            OR (o.published = 1 AND o.next_attempt_at <= @now)
+        )
+        AND NOT EXISTS (
+            SELECT 1
+            FROM app.Outbox prior
+            WHERE prior.aggregate = o.aggregate
+            AND prior.aggregate_id = o.aggregate_id
+            AND prior.event_id < o.event_id
+            AND prior.next_attempt_at > @now
+        )
+        ORDER BY o.event_id
+    )
+    UPDATE o
+    SET published = 1,
+        next_attempt_at = DATEADD(SECOND, @claim_seconds, @now)
+    OUTPUT inserted.*
+    FROM app.Outbox o
+    JOIN cte ON o.event_id = cte.event_id;
+    COMMIT TRAN;
+END
+GO
+
+-- Long-poll, optionally limited to the partitions a consumer owns
+CREATE OR ALTER PROCEDURE app.usp_Outbox_WaitForWork
+    @timeout_ms INT = 20000,
+    @check_ms INT = 250,
+    @owner_id NVARCHAR(100) = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @deadline DATETIME2(3) = DATEADD(MILLISECOND, @timeout_ms, SYSUTCDATETIME());
+    DECLARE @delay CHAR(12) = CONVERT(CHAR(12), DATEADD(MILLISECOND, @check_ms, CAST('00:00:00' AS TIME(3))), 114);
+
+    WHILE 1 = 1
+    BEGIN
+        IF @owner_id IS NULL AND EXISTS (
+            SELECT 1
+            FROM app.Outbox WITH (READPAST)
+            WHERE published = 0
+            AND (next_attempt_at IS NULL OR next_attempt_at <= SYSUTCDATETIME())
+        )
+        BEGIN
+            SELECT CAST(1 AS BIT) AS has_work;
+            RETURN;
+        END;
+
+        IF @owner_id IS NOT NULL AND EXISTS (
+            SELECT 1
+            FROM app.Outbox o WITH (READPAST)
+            JOIN app.OutboxConsumerLeases l ON l.partition_id = o.partition_id
+            WHERE l.owner_id = @owner_id
+            AND l.lease_expires_at > SYSUTCDATETIME()
+            AND (
+                (o.published = 0 AND (o.next_attempt_at IS NULL OR o.next_attempt_at <= SYSUTCDATETIME()))
+                OR (o.published = 1 AND o.next_attempt_at <= SYSUTCDATETIME())
+            )
+            AND NOT EXISTS (
+                SELECT 1
+                FROM app.Outbox prior
+                WHERE prior.aggregate = o.aggregate
+                AND prior.aggregate_id = o.aggregate_id
+                AND prior.event_id < o.event_id
+                AND prior.next_attempt_at > SYSUTCDATETIME()
+            )
+        )
+        BEGIN
+            SELECT CAST(1 AS BIT) AS has_work;
+            RETURN;
+        END;
+
+        IF SYSUTCDATETIME() >= @deadline
+            BREAK;
+
+        WAITFOR DELAY @delay;
+    END;
+
+    SELECT CAST(0 AS BIT) AS has_work;
+END;
+GO
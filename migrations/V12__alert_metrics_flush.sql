@@ -0,0 +1,106 @@
+-- V12__alert_metrics_flush.sql
+USE [OpsGraph];
+GO
+
+-- Number of timings behind avg_processing_time_ms, so flushed deltas can be averaged in
+IF NOT EXISTS (
+    SELECT 1 FROM sys.columns
+    WHERE object_id = OBJECT_ID('app.AlertProcessingMetrics')
+    AND name = 'processing_samples'
+)
+BEGIN
+    ALTER TABLE app.AlertProcessingMetrics
+    ADD processing_samples INT NOT NULL DEFAULT 0;
+END;
+GO
+
+-- Periodic flush from the alert poller's in-process aggregator.
+-- @Metrics: JSON array of per source/hour deltas
+--   {"source_id", "processing_date", "processing_hour", "received", "processed",
+--    "failed", "throttled", "duplicated", "processing_samples",
+--    "processing_ms_sum", "processing_ms_max"}
+-- @Health: JSON array of current poll health per changed source
+--   {"source_id", "error_count", "last_error_at", "last_successful_poll_at",
+--    "avg_response_time_ms"}
+CREATE OR ALTER PROCEDURE app.usp_AlertMetrics_Flush
+    @Metrics NVARCHAR(MAX),
+    @Health NVARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    BEGIN TRANSACTION;
+
+    MERGE app.AlertProcessingMetrics WITH (HOLDLOCK) AS t
+    USING (
+        SELECT *
+        FROM OPENJSON(@Metrics) WITH (
+            source_id INT '$.source_id',
+            processing_date DATE '$.processing_date',
+            processing_hour INT '$.processing_hour',
+            received INT '$.received',
+            processed INT '$.processed',
+            failed INT '$.failed',
+            throttled INT '$.throttled',
+            duplicated INT '$.duplicated',
+            processing_samples INT '$.processing_samples',
+            processing_ms_sum BIGINT '$.processing_ms_sum',
+            processing_ms_max INT '$.processing_ms_max'
+        )
+    ) AS s
+    ON t.source_id = s.source_id
+    AND t.processing_date = s.processing_date
+    AND t.processing_hour = s.processing_hour
+    WHEN MATCHED THEN UPDATE SET
+        alerts_received = t.alerts_received + s.received,
+        alerts_processed = t.alerts_processed + s.processed,
+        alerts_failed = t.alerts_failed + s.failed,
+        alerts_throttled = t.alerts_throttled + s.throttled,
+        alerts_duplicated = t.alerts_duplicated + s.duplicated,
+        avg_processing_time_ms = CASE
+            WHEN t.processing_samples + s.processing_samples = 0 THEN t.avg_processing_time_ms
+            ELSE (CAST(ISNULL(t.avg_processing_time_ms, 0) AS BIGINT) * t.processing_samples + s.processing_ms_sum)
+                 / (t.processing_samples + s.processing_samples)
+        END,
+        max_processing_time_ms = CASE
+            WHEN s.processing_samples = 0 THEN t.max_processing_time_ms
+            WHEN t.max_processing_time_ms IS NULL OR s.processing_ms_max > t.max_processing_time_ms THEN s.processing_ms_max
+            ELSE t.max_processing_time_ms
+        END,
+        processing_samples = t.processing_samples + s.processing_samples
+    WHEN NOT MATCHED THEN INSERT (
+        source_id, processing_date, processing_hour,
+        alerts_received, alerts_processed, alerts_failed, alerts_throttled, alerts_duplicated,
+        avg_processing_time_ms, max_processing_time_ms, processing_samples
+    ) VALUES (
+        s.source_id, s.processing_date, s.processing_hour,
+        s.received, s.processed, s.failed, s.throttled, s.duplicated,
+        CASE WHEN s.processing_samples > 0 THEN s.processing_ms_sum / s.processing_samples END,
+        CASE WHEN s.processing_samples > 0 THEN s.processing_ms_max END,
+        s.processing_samples
+    );
+
+    UPDATE ms
+    SET error_count = h.error_count,
+        health_status = CASE
+            WHEN h.error_count = 0 THEN 'Healthy'
+            WHEN h.error_count >= 3 THEN 'Failed'
+            ELSE 'Degraded'
+        END,
+        last_error_at = ISNULL(h.last_error_at, ms.last_error_at),
+        last_successful_poll_at = ISNULL(h.last_successful_poll_at, ms.last_successful_poll_at),
+        last_poll_at = ISNULL(h.last_successful_poll_at, ms.last_poll_at),
+        avg_response_time_ms = ISNULL(h.avg_response_time_ms, ms.avg_response_time_ms)
+    FROM app.MonitorSources ms
+    JOIN OPENJSON(@Health) WITH (
+        source_id INT '$.source_id',
+        error_count INT '$.error_count',
+        last_error_at DATETIME2(3) '$.last_error_at',
+        last_successful_poll_at DATETIME2(3) '$.last_successful_poll_at',
+        avg_response_time_ms INT '$.avg_response_time_ms'
+    ) h ON h.source_id = ms.source_id;
+
+    COMMIT TRANSACTION;
+END;
+GO
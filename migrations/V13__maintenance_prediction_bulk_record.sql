@@ -0,0 +1,170 @@
+-- V13__maintenance_prediction_bulk_record.sql
+USE [OpsGraph];
+GO
+
+-- Record one predictor run in a single call.
+-- @Predictions is a JSON array of
+--   {"asset_id", "rule_id", "predicted_failure_at", "confidence_score",
+--    "contributing_factors" (JSON object), "create_ticket" (bool)}
+-- Predictions flagged create_ticket are linked to a preventive maintenance
+-- ticket for their asset: an open one if it exists, otherwise one new ticket
+-- per asset created here (with its asset link, graph mirror and outbox event).
+CREATE OR ALTER PROCEDURE app.usp_MaintenancePredictions_BulkRecord
+    @Predictions NVARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @CategoryId INT = (SELECT category_id FROM app.Categories WHERE name = 'Preventive Maintenance');
+
+    CREATE TABLE #Incoming (
+        ordinal INT NOT NULL PRIMARY KEY,
+        asset_id INT NOT NULL,
+        rule_id INT NOT NULL,
+        predicted_failure_at DATETIME2(3) NOT NULL,
+        confidence_score DECIMAL(5,2) NOT NULL,
+        contributing_factors NVARCHAR(MAX) NULL,
+        create_ticket BIT NOT NULL,
+        prediction_id INT NULL
+    );
+
+    CREATE TABLE #AssetTickets (
+        asset_id INT NOT NULL PRIMARY KEY,
+        ticket_id INT NULL,
+        is_new BIT NOT NULL DEFAULT 0
+    );
+
+    INSERT INTO #Incoming (
+        ordinal, asset_id, rule_id, predicted_failure_at,
+        confidence_score, contributing_factors, create_ticket
+    )
+    SELECT
+        CAST(j.[key] AS INT),
+        p.asset_id,
+        p.rule_id,
+        p.predicted_failure_at,
+        p.confidence_score,
+        p.contributing_factors,
+        ISNULL(p.create_ticket, 0)
+    FROM OPENJSON(@Predictions) j
+    CROSS APPLY OPENJSON(j.[value]) WITH (
+        asset_id INT '$.asset_id',
+        rule_id INT '$.rule_id',
+        predicted_failure_at DATETIME2(3) '$.predicted_failure_at',
+        confidence_score DECIMAL(5,2) '$.confidence_score',
+        contributing_factors NVARCHAR(MAX) '$.contributing_factors' AS JSON,
+        create_ticket BIT '$.create_ticket'
+    ) p;
+
+    BEGIN TRANSACTION;
+
+    -- MERGE rather than INSERT so OUTPUT can map each new prediction_id back to its input row
+    DECLARE @Inserted TABLE (ordinal INT NOT NULL, prediction_id INT NOT NULL);
+
+    MERGE app.MaintenancePredictions AS t
+    USING #Incoming AS s
+    ON 1 = 0
+    WHEN NOT MATCHED THEN INSERT (
+        asset_id, rule_id, predicted_failure_at, confidence_score, contributing_factors
+    ) VALUES (
+        s.asset_id, s.rule_id, s.predicted_failure_at, s.confidence_score, s.contributing_factors
+    )
+    OUTPUT s.ordinal, inserted.prediction_id INTO @Inserted (ordinal, prediction_id);
+
+    UPDATE i
+    SET prediction_id = x.prediction_id
+    FROM #Incoming i
+    JOIN @Inserted x ON x.ordinal = i.ordinal;
+
+    -- One ticket per asset; reuse an open preventive maintenance ticket where there is one
+    INSERT INTO #AssetTickets (asset_id, ticket_id)
+    SELECT
+        i.asset_id,
+        (
+            SELECT TOP 1 t.ticket_id
+            FROM app.TicketAssets ta
+            JOIN app.Tickets t ON t.ticket_id = ta.ticket_id
+            WHERE ta.asset_id = i.asset_id
+            AND t.category_id = @CategoryId
+            AND t.status IN ('Open', 'In Progress', 'Pending')
+            ORDER BY t.created_at DESC
+        )
+    FROM #Incoming i
+    WHERE i.create_ticket = 1
+    GROUP BY i.asset_id;
+
+    DECLARE @NewTickets TABLE (asset_id INT NOT NULL PRIMARY KEY, ticket_id INT NOT NULL);
+
+    MERGE app.Tickets AS t
+    USING (
+        SELECT at.asset_id, a.site_id, a.type, a.model
+        FROM #AssetTickets at
+        JOIN app.Assets a ON a.asset_id = at.asset_id
+        WHERE at.ticket_id IS NULL
+    ) AS s
+    ON 1 = 0
+    WHEN NOT MATCHED THEN INSERT (
+        status, severity, category_id, summary, site_id
+    ) VALUES (
+        'Open', 4, @CategoryId,
+        LEFT(CONCAT(N'Predictive Maintenance Required - ', s.type, N' ', s.model, N' #', s.asset_id), 240),
+        s.site_id
+    )
+    OUTPUT s.asset_id, inserted.ticket_id INTO @NewTickets (asset_id, ticket_id);
+
+    UPDATE at
+    SET ticket_id = n.ticket_id,
+        is_new = 1
+    FROM #AssetTickets at
+    JOIN @NewTickets n ON n.asset_id = at.asset_id;
+
+    INSERT INTO app.TicketAssets (ticket_id, asset_id)
+    SELECT ticket_id, asset_id FROM @NewTickets;
+
+    INSERT INTO app.TicketStatusHistory (ticket_id, old_status, new_status, changed_by, note)
+    SELECT ticket_id, 'Open', 'Open', NULL, N'Created by predictive maintenance'
+    FROM @NewTickets;
+
+    -- Mirror to kg.Ticket and kg.RELATES_TO
+    INSERT INTO kg.Ticket (ticket_id, status, created_at, severity, category, summary)
+    SELECT t.ticket_id, t.status, t.created_at, t.severity, ISNULL(c.name, N'Preventive Maintenance'), t.summary
+    FROM @NewTickets n
+    JOIN app.Tickets t ON t.ticket_id = n.ticket_id
+    LEFT JOIN app.Categories c ON c.category_id = t.category_id;
+
+    INSERT INTO kg.RELATES_TO ($from_id, $to_id)
+    SELECT kt.$node_id, ka.$node_id
+    FROM @NewTickets n
+    JOIN kg.Ticket kt ON kt.ticket_id = n.ticket_id
+    JOIN kg.Asset ka ON ka.asset_id = n.asset_id;
+
+    -- Outbox
+    INSERT INTO app.Outbox (aggregate, aggregate_id, type, payload)
+    SELECT
+        'ticket',
+        t.ticket_id,
+        'ticket.created',
+        (
+            SELECT t.ticket_id, t.site_id, t.status, t.severity, t.category_id, t.summary,
+                   JSON_QUERY(CONCAT('[', n.asset_id, ']')) AS asset_ids
+            FOR JSON PATH, WITHOUT_ARRAY_WRAPPER
+        )
+    FROM @NewTickets n
+    JOIN app.Tickets t ON t.ticket_id = n.ticket_id;
+
+    UPDATE mp
+    SET ticket_id = at.ticket_id
+    FROM app.MaintenancePredictions mp
+    JOIN #Incoming i ON i.prediction_id = mp.prediction_id
+    JOIN #AssetTickets at ON at.asset_id = i.asset_id
+    WHERE i.create_ticket = 1;
+
+    COMMIT TRANSACTION;
+
+    SELECT
+        (SELECT COUNT(*) FROM #Incoming) AS predictions_recorded,
+        (SELECT COUNT(*) FROM #AssetTickets WHERE is_new = 1) AS tickets_created,
+        (SELECT COUNT(*) FROM #AssetTickets WHERE is_new = 0) AS tickets_reused;
+END;
+GO
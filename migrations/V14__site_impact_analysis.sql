@@ -0,0 +1,163 @@
+-- V14__site_impact_analysis.sql
+USE [OpsGraph];
+GO
+
+-- Change tracking for incremental readers (impact analysis, maintenance predictor)
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Events_Rowversion' AND object_id = OBJECT_ID('app.Events'))
+    CREATE NONCLUSTERED INDEX IX_Events_Rowversion ON app.Events(rowversion) INCLUDE (asset_id);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Tickets_Rowversion' AND object_id = OBJECT_ID('app.Tickets'))
+    CREATE NONCLUSTERED INDEX IX_Tickets_Rowversion ON app.Tickets(rowversion);
+GO
+
+-- Set-based impact analysis for a whole site, or for the listed assets of a site.
+-- @asset_ids: optional JSON array of asset ids; NULL analyses every asset of the site.
+-- Tickets are matched to assets through app.TicketAssets; the business impact
+-- score follows the highest ticket severity (5 = 100, 4 = 75, 3 = 50, 2 = 25,
+-- else 10) and downstream dependencies count the assets in zones adjacent
+-- (kg.ADJACENT_TO, either direction) to the asset's zone.
+CREATE OR ALTER PROCEDURE app.usp_AnalyzeSiteImpact
+    @site_id INT,
+    @asset_ids NVARCHAR(MAX) = NULL,
+    @return_scores BIT = 1
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @Now DATETIME2(3) = SYSUTCDATETIME();
+    DECLARE @Since DATETIME2(3) = DATEADD(MONTH, -6, @Now);
+    DECLARE @WindowMins INT = DATEDIFF(MINUTE, @Since, @Now);
+
+    CREATE TABLE #Assets (asset_id INT NOT NULL PRIMARY KEY);
+
+    INSERT INTO #Assets (asset_id)
+    SELECT a.asset_id
+    FROM app.Assets a
+    WHERE a.site_id = @site_id
+    AND (
+        @asset_ids IS NULL
+        OR a.asset_id IN (SELECT value FROM OPENJSON(@asset_ids) WITH (value INT '$'))
+    );
+
+    WITH ticket_stats AS (
+        SELECT
+            ta.asset_id,
+            COUNT(*) AS total_tickets,
+            AVG(DATEDIFF(MINUTE, t.created_at,
+                CASE WHEN t.status = 'Closed' THEN t.updated_at ELSE @Now END)) AS avg_repair_time,
+            MAX(t.severity) AS highest_severity,
+            SUM(CASE WHEN t.status IN ('Open', 'In Progress', 'Closed')
+                THEN CAST(DATEDIFF(MINUTE, t.created_at,
+                    CASE WHEN t.status = 'Closed' THEN t.updated_at ELSE @Now END) AS BIGINT)
+                END) AS downtime_mins
+        FROM #Assets x
+        JOIN app.TicketAssets ta ON ta.asset_id = x.asset_id
+        JOIN app.Tickets t ON t.ticket_id = ta.ticket_id
+        WHERE t.created_at >= @Since
+        GROUP BY ta.asset_id
+    ),
+    failure_intervals AS (
+        SELECT
+            e.asset_id,
+            DATEDIFF(HOUR, LAG(e.occurred_at) OVER (PARTITION BY e.asset_id ORDER BY e.occurred_at), e.occurred_at) AS hours_since_last
+        FROM #Assets x
+        JOIN app.Events e ON e.asset_id = x.asset_id
+        WHERE e.level IN ('Error', 'Critical')
+        AND e.occurred_at >= @Since
+    ),
+    mtbf AS (
+        SELECT asset_id, AVG(hours_since_last) AS mtbf_hours
+        FROM failure_intervals
+        WHERE hours_since_last IS NOT NULL
+        GROUP BY asset_id
+    ),
+    adjacent_zones AS (
+        SELECT $from_id AS zone_node, $to_id AS other_zone_node FROM kg.ADJACENT_TO
+        UNION
+        SELECT $to_id, $from_id FROM kg.ADJACENT_TO
+    ),
+    dependencies AS (
+        SELECT ka.asset_id, COUNT(DISTINCT other.asset_id) AS downstream_count
+        FROM #Assets x
+        JOIN kg.Asset ka ON ka.asset_id = x.asset_id
+        JOIN kg.IN_ZONE iz ON iz.$from_id = ka.$node_id
+        JOIN adjacent_zones az ON az.zone_node = iz.$to_id
+        JOIN kg.IN_ZONE other_iz ON other_iz.$to_id = az.other_zone_node
+        JOIN kg.Asset other ON other.$node_id = other_iz.$from_id
+        GROUP BY ka.asset_id
+    )
+    MERGE app.AssetImpactScores WITH (HOLDLOCK) AS t
+    USING (
+        SELECT
+            x.asset_id,
+            CASE ts.highest_severity
+                WHEN 5 THEN 100
+                WHEN 4 THEN 75
+                WHEN 3 THEN 50
+                WHEN 2 THEN 25
+                ELSE 10
+            END AS business_impact_score,
+            CASE
+                WHEN ISNULL(ts.total_tickets, 0) >= 10 THEN 100
+                ELSE ISNULL(ts.total_tickets, 0) * 10
+            END AS failure_frequency_score,
+            ts.avg_repair_time,
+            m.mtbf_hours,
+            CASE
+                WHEN ts.downtime_mins IS NULL THEN NULL
+                WHEN ts.downtime_mins >= @WindowMins THEN 0
+                ELSE CAST(100 - ts.downtime_mins * 100.0 / @WindowMins AS DECIMAL(5,2))
+            END AS availability_percentage,
+            ISNULL(d.downstream_count, 0) AS downstream_dependencies
+        FROM #Assets x
+        LEFT JOIN ticket_stats ts ON ts.asset_id = x.asset_id
+        LEFT JOIN mtbf m ON m.asset_id = x.asset_id
+        LEFT JOIN dependencies d ON d.asset_id = x.asset_id
+    ) AS s
+    ON t.asset_id = s.asset_id
+    WHEN MATCHED THEN UPDATE SET
+        business_impact_score = s.business_impact_score,
+        failure_frequency_score = s.failure_frequency_score,
+        mean_time_to_repair_mins = s.avg_repair_time,
+        mean_time_between_failures_hours = s.mtbf_hours,
+        availability_percentage = s.availability_percentage,
+        downstream_dependencies = s.downstream_dependencies,
+        updated_at = @Now
+    WHEN NOT MATCHED THEN INSERT (
+        asset_id, business_impact_score, failure_frequency_score,
+        mean_time_to_repair_mins, mean_time_between_failures_hours,
+        availability_percentage, downstream_dependencies, updated_at
+    ) VALUES (
+        s.asset_id, s.business_impact_score, s.failure_frequency_score,
+        s.avg_repair_time, s.mtbf_hours,
+        s.availability_percentage, s.downstream_dependencies, @Now
+    );
+
+    IF @return_scores = 1
+        SELECT s.*
+        FROM app.AssetImpactScores s
+        JOIN #Assets x ON x.asset_id = s.asset_id;
+    ELSE
+        SELECT COUNT(*) AS assets_analyzed FROM #Assets;
+END;
+GO
+
+-- Single-asset entry point kept for the API; delegates to the site procedure
+CREATE OR ALTER PROCEDURE app.usp_AnalyzeAssetImpact
+    @asset_id INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @site_id INT = (SELECT site_id FROM app.Assets WHERE asset_id = @asset_id);
+    IF @site_id IS NULL
+    BEGIN
+        SELECT * FROM app.AssetImpactScores WHERE 1 = 0;
+        RETURN;
+    END;
+
+    DECLARE @asset_ids NVARCHAR(MAX) = CONCAT('[', @asset_id, ']');
+    EXEC app.usp_AnalyzeSiteImpact @site_id = @site_id, @asset_ids = @asset_ids;
+END;
+GO
@@ -0,0 +1,129 @@
+-- V15__cofail_incremental.sql
+USE [OpsGraph];
+GO
+
+-- Last app.Events rowversion folded into kg_analytics.CofailScores, per window length
+IF OBJECT_ID('kg_analytics.CofailWatermark', 'U') IS NULL
+CREATE TABLE kg_analytics.CofailWatermark (
+    window_minutes INT NOT NULL PRIMARY KEY,
+    watermark BINARY(8) NOT NULL,
+    updated_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME()
+);
+GO
+
+-- Pair counter deltas computed by the worker's co-fail engine
+IF TYPE_ID('kg_analytics.CofailPairList') IS NULL
+CREATE TYPE kg_analytics.CofailPairList AS TABLE (
+    site_id INT NOT NULL,
+    asset_a INT NOT NULL,
+    asset_b INT NOT NULL,
+    co_count INT NOT NULL,               -- co-occurrences to add
+    last_co DATETIME2(3) NOT NULL,       -- latest co-occurrence among them
+    PRIMARY KEY (site_id, asset_a, asset_b)
+);
+GO
+
+-- One full rebuild, as kg.usp_RefreshCofailScores, limited to events below a
+-- captured rowversion that is stored as the starting watermark for incremental updates
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Rebuild
+    @window_minutes INT = 120
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+    DECLARE @high BINARY(8) = CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8));
+
+    BEGIN TRANSACTION;
+
+    WITH pairs AS (
+        SELECT
+            e1.site_id AS site_id,
+            e1.asset_id AS asset_a,
+            e2.asset_id AS asset_b,
+            COUNT(1) AS co_count,
+            MAX(e2.occurred_at) AS last_co
+        FROM app.Events e1
+        JOIN app.Events e2
+          ON e1.site_id = e2.site_id
+          AND e2.event_id <> e1.event_id
+          AND e2.occurred_at BETWEEN e1.occurred_at AND DATEADD(MINUTE, @window_minutes, e1.occurred_at)
+        WHERE e1.rowversion < @high
+        AND e2.rowversion < @high
+        GROUP BY e1.site_id, e1.asset_id, e2.asset_id
+    )
+    MERGE kg_analytics.CofailScores AS target
+    USING pairs AS src
+    ON target.site_id = src.site_id AND target.asset_a = src.asset_a AND target.asset_b = src.asset_b
+    WHEN MATCHED THEN
+        UPDATE SET co_count = src.co_count, last_co_occurred_at = src.last_co, score = src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), updated_at = @now
+    WHEN NOT MATCHED THEN
+        INSERT (site_id, asset_a, asset_b, co_count, last_co_occurred_at, score, updated_at)
+        VALUES (src.site_id, src.asset_a, src.asset_b, src.co_count, src.last_co, src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), @now);
+
+    MERGE kg_analytics.CofailWatermark AS w
+    USING (SELECT @window_minutes AS window_minutes) AS s
+    ON w.window_minutes = s.window_minutes
+    WHEN MATCHED THEN UPDATE SET watermark = @high, updated_at = @now
+    WHEN NOT MATCHED THEN INSERT (window_minutes, watermark, updated_at) VALUES (@window_minutes, @high, @now);
+
+    COMMIT TRANSACTION;
+
+    SELECT @high AS watermark;
+END;
+GO
+
+-- Add pair deltas and advance the watermark. Runs in the caller's transaction
+-- so the counters and the watermark commit together.
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Apply
+    @pairs kg_analytics.CofailPairList READONLY,
+    @window_minutes INT = 120,
+    @watermark BINARY(8)
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+
+    MERGE kg_analytics.CofailScores WITH (HOLDLOCK) AS target
+    USING (
+        SELECT p.site_id, p.asset_a, p.asset_b, p.co_count, p.last_co
+        FROM @pairs p
+    ) AS src
+    ON target.site_id = src.site_id AND target.asset_a = src.asset_a AND target.asset_b = src.asset_b
+    WHEN MATCHED THEN UPDATE SET
+        co_count = target.co_count + src.co_count,
+        last_co_occurred_at = IIF(target.last_co_occurred_at >= src.last_co, target.last_co_occurred_at, src.last_co),
+        score = (target.co_count + src.co_count) * 1.0
+            / NULLIF(DATEDIFF(MINUTE, IIF(target.last_co_occurred_at >= src.last_co, target.last_co_occurred_at, src.last_co), @now), 0),
+        updated_at = @now
+    WHEN NOT MATCHED THEN
+        INSERT (site_id, asset_a, asset_b, co_count, last_co_occurred_at, score, updated_at)
+        VALUES (src.site_id, src.asset_a, src.asset_b, src.co_count, src.last_co, src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), @now);
+
+    DECLARE @pairs_updated INT = @@ROWCOUNT;
+
+    MERGE kg_analytics.CofailWatermark AS w
+    USING (SELECT @window_minutes AS window_minutes) AS s
+    ON w.window_minutes = s.window_minutes
+    WHEN MATCHED THEN UPDATE SET watermark = @watermark, updated_at = @now
+    WHEN NOT MATCHED THEN INSERT (window_minutes, watermark, updated_at) VALUES (@window_minutes, @watermark, @now);
+
+    SELECT @pairs_updated AS pairs_updated;
+END;
+GO
+
+-- Scores decay with time since the last co-occurrence; recompute them without touching the counters
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Rescore
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+
+    UPDATE kg_analytics.CofailScores
+    SET score = CASE WHEN co_count > 0 THEN co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, last_co_occurred_at, @now), 0) ELSE 0 END;
+END;
+GO
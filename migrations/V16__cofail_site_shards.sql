@@ -0,0 +1,142 @@
+-- V16__cofail_site_shards.sql
+USE [OpsGraph];
+GO
+
+-- Per-site reads past a watermark
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Events_Site_Rowversion' AND object_id = OBJECT_ID('app.Events'))
+    CREATE NONCLUSTERED INDEX IX_Events_Site_Rowversion ON app.Events(site_id, rowversion) INCLUDE (asset_id, occurred_at);
+GO
+
+-- Watermarks of the site-sharded co-fail engines; sites without a row start from kg_analytics.CofailWatermark
+IF OBJECT_ID('kg_analytics.CofailSiteWatermark', 'U') IS NULL
+CREATE TABLE kg_analytics.CofailSiteWatermark (
+    site_id INT NOT NULL,
+    window_minutes INT NOT NULL,
+    watermark BINARY(8) NOT NULL,
+    updated_at DATETIME2(3) NOT NULL DEFAULT SYSUTCDATETIME(),
+    PRIMARY KEY (site_id, window_minutes)
+);
+GO
+
+-- @site_id limits the rebuild to one site and stores that site's watermark
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Rebuild
+    @window_minutes INT = 120,
+    @site_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+    DECLARE @high BINARY(8) = CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8));
+
+    BEGIN TRANSACTION;
+
+    WITH pairs AS (
+        SELECT
+            e1.site_id AS site_id,
+            e1.asset_id AS asset_a,
+            e2.asset_id AS asset_b,
+            COUNT(1) AS co_count,
+            MAX(e2.occurred_at) AS last_co
+        FROM app.Events e1
+        JOIN app.Events e2
+          ON e1.site_id = e2.site_id
+          AND e2.event_id <> e1.event_id
+          AND e2.occurred_at BETWEEN e1.occurred_at AND DATEADD(MINUTE, @window_minutes, e1.occurred_at)
+        WHERE (@site_id IS NULL OR e1.site_id = @site_id)
+        AND e1.rowversion < @high
+        AND e2.rowversion < @high
+        GROUP BY e1.site_id, e1.asset_id, e2.asset_id
+    )
+    MERGE kg_analytics.CofailScores AS target
+    USING pairs AS src
+    ON target.site_id = src.site_id AND target.asset_a = src.asset_a AND target.asset_b = src.asset_b
+    WHEN MATCHED THEN
+        UPDATE SET co_count = src.co_count, last_co_occurred_at = src.last_co, score = src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), updated_at = @now
+    WHEN NOT MATCHED THEN
+        INSERT (site_id, asset_a, asset_b, co_count, last_co_occurred_at, score, updated_at)
+        VALUES (src.site_id, src.asset_a, src.asset_b, src.co_count, src.last_co, src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), @now);
+
+    IF @site_id IS NULL
+        MERGE kg_analytics.CofailWatermark AS w
+        USING (SELECT @window_minutes AS window_minutes) AS s
+        ON w.window_minutes = s.window_minutes
+        WHEN MATCHED THEN UPDATE SET watermark = @high, updated_at = @now
+        WHEN NOT MATCHED THEN INSERT (window_minutes, watermark, updated_at) VALUES (@window_minutes, @high, @now);
+    ELSE
+        MERGE kg_analytics.CofailSiteWatermark AS w
+        USING (SELECT @site_id AS site_id, @window_minutes AS window_minutes) AS s
+        ON w.site_id = s.site_id AND w.window_minutes = s.window_minutes
+        WHEN MATCHED THEN UPDATE SET watermark = @high, updated_at = @now
+        WHEN NOT MATCHED THEN INSERT (site_id, window_minutes, watermark, updated_at) VALUES (@site_id, @window_minutes, @high, @now);
+
+    COMMIT TRANSACTION;
+
+    SELECT @high AS watermark;
+END;
+GO
+
+-- @site_id stores the watermark of that site's engine instead of the global one
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Apply
+    @pairs kg_analytics.CofailPairList READONLY,
+    @window_minutes INT = 120,
+    @watermark BINARY(8),
+    @site_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+
+    MERGE kg_analytics.CofailScores WITH (HOLDLOCK) AS target
+    USING (
+        SELECT p.site_id, p.asset_a, p.asset_b, p.co_count, p.last_co
+        FROM @pairs p
+    ) AS src
+    ON target.site_id = src.site_id AND target.asset_a = src.asset_a AND target.asset_b = src.asset_b
+    WHEN MATCHED THEN UPDATE SET
+        co_count = target.co_count + src.co_count,
+        last_co_occurred_at = IIF(target.last_co_occurred_at >= src.last_co, target.last_co_occurred_at, src.last_co),
+        score = (target.co_count + src.co_count) * 1.0
+            / NULLIF(DATEDIFF(MINUTE, IIF(target.last_co_occurred_at >= src.last_co, target.last_co_occurred_at, src.last_co), @now), 0),
+        updated_at = @now
+    WHEN NOT MATCHED THEN
+        INSERT (site_id, asset_a, asset_b, co_count, last_co_occurred_at, score, updated_at)
+        VALUES (src.site_id, src.asset_a, src.asset_b, src.co_count, src.last_co, src.co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, src.last_co, @now), 0), @now);
+
+    DECLARE @pairs_updated INT = @@ROWCOUNT;
+
+    IF @site_id IS NULL
+        MERGE kg_analytics.CofailWatermark AS w
+        USING (SELECT @window_minutes AS window_minutes) AS s
+        ON w.window_minutes = s.window_minutes
+        WHEN MATCHED THEN UPDATE SET watermark = @watermark, updated_at = @now
+        WHEN NOT MATCHED THEN INSERT (window_minutes, watermark, updated_at) VALUES (@window_minutes, @watermark, @now);
+    ELSE
+        MERGE kg_analytics.CofailSiteWatermark AS w
+        USING (SELECT @site_id AS site_id, @window_minutes AS window_minutes) AS s
+        ON w.site_id = s.site_id AND w.window_minutes = s.window_minutes
+        WHEN MATCHED THEN UPDATE SET watermark = @watermark, updated_at = @now
+        WHEN NOT MATCHED THEN INSERT (site_id, window_minutes, watermark, updated_at) VALUES (@site_id, @window_minutes, @watermark, @now);
+
+    SELECT @pairs_updated AS pairs_updated;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE kg.usp_CofailScores_Rescore
+    @site_id INT = NULL
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+
+    UPDATE kg_analytics.CofailScores
+    SET score = CASE WHEN co_count > 0 THEN co_count * 1.0 / NULLIF(DATEDIFF(MINUTE, last_co_occurred_at, @now), 0) ELSE 0 END
+    WHERE (@site_id IS NULL OR site_id = @site_id);
+
+    SELECT @@ROWCOUNT AS rescored;
+END;
+GO
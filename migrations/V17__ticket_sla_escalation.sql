@@ -0,0 +1,83 @@
+-- V17__ticket_sla_escalation.sql
+USE [OpsGraph];
+GO
+
+-- The SLA monitor and the graph index service follow ticket outbox events, and
+-- the SLA monitor also TicketSLAs changes, by rowversion below
+-- MIN_ACTIVE_ROWVERSION(). IDENTITY values are not handed out in commit order,
+-- so an id cursor can step past a row that commits late.
+IF COL_LENGTH('app.Outbox', 'rowversion') IS NULL
+    ALTER TABLE app.Outbox ADD [rowversion] ROWVERSION;
+GO
+
+IF COL_LENGTH('app.TicketSLAs', 'rowversion') IS NULL
+    ALTER TABLE app.TicketSLAs ADD [rowversion] ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Outbox_Aggregate_Rowversion' AND object_id = OBJECT_ID('app.Outbox'))
+    CREATE NONCLUSTERED INDEX IX_Outbox_Aggregate_Rowversion ON app.Outbox(aggregate, rowversion) INCLUDE (aggregate_id, type);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_TicketSLAs_Rowversion' AND object_id = OBJECT_ID('app.TicketSLAs'))
+    CREATE NONCLUSTERED INDEX IX_TicketSLAs_Rowversion ON app.TicketSLAs(rowversion) INCLUDE (ticket_id);
+GO
+
+-- Escalate one ticket whose SLA deadline has passed; called by the worker's SLA
+-- scheduler when the deadline fires. Marks every overdue, unbreached SLA of the
+-- ticket as breached, adds a system comment and emits ticket.sla_breached.
+-- A closed or resolved ticket, or a deadline not yet reached on the server
+-- clock, is a no-op. Returns the number of SLAs breached.
+CREATE OR ALTER PROCEDURE app.usp_EscalateTicketSLA
+    @ticket_id INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    SET XACT_ABORT ON;
+
+    DECLARE @now DATETIME2(3) = SYSUTCDATETIME();
+    DECLARE @Breached TABLE (id BIGINT NOT NULL, target_at DATETIME2(3) NOT NULL);
+
+    BEGIN TRANSACTION;
+
+    UPDATE s
+    SET breached = 1,
+        computed_at = @now
+    OUTPUT inserted.id, inserted.target_at INTO @Breached (id, target_at)
+    FROM app.TicketSLAs s
+    JOIN app.Tickets t ON t.ticket_id = s.ticket_id
+    WHERE s.ticket_id = @ticket_id
+    AND s.breached = 0
+    AND s.target_at <= @now
+    AND t.status NOT IN ('Closed', 'Resolved');
+
+    IF EXISTS (SELECT 1 FROM @Breached)
+    BEGIN
+        INSERT INTO app.TicketComments (ticket_id, author_id, body)
+        SELECT
+            t.ticket_id,
+            NULL,
+            CONCAT('Ticket has exceeded its SLA target of ',
+                   CONVERT(NVARCHAR(19), (SELECT MIN(target_at) FROM @Breached), 120),
+                   ' UTC. Severity: ', t.severity)
+        FROM app.Tickets t
+        WHERE t.ticket_id = @ticket_id;
+
+        INSERT INTO app.Outbox (aggregate, aggregate_id, type, payload)
+        VALUES (
+            'ticket',
+            CAST(@ticket_id AS NVARCHAR(64)),
+            'ticket.sla_breached',
+            (
+                SELECT
+                    @ticket_id AS ticket_id,
+                    JSON_QUERY((SELECT id AS sla_id, target_at FROM @Breached FOR JSON PATH)) AS slas
+                FOR JSON PATH, WITHOUT_ARRAY_WRAPPER
+            )
+        );
+    END;
+
+    COMMIT TRANSACTION;
+
+    SELECT COUNT(*) AS breached FROM @Breached;
+END;
+GO
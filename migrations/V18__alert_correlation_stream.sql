@@ -0,0 +1,56 @@
+-- V18__alert_correlation_stream.sql
+USE [OpsGraph];
+GO
+
+-- The alert poller's correlator follows new alerts by their own rowversion:
+-- kg.usp_PromoteEventToAlert raises alerts for events written long before, so
+-- the event's rowversion says nothing about when its alert appeared
+IF COL_LENGTH('app.Alerts', 'rowversion') IS NULL
+    ALTER TABLE app.Alerts ADD [rowversion] ROWVERSION;
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_Alerts_Rowversion' AND object_id = OBJECT_ID('app.Alerts'))
+    CREATE NONCLUSTERED INDEX IX_Alerts_Rowversion ON app.Alerts(rowversion) INCLUDE (event_id, raised_at);
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_AlertCorrelations_Root' AND object_id = OBJECT_ID('app.AlertCorrelations'))
+    CREATE NONCLUSTERED INDEX IX_AlertCorrelations_Root ON app.AlertCorrelations(root_alert_id, pattern_id);
+GO
+
+-- Bulk insert of correlations found by the alert poller's streaming engine.
+-- @Correlations is a JSON array of
+--   {"pattern_id", "root_alert_id", "correlated_alerts" (JSON array of alert ids),
+--    "confidence_score", "correlation_data" (JSON object)}
+-- A (root_alert_id, pattern_id) pair that is already recorded is skipped, so a
+-- worker replaying its window after a restart does not duplicate rows. Rows
+-- whose pattern or root alert no longer exists are dropped.
+CREATE OR ALTER PROCEDURE app.usp_AlertCorrelations_BulkInsert
+    @Correlations NVARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO app.AlertCorrelations (
+        pattern_id, root_alert_id, correlated_alerts, confidence_score, correlation_data, created_at
+    )
+    SELECT
+        c.pattern_id, c.root_alert_id, c.correlated_alerts, c.confidence_score, c.correlation_data, SYSUTCDATETIME()
+    FROM OPENJSON(@Correlations) WITH (
+        pattern_id INT '$.pattern_id',
+        root_alert_id CHAR(26) '$.root_alert_id',
+        correlated_alerts NVARCHAR(MAX) '$.correlated_alerts' AS JSON,
+        confidence_score INT '$.confidence_score',
+        correlation_data NVARCHAR(MAX) '$.correlation_data' AS JSON
+    ) c
+    JOIN app.AlertCorrelationPatterns p ON p.pattern_id = c.pattern_id
+    JOIN app.Alerts a ON a.alert_id = c.root_alert_id
+    WHERE NOT EXISTS (
+        SELECT 1
+        FROM app.AlertCorrelations ac
+        WHERE ac.root_alert_id = c.root_alert_id
+        AND ac.pattern_id = c.pattern_id
+    );
+
+    SELECT @@ROWCOUNT AS inserted;
+END;
+GO
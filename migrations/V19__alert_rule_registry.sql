@@ -0,0 +1,231 @@
+-- V19__alert_rule_registry.sql
+USE [OpsGraph];
+GO
+
+-- Change tracking for the alert poller's rule registry, which reloads a table
+-- when its COUNT(*) or MAX(updated_at) moves. The triggers stamp updated_at on
+-- every update that does not set it itself (for MonitorSources, every update of
+-- its configuration columns).
+IF COL_LENGTH('app.AlertProcessingRules', 'updated_at') IS NULL
+    ALTER TABLE app.AlertProcessingRules
+    ADD updated_at DATETIME2(3) NOT NULL
+        CONSTRAINT DF_AlertProcessingRules_UpdatedAt DEFAULT SYSUTCDATETIME();
+GO
+
+IF COL_LENGTH('app.MonitorAssetMappings', 'updated_at') IS NULL
+    ALTER TABLE app.MonitorAssetMappings
+    ADD updated_at DATETIME2(3) NOT NULL
+        CONSTRAINT DF_MonitorAssetMappings_UpdatedAt DEFAULT SYSUTCDATETIME();
+GO
+
+IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = 'IX_MonitorAssetMappings_UpdatedAt' AND object_id = OBJECT_ID('app.MonitorAssetMappings'))
+    CREATE NONCLUSTERED INDEX IX_MonitorAssetMappings_UpdatedAt
+    ON app.MonitorAssetMappings(updated_at) INCLUDE (source_id, external_id, asset_id);
+GO
+
+CREATE OR ALTER TRIGGER app.tr_AlertProcessingRules_UpdatedAt ON app.AlertProcessingRules AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF UPDATE(updated_at) RETURN;
+    UPDATE t
+    SET updated_at = SYSUTCDATETIME()
+    FROM app.AlertProcessingRules t
+    JOIN inserted i ON i.rule_id = t.rule_id;
+END;
+GO
+
+CREATE OR ALTER TRIGGER app.tr_AlertThrottleRules_UpdatedAt ON app.AlertThrottleRules AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF UPDATE(updated_at) RETURN;
+    UPDATE t
+    SET updated_at = SYSUTCDATETIME()
+    FROM app.AlertThrottleRules t
+    JOIN inserted i ON i.rule_id = t.rule_id;
+END;
+GO
+
+-- Only configuration changes count: usp_AlertMetrics_Flush writes the poll
+-- health columns every minute, and stamping those would make the registry
+-- reload source limits on every refresh
+CREATE OR ALTER TRIGGER app.tr_MonitorSources_UpdatedAt ON app.MonitorSources AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF UPDATE(updated_at) RETURN;
+    IF NOT (UPDATE(name) OR UPDATE(api_base_url) OR UPDATE(auth_type) OR UPDATE(auth_config)
+            OR UPDATE(polling_interval_seconds) OR UPDATE(is_active) OR UPDATE(retry_backoff_mins)
+            OR UPDATE(max_requests_per_minute)) RETURN;
+    UPDATE t
+    SET updated_at = SYSUTCDATETIME()
+    FROM app.MonitorSources t
+    JOIN inserted i ON i.source_id = t.source_id;
+END;
+GO
+
+CREATE OR ALTER TRIGGER app.tr_MonitorAssetMappings_UpdatedAt ON app.MonitorAssetMappings AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF UPDATE(updated_at) RETURN;
+    UPDATE t
+    SET updated_at = SYSUTCDATETIME()
+    FROM app.MonitorAssetMappings t
+    JOIN inserted i ON i.mapping_id = t.mapping_id;
+END;
+GO
+
+-- Enrichment resolved before insert
+IF COL_LENGTH('app.AlertQueue', 'asset_id') IS NULL
+    ALTER TABLE app.AlertQueue ADD asset_id INT NULL;
+GO
+
+IF COL_LENGTH('app.AlertQueue', 'processing_rule_id') IS NULL
+    ALTER TABLE app.AlertQueue ADD processing_rule_id INT NULL;
+GO
+
+-- Bulk alert ingestion: one call per poll chunk instead of one INSERT per alert.
+-- @Alerts is a JSON array of
+--   {"external_id", "external_asset_id", "alert_type", "severity", "message",
+--    "hash_signature" (hex SHA-256), "raw_data" (JSON object)}
+-- and optionally "asset_id", "processing_rule_id" and "duplicate_window_mins"
+-- resolved by the poller's rule registry; a missing duplicate_window_mins is
+-- looked up from AlertThrottleRules here.
+-- Duplicates (same hash within the duplicate window of the matching throttle
+-- rule, default 60 minutes) are folded into the existing queue row's
+-- duplicate_count, both against AlertQueue and within the batch itself.
+CREATE OR ALTER PROCEDURE app.usp_AlertQueue_BulkIngest
+    @SourceId INT,
+    @Alerts NVARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @Now DATETIME2(3) = SYSUTCDATETIME();
+
+    CREATE TABLE #Incoming (
+        ordinal INT NOT NULL PRIMARY KEY,
+        external_id NVARCHAR(200) NOT NULL,
+        external_asset_id NVARCHAR(200) NOT NULL,
+        alert_type NVARCHAR(100) NOT NULL,
+        severity NVARCHAR(20) NOT NULL,
+        message NVARCHAR(MAX) NOT NULL,
+        raw_data NVARCHAR(MAX) NOT NULL,
+        hash_signature VARBINARY(32) NOT NULL,
+        asset_id INT NULL,
+        processing_rule_id INT NULL,
+        duplicate_window_mins INT NOT NULL,
+        batch_rank INT NULL,
+        batch_copies INT NULL,
+        existing_queue_id BIGINT NULL
+    );
+
+    INSERT INTO #Incoming (
+        ordinal, external_id, external_asset_id, alert_type,
+        severity, message, raw_data, hash_signature,
+        asset_id, processing_rule_id, duplicate_window_mins
+    )
+    SELECT
+        CAST(j.[key] AS INT),
+        a.external_id,
+        a.external_asset_id,
+        a.alert_type,
+        a.severity,
+        a.message,
+        a.raw_data,
+        CONVERT(VARBINARY(32), a.hash_signature, 2),
+        a.asset_id,
+        a.processing_rule_id,
+        COALESCE(a.duplicate_window_mins, w.duplicate_window_mins, 60)
+    FROM OPENJSON(@Alerts) j
+    CROSS APPLY OPENJSON(j.[value]) WITH (
+        external_id NVARCHAR(200) '$.external_id',
+        external_asset_id NVARCHAR(200) '$.external_asset_id',
+        alert_type NVARCHAR(100) '$.alert_type',
+        severity NVARCHAR(20) '$.severity',
+        message NVARCHAR(MAX) '$.message',
+        hash_signature CHAR(64) '$.hash_signature',
+        raw_data NVARCHAR(MAX) '$.raw_data' AS JSON,
+        asset_id INT '$.asset_id',
+        processing_rule_id INT '$.processing_rule_id',
+        duplicate_window_mins INT '$.duplicate_window_mins'
+    ) a
+    OUTER APPLY (
+        SELECT TOP 1 r.duplicate_window_mins
+        FROM app.AlertThrottleRules r
+        WHERE a.duplicate_window_mins IS NULL
+        AND r.source_id = @SourceId
+        AND (r.alert_type_pattern IS NULL OR a.alert_type LIKE r.alert_type_pattern)
+        AND r.is_active = 1
+        AND r.suppress_duplicates = 1
+        ORDER BY r.rule_id
+    ) w;
+
+    -- Duplicates within this batch: keep the first occurrence of each hash
+    WITH ranked AS (
+        SELECT
+            batch_rank,
+            batch_copies,
+            ROW_NUMBER() OVER (PARTITION BY hash_signature ORDER BY ordinal) AS rn,
+            COUNT(*) OVER (PARTITION BY hash_signature) AS copies
+        FROM #Incoming
+    )
+    UPDATE ranked
+    SET batch_rank = rn,
+        batch_copies = copies;
+
+    -- Duplicates of alerts already queued inside their window
+    UPDATE i
+    SET existing_queue_id = q.queue_id
+    FROM #Incoming i
+    CROSS APPLY (
+        SELECT TOP 1 aq.queue_id
+        FROM app.AlertQueue aq
+        WHERE aq.source_id = @SourceId
+        AND aq.hash_signature = i.hash_signature
+        AND aq.received_at >= DATEADD(MINUTE, -i.duplicate_window_mins, @Now)
+        ORDER BY aq.received_at DESC
+    ) q
+    WHERE i.batch_rank = 1;
+
+    BEGIN TRANSACTION;
+
+    UPDATE aq
+    SET duplicate_count = aq.duplicate_count + i.batch_copies
+    FROM app.AlertQueue aq
+    JOIN #Incoming i ON i.existing_queue_id = aq.queue_id;
+
+    INSERT INTO app.AlertQueue (
+        source_id, external_id, external_asset_id,
+        alert_type, severity, message, raw_data,
+        hash_signature, duplicate_count, first_occurrence_at,
+        asset_id, processing_rule_id
+    )
+    SELECT
+        @SourceId,
+        i.external_id,
+        i.external_asset_id,
+        i.alert_type,
+        i.severity,
+        i.message,
+        i.raw_data,
+        i.hash_signature,
+        i.batch_copies - 1,
+        @Now,
+        i.asset_id,
+        i.processing_rule_id
+    FROM #Incoming i
+    WHERE i.batch_rank = 1
+    AND i.existing_queue_id IS NULL
+    ORDER BY i.ordinal;
+
+    COMMIT TRANSACTION;
+
+    SELECT
+        SUM(CASE WHEN batch_rank = 1 AND existing_queue_id IS NULL THEN 1 ELSE 0 END) AS inserted_count,
+        SUM(CASE WHEN batch_rank = 1 AND existing_queue_id IS NULL THEN 0 ELSE 1 END) AS duplicate_count
+    FROM #Incoming;
+END;
+GO
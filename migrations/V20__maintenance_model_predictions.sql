@@ -0,0 +1,42 @@
+-- V20__maintenance_model_predictions.sql
+USE [OpsGraph];
+GO
+
+-- Predictions scored by an ML model carry model_id rather than a rule
+IF COLUMNPROPERTY(OBJECT_ID('app.MaintenancePredictions'), 'rule_id', 'AllowsNull') = 0
+    ALTER TABLE app.MaintenancePredictions ALTER COLUMN rule_id INT NULL;
+GO
+
+-- Record one batch scoring run of a model in a single call.
+-- @Predictions is a JSON array of
+--   {"asset_id", "predicted_failure_at", "confidence_score",
+--    "feature_importance" (JSON object), "prediction_explanation"}
+CREATE OR ALTER PROCEDURE app.usp_MaintenancePredictions_BulkRecordModel
+    @ModelId INT,
+    @Predictions NVARCHAR(MAX)
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    INSERT INTO app.MaintenancePredictions (
+        asset_id, model_id, predicted_failure_at, confidence_score,
+        feature_importance, prediction_explanation
+    )
+    SELECT
+        p.asset_id,
+        @ModelId,
+        p.predicted_failure_at,
+        p.confidence_score,
+        p.feature_importance,
+        p.prediction_explanation
+    FROM OPENJSON(@Predictions) WITH (
+        asset_id INT '$.asset_id',
+        predicted_failure_at DATETIME2(3) '$.predicted_failure_at',
+        confidence_score DECIMAL(5,2) '$.confidence_score',
+        feature_importance NVARCHAR(MAX) '$.feature_importance' AS JSON,
+        prediction_explanation NVARCHAR(MAX) '$.prediction_explanation'
+    ) p;
+
+    SELECT @@ROWCOUNT AS predictions_recorded;
+END;
+GO
@@ -0,0 +1,68 @@
+-- V8__outbox_ack_and_backoff.sql
+USE [OpsGraph];
+GO
+
+-- Retry scheduling for failed outbox deliveries
+IF NOT EXISTS (
+    SELECT 1 FROM sys.columns
+    WHERE object_id = OBJECT_ID('app.Outbox')
+    AND name = 'next_attempt_at'
+)
+BEGIN
+    ALTER TABLE app.Outbox
+    ADD next_attempt_at DATETIME2(3) NULL;
+END;
+GO
+
+-- Delivery outcomes reported by the worker, one row per dequeued event
+IF TYPE_ID('app.OutboxAckList') IS NULL
+CREATE TYPE app.OutboxAckList AS TABLE (
+    event_id BIGINT NOT NULL PRIMARY KEY,
+    succeeded BIT NOT NULL,
+    retry_after_ms INT NULL        -- backoff before the event may be dequeued again
+);
+GO
+
+-- Dequeue skips rows that are still backing off
+CREATE OR ALTER PROCEDURE app.usp_Outbox_DequeueBatch
+    @batch_size INT = 100
+AS
+BEGIN
+    SET NOCOUNT ON;
+    BEGIN TRAN;
+    WITH cte AS (
+        SELECT TOP (@batch_size) event_id
+        FROM app.Outbox WITH (UPDLOCK, READPAST)
+        WHERE published = 0
+        AND (next_attempt_at IS NULL OR next_attempt_at <= SYSUTCDATETIME())
+        ORDER BY created_at
+    )
+    UPDATE o
+    SET published = 1
+    OUTPUT inserted.*
+    FROM app.Outbox o
+    JOIN cte ON o.event_id = cte.event_id;
+    COMMIT TRAN;
+END
+GO
+
+-- Write back a whole batch of ack/nack outcomes in one statement
+CREATE OR ALTER PROCEDURE app.usp_Outbox_AckBatch
+    @acks app.OutboxAckList READONLY
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    UPDATE o
+    SET published = CASE WHEN a.succeeded = 1 THEN 1 ELSE 0 END,
+        try_count = o.try_count + CASE WHEN a.succeeded = 1 THEN 0 ELSE 1 END,
+        next_attempt_at = CASE
+            WHEN a.succeeded = 1 THEN NULL
+            ELSE DATEADD(MILLISECOND, ISNULL(a.retry_after_ms, 0), SYSUTCDATETIME())
+        END
+    FROM app.Outbox o
+    JOIN @acks a ON o.event_id = a.event_id
+    WHERE a.succeeded = 0
+    OR o.next_attempt_at IS NOT NULL;
+END;
+GO
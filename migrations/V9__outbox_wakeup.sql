@@ -0,0 +1,52 @@
+-- V9__outbox_wakeup.sql
+USE [OpsGraph];
+GO
+
+-- Narrow index over the pending part of the outbox for dequeue and wakeup checks
+IF NOT EXISTS (
+    SELECT 1 FROM sys.indexes
+    WHERE object_id = OBJECT_ID('app.Outbox')
+    AND name = 'IX_Outbox_Pending'
+)
+BEGIN
+    CREATE NONCLUSTERED INDEX IX_Outbox_Pending
+    ON app.Outbox(created_at)
+    INCLUDE (next_attempt_at)
+    WHERE published = 0;
+END;
+GO
+
+-- Long-poll for dequeueable work: returns as soon as a row is due, or after @timeout_ms.
+-- Replaces client-side fixed-interval polling with one round trip per idle period.
+CREATE OR ALTER PROCEDURE app.usp_Outbox_WaitForWork
+    @timeout_ms INT = 20000,
+    @check_ms INT = 250
+AS
+BEGIN
+    SET NOCOUNT ON;
+
+    DECLARE @deadline DATETIME2(3) = DATEADD(MILLISECOND, @timeout_ms, SYSUTCDATETIME());
+    DECLARE @delay CHAR(12) = CONVERT(CHAR(12), DATEADD(MILLISECOND, @check_ms, CAST('00:00:00' AS TIME(3))), 114);
+
+    WHILE 1 = 1
+    BEGIN
+        IF EXISTS (
+            SELECT 1
+            FROM app.Outbox WITH (READPAST)
+            WHERE published = 0
+            AND (next_attempt_at IS NULL OR next_attempt_at <= SYSUTCDATETIME())
+        )
+        BEGIN
+            SELECT CAST(1 AS BIT) AS has_work;
+            RETURN;
+        END;
+
+        IF SYSUTCDATETIME() >= @deadline
+            BREAK;
+
+        WAITFOR DELAY @delay;
+    END;
+
+    SELECT CAST(0 AS BIT) AS has_work;
+END;
+GO
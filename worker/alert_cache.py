@@ -0,0 +1,243 @@
+import heapq
+import re
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Generic, Iterable, List, Optional, Tuple, TypeVar
+
+DEFAULT_DUPLICATE_WINDOW_MINS = 60
+DEFAULT_THROTTLE_WINDOW_MINS = 5
+LIKE_WILDCARDS = frozenset('%_[')
+# Distinct (source, alert type) pairs remembered by AlertThrottleCache.matching_rules
+MAX_MEMOISED_MATCHES = 10_000
+
+T = TypeVar('T')
+
+
+def like_to_regex(pattern: str) -> re.Pattern:
+    """Translate a T-SQL LIKE pattern into an equivalent case-insensitive regex"""
+    out = []
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        if ch == '%':
+            out.append('.*')
+        elif ch == '_':
+            out.append('.')
+        elif ch == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                out.append(re.escape(ch))
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('^'):
+                    body = '^' + re.escape(body[1:]).replace('\\-', '-')
+                else:
+                    body = re.escape(body).replace('\\-', '-')
+                out.append(f'[{body}]')
+                i = end
+        else:
+            out.append(re.escape(ch))
+        i += 1
+    return re.compile(''.join(out) + r'\Z', re.IGNORECASE | re.DOTALL)
+
+
+def like_prefix(pattern: str) -> Optional[str]:
+    """The literal prefix of a `prefix%` LIKE pattern, or None if it is any other shape"""
+    if not pattern.endswith('%'):
+        return None
+    prefix = pattern.rstrip('%')
+    return None if LIKE_WILDCARDS.intersection(prefix) else prefix
+
+
+class LikePatternIndex(Generic[T]):
+    """Items keyed by case-insensitive LIKE pattern, matched against a value in one pass.
+
+    Patterns without wildcards go into an exact-match dict, `prefix%`
+    patterns (and NULL, which matches everything) into a character trie,
+    and only the remaining shapes are compiled to regexes and tried one by
+    one. `match` returns matching items ordered by the `order` they were
+    added with.
+    """
+
+    _ITEMS = ''
+
+    def __init__(self):
+        self._exact: Dict[str, List[Tuple[Any, T]]] = {}
+        self._trie: Dict[str, Any] = {}
+        self._regexes: List[Tuple[re.Pattern, Any, T]] = []
+
+    def add(self, pattern: Optional[str], item: T, order: Any):
+        if pattern is not None and not LIKE_WILDCARDS.intersection(pattern):
+            self._exact.setdefault(pattern.lower(), []).append((order, item))
+            return
+        prefix = '' if pattern is None else like_prefix(pattern)
+        if prefix is None:
+            self._regexes.append((like_to_regex(pattern), order, item))
+            return
+        node = self._trie
+        for ch in prefix.lower():
+            node = node.setdefault(ch, {})
+        node.setdefault(self._ITEMS, []).append((order, item))
+
+    def match(self, value: str) -> List[T]:
+        value = value or ''
+        key = value.lower()
+        found = list(self._exact.get(key, ()))
+        node = self._trie
+        found.extend(node.get(self._ITEMS, ()))
+        for ch in key:
+            node = node.get(ch)
+            if node is None:
+                break
+            found.extend(node.get(self._ITEMS, ()))
+        found.extend((order, item) for regex, order, item in self._regexes if regex.match(value))
+        found.sort(key=lambda entry: entry[0])
+        return [item for _, item in found]
+
+
+class ThrottleRule:
+    __slots__ = ('source_id', 'pattern', 'matcher', 'max_alerts_per_minute',
+                 'throttle_window_mins', 'suppress_duplicates', 'duplicate_window_mins')
+
+    def __init__(self, source_id: int, pattern: Optional[str], max_alerts_per_minute: int,
+                 throttle_window_mins: int, suppress_duplicates: bool, duplicate_window_mins: int):
+        self.source_id = source_id
+        self.pattern = pattern
+        self.matcher = like_to_regex(pattern) if pattern is not None else None
+        self.max_alerts_per_minute = max_alerts_per_minute
+        self.throttle_window_mins = throttle_window_mins
+        self.suppress_duplicates = suppress_duplicates
+        self.duplicate_window_mins = duplicate_window_mins
+
+    def matches(self, alert_type: str) -> bool:
+        return self.matcher is None or self.matcher.match(alert_type or '') is not None
+
+
+class AlertThrottleCache:
+    """Sliding-window alert counters per (source_id, alert_type).
+
+    Limits follow app.usp_CheckAlertThrottling: the highest matching
+    AlertThrottleRules.max_alerts_per_minute, else the source's
+    max_requests_per_minute, scaled to the throttle window. `reserve`
+    checks and counts an alert in one step, so alerts handled concurrently
+    cannot all pass before any is counted; `release` gives the slot back when
+    the alert is not queued after all. Like the proc's count of unsuppressed
+    AlertQueue rows, each window holds at most `limit` entries.
+    """
+
+    def __init__(self):
+        self.rules: Dict[int, List[ThrottleRule]] = {}
+        self.source_limits: Dict[int, int] = {}
+        self._index: Dict[int, LikePatternIndex[ThrottleRule]] = {}
+        self._matches: Dict[Tuple[int, str], List[ThrottleRule]] = {}
+        self._windows: Dict[Tuple[int, str], Deque[float]] = {}
+
+    def load(self, rules: Iterable[ThrottleRule], source_limits: Dict[int, int]):
+        by_source: Dict[int, List[ThrottleRule]] = {}
+        for rule in rules:
+            by_source.setdefault(rule.source_id, []).append(rule)
+        index: Dict[int, LikePatternIndex[ThrottleRule]] = {}
+        for source_id, source_rules in by_source.items():
+            index[source_id] = LikePatternIndex()
+            for order, rule in enumerate(source_rules):
+                index[source_id].add(rule.pattern, rule, order)
+        self.rules = by_source
+        self.source_limits = dict(source_limits)
+        self._index = index
+        self._matches = {}
+
+    def matching_rules(self, source_id: int, alert_type: str) -> List[ThrottleRule]:
+        """Matching rules in load order; memoised per (source, alert type) until the next load"""
+        key = (source_id, alert_type)
+        rules = self._matches.get(key)
+        if rules is None:
+            index = self._index.get(source_id)
+            rules = index.match(alert_type) if index is not None else []
+            if len(self._matches) >= MAX_MEMOISED_MATCHES:
+                self._matches.clear()
+            self._matches[key] = rules
+        return rules
+
+    def limit_for(self, source_id: int, alert_type: str) -> Tuple[Optional[int], float]:
+        """(max alerts per window, window seconds); limit is None when nothing is configured"""
+        rules = self.matching_rules(source_id, alert_type)
+        window_mins = max((r.throttle_window_mins for r in rules), default=DEFAULT_THROTTLE_WINDOW_MINS)
+        per_minute = max((r.max_alerts_per_minute for r in rules), default=None)
+        if per_minute is None:
+            per_minute = self.source_limits.get(source_id)
+        if per_minute is None:
+            return None, window_mins * 60.0
+        return per_minute * window_mins, window_mins * 60.0
+
+    def record(self, source_id: int, alert_type: str, at: Optional[float] = None):
+        """Count an admitted alert against its window"""
+        self._windows.setdefault((source_id, alert_type), deque()).append(time.time() if at is None else at)
+
+    def should_throttle(self, source_id: int, alert_type: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        limit, window_s = self.limit_for(source_id, alert_type)
+        window = self._windows.get((source_id, alert_type))
+        if not window:
+            return False
+        while window and window[0] <= now - window_s:
+            window.popleft()
+        return limit is not None and len(window) >= limit
+
+    def reserve(self, source_id: int, alert_type: str, now: Optional[float] = None) -> Optional[float]:
+        """Count an alert unless it is throttled; returns its slot for `release`, or None if throttled"""
+        now = time.time() if now is None else now
+        if self.should_throttle(source_id, alert_type, now):
+            return None
+        self.record(source_id, alert_type, now)
+        return now
+
+    def release(self, source_id: int, alert_type: str, slot: float):
+        """Give back a slot taken by `reserve`"""
+        window = self._windows.get((source_id, alert_type))
+        if window:
+            try:
+                window.remove(slot)
+            except ValueError:
+                pass
+
+
+class AlertDedupCache:
+    """TTL-bounded set of alert hash signatures.
+
+    Each signature lives for the duplicate window of the rule that admitted
+    it; expired entries are evicted lazily from a min-heap of expiry times.
+    """
+
+    def __init__(self, max_entries: int = 500_000):
+        self.max_entries = max_entries
+        self._expiry: Dict[bytes, float] = {}
+        self._heap: List[Tuple[float, bytes]] = []
+
+    def __len__(self) -> int:
+        return len(self._expiry)
+
+    def _evict(self, now: float):
+        heap = self._heap
+        while heap and (heap[0][0] <= now or len(self._expiry) > self.max_entries):
+            expires_at, digest = heapq.heappop(heap)
+            # skip stale heap entries left behind by a later re-insert
+            if self._expiry.get(digest) == expires_at:
+                del self._expiry[digest]
+
+    def add(self, digest: bytes, expires_at: float):
+        self._expiry[digest] = expires_at
+        heapq.heappush(self._heap, (expires_at, digest))
+
+    def discard(self, digest: bytes):
+        """Forget a signature, e.g. one whose alert failed to insert; its heap entry goes stale"""
+        self._expiry.pop(digest, None)
+
+    def seen(self, digest: bytes, window_s: float, now: Optional[float] = None) -> bool:
+        """True if `digest` is a duplicate; otherwise remember it for `window_s` seconds"""
+        now = time.time() if now is None else now
+        self._evict(now)
+        expires_at = self._expiry.get(digest)
+        if expires_at is not None and expires_at > now:
+            return True
+        self.add(digest, now + window_s)
+        return False
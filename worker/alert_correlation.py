@@ -0,0 +1,195 @@
+import heapq
+import json
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+# usp_ProcessAlertQueue scored every correlation 85
+DEFAULT_CONFIDENCE_SCORE = 85
+DEFAULT_LATENESS_S = 30
+
+
+class CorrelationPattern:
+    __slots__ = ('pattern_id', 'root_alert_type', 'related_alert_types', 'window')
+
+    def __init__(self, pattern_id: int, root_alert_type: str, related_alert_types: Iterable[str],
+                 correlation_window_mins: int):
+        self.pattern_id = pattern_id
+        self.root_alert_type = root_alert_type
+        self.related_alert_types = tuple(dict.fromkeys(related_alert_types))
+        self.window = timedelta(minutes=correlation_window_mins)
+
+
+def compile_patterns(rows: Iterable[Tuple]) -> Dict[str, List[CorrelationPattern]]:
+    """Active AlertCorrelationPatterns rows grouped by root alert type.
+
+    Rows are (pattern_id, root_alert_type, related_alert_types JSON,
+    correlation_window_mins); the JSON is parsed here
+    once rather than per candidate alert. Patterns with unreadable
+    related types are logged and skipped.
+    """
+    by_root: Dict[str, List[CorrelationPattern]] = {}
+    for pattern_id, root_alert_type, related_json, window_mins in rows:
+        try:
+            related = json.loads(related_json)
+            if not isinstance(related, list):
+                raise ValueError('related_alert_types is not a JSON array')
+        except ValueError as e:
+            logger.warning("Skipping correlation pattern", pattern_id=pattern_id, error=str(e))
+            continue
+        by_root.setdefault(root_alert_type, []).append(
+            CorrelationPattern(pattern_id, root_alert_type, [str(t) for t in related], window_mins)
+        )
+    return by_root
+
+
+class SiteAlertIndex:
+    """Recent alerts of one site: per alert type, raised_at and alert_id lists kept in time order"""
+
+    def __init__(self):
+        self._by_type: Dict[str, Tuple[List[datetime], List[str]]] = {}
+
+    def __len__(self):
+        return sum(len(times) for times, _ in self._by_type.values())
+
+    def add(self, alert_id: str, alert_type: str, raised_at: datetime):
+        times, ids = self._by_type.setdefault(alert_type, ([], []))
+        if not times or raised_at >= times[-1]:
+            times.append(raised_at)
+            ids.append(alert_id)
+        else:
+            i = bisect_right(times, raised_at)
+            times.insert(i, raised_at)
+            ids.insert(i, alert_id)
+
+    def between(self, alert_type: str, start: datetime, end: datetime) -> List[Tuple[datetime, str]]:
+        """Alerts of `alert_type` raised in [start, end]"""
+        entry = self._by_type.get(alert_type)
+        if entry is None:
+            return []
+        times, ids = entry
+        lo, hi = bisect_left(times, start), bisect_right(times, end)
+        return list(zip(times[lo:hi], ids[lo:hi]))
+
+    def trim(self, before: datetime) -> List[str]:
+        """Drop alerts raised before `before`; returns their ids"""
+        dropped = []
+        for alert_type in list(self._by_type):
+            times, ids = self._by_type[alert_type]
+            cut = bisect_left(times, before)
+            if cut:
+                dropped.extend(ids[:cut])
+                del times[:cut], ids[:cut]
+            if not times:
+                del self._by_type[alert_type]
+        return dropped
+
+
+class AlertCorrelationEngine:
+    """Streaming counterpart of the correlation step of app.usp_ProcessAlertQueue.
+
+    An alert whose type is the root of an active pattern correlates with the
+    alerts of the pattern's related types raised in the `correlation_window_mins`
+    before it. Alerts are indexed per site by type, so a root costs one
+    binary search per related type instead of a rescan of app.Alerts, and
+    only alerts of the same site correlate.
+
+    A root is matched once `lateness` has passed since it was raised, so
+    related alerts that arrive a little after it from slower sources still
+    count. Roots with no related alerts produce no row. Alerts older than
+    the longest window plus `lateness` are trimmed.
+    """
+
+    def __init__(self, lateness_s: float = DEFAULT_LATENESS_S,
+                 confidence_score: int = DEFAULT_CONFIDENCE_SCORE):
+        self.lateness = timedelta(seconds=lateness_s)
+        self.confidence_score = confidence_score
+        self.patterns: Dict[str, List[CorrelationPattern]] = {}
+        self.horizon = self.lateness
+        self.sites: Dict[int, SiteAlertIndex] = {}
+        self._seen: Dict[str, int] = {}
+        self._pending: List[Tuple[datetime, str, int, str]] = []
+
+    def load_patterns(self, rows: Iterable[Tuple]):
+        self.patterns = compile_patterns(rows)
+        windows = [p.window for patterns in self.patterns.values() for p in patterns]
+        self.horizon = max(windows, default=timedelta(0)) + self.lateness
+
+    def add(self, alert_id: str, site_id: int, alert_type: str, raised_at: datetime) -> bool:
+        """Index an alert; False if it was already indexed"""
+        if alert_id in self._seen:
+            return False
+        self._seen[alert_id] = site_id
+        self.sites.setdefault(site_id, SiteAlertIndex()).add(alert_id, alert_type, raised_at)
+        if alert_type in self.patterns:
+            heapq.heappush(self._pending, (raised_at, alert_id, site_id, alert_type))
+        return True
+
+    def add_many(self, rows: Iterable[Tuple[str, int, str, datetime]]) -> int:
+        return sum(self.add(*row) for row in rows)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def next_due(self) -> Optional[datetime]:
+        """When the earliest pending root can be matched"""
+        return self._pending[0][0] + self.lateness if self._pending else None
+
+    def drain(self, now: datetime) -> List[Dict]:
+        """AlertCorrelations rows for every root whose lateness has passed, then trim old alerts"""
+        rows = []
+        ready = now - self.lateness
+        while self._pending and self._pending[0][0] <= ready:
+            raised_at, alert_id, site_id, alert_type = heapq.heappop(self._pending)
+            for pattern in self.patterns.get(alert_type, ()):
+                row = self._match(pattern, alert_id, site_id, raised_at)
+                if row is not None:
+                    rows.append(row)
+        self._trim(now - self.horizon)
+        return rows
+
+    def _match(self, pattern: CorrelationPattern, root_alert_id: str, site_id: int,
+               raised_at: datetime) -> Optional[Dict]:
+        index = self.sites.get(site_id)
+        if index is None:
+            return None
+        start = raised_at - pattern.window
+        matched: List[Tuple[datetime, str]] = []
+        type_counts: Dict[str, int] = {}
+        for alert_type in pattern.related_alert_types:
+            alerts = [a for a in index.between(alert_type, start, raised_at) if a[1] != root_alert_id]
+            if alerts:
+                matched.extend(alerts)
+                type_counts[alert_type] = len(alerts)
+        if not matched:
+            return None
+        matched.sort()
+        return {
+            'pattern_id': pattern.pattern_id,
+            'root_alert_id': root_alert_id,
+            'correlated_alerts': [alert_id for _, alert_id in matched],
+            'confidence_score': self.confidence_score,
+            'correlation_data': {'site_id': site_id, 'alert_types': type_counts},
+        }
+
+    def _trim(self, before: datetime):
+        # A pending root keeps its window alive until it has been matched
+        if self._pending:
+            longest = self.horizon - self.lateness
+            before = min(before, self._pending[0][0] - longest)
+        for site_id in list(self.sites):
+            index = self.sites[site_id]
+            for alert_id in index.trim(before):
+                self._seen.pop(alert_id, None)
+            if not len(index):
+                del self.sites[site_id]
+
+
+def encode_correlations(rows: List[Dict]) -> str:
+    """JSON array for usp_AlertCorrelations_BulkInsert"""
+    return json.dumps(rows, separators=(',', ':'))
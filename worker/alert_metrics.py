@@ -0,0 +1,213 @@
+import bisect
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+# Upper bounds (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+
+OUTCOMES = ('received', 'processed', 'failed', 'throttled', 'duplicated')
+
+
+class Histogram:
+    """Cumulative latency histogram in Prometheus bucket layout"""
+
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        out, running = [], 0
+        for bound, n in zip(self.bounds + ('+Inf',), self.counts):
+            running += n
+            out.append((str(bound), running))
+        return out
+
+
+class _HourBucket:
+    __slots__ = OUTCOMES + ('processing_ms_sum', 'processing_samples', 'processing_ms_max')
+
+    def __init__(self):
+        for name in OUTCOMES:
+            setattr(self, name, 0)
+        self.processing_ms_sum = 0.0
+        self.processing_samples = 0
+        self.processing_ms_max = 0.0
+
+
+class _SourceHealth:
+    __slots__ = ('error_count', 'last_success_at', 'last_error_at', 'avg_response_time_ms', 'dirty')
+
+    def __init__(self):
+        self.error_count = 0
+        self.last_success_at: Optional[datetime] = None
+        self.last_error_at: Optional[datetime] = None
+        self.avg_response_time_ms: Optional[float] = None
+        self.dirty = False
+
+
+def _sql_time(value: Optional[datetime]) -> Optional[str]:
+    return value.replace(tzinfo=None).isoformat(timespec='milliseconds') if value else None
+
+
+class AlertMetrics:
+    """In-process alert and poll-health counters.
+
+    Hourly deltas per source are drained by `flush_payload` for one write to
+    app.AlertProcessingMetrics / app.MonitorSources; the cumulative counters
+    and histograms back the Prometheus scrape endpoint. Thread-safe, so
+    callers may record from executor threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hours: Dict[Tuple[int, str, int], _HourBucket] = {}
+        self._health: Dict[int, _SourceHealth] = {}
+        self._totals: Dict[Tuple[int, str], int] = {}
+        self._poll_latency: Dict[int, Histogram] = {}
+        self._processing_latency: Dict[int, Histogram] = {}
+
+    def _bucket(self, source_id: int, at: datetime) -> _HourBucket:
+        key = (source_id, at.date().isoformat(), at.hour)
+        bucket = self._hours.get(key)
+        if bucket is None:
+            bucket = self._hours[key] = _HourBucket()
+        return bucket
+
+    def count(self, source_id: int, outcome: str, n: int = 1, at: Optional[datetime] = None):
+        if not n:
+            return
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            bucket = self._bucket(source_id, at)
+            setattr(bucket, outcome, getattr(bucket, outcome) + n)
+            self._totals[(source_id, outcome)] = self._totals.get((source_id, outcome), 0) + n
+
+    def observe_processing(self, source_id: int, duration_ms: float, at: Optional[datetime] = None):
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            bucket = self._bucket(source_id, at)
+            bucket.processing_ms_sum += duration_ms
+            bucket.processing_samples += 1
+            bucket.processing_ms_max = max(bucket.processing_ms_max, duration_ms)
+            self._processing_latency.setdefault(source_id, Histogram()).observe(duration_ms)
+
+    def record_poll(self, source_id: int, success: bool, response_time_ms: Optional[float] = None,
+                    at: Optional[datetime] = None) -> int:
+        """Update poll health; returns the consecutive error count"""
+        at = at or datetime.now(timezone.utc)
+        with self._lock:
+            health = self._health.setdefault(source_id, _SourceHealth())
+            if success:
+                health.last_success_at = at
+                health.error_count = 0
+                if response_time_ms:
+                    if health.avg_response_time_ms is None:
+                        health.avg_response_time_ms = response_time_ms
+                    else:
+                        health.avg_response_time_ms = 0.9 * health.avg_response_time_ms + 0.1 * response_time_ms
+                    self._poll_latency.setdefault(source_id, Histogram()).observe(response_time_ms)
+            else:
+                health.last_error_at = at
+                health.error_count += 1
+            health.dirty = True
+            return health.error_count
+
+    def error_count(self, source_id: int) -> int:
+        health = self._health.get(source_id)
+        return health.error_count if health else 0
+
+    def flush_payload(self) -> Tuple[List[Dict], List[Dict]]:
+        """Drain hourly deltas and changed health rows as JSON-ready dicts"""
+        with self._lock:
+            hours, self._hours = self._hours, {}
+            changed = [(source_id, h) for source_id, h in self._health.items() if h.dirty]
+            health_rows = []
+            for source_id, health in changed:
+                health.dirty = False
+                health_rows.append({
+                    'source_id': source_id,
+                    'error_count': health.error_count,
+                    'last_error_at': _sql_time(health.last_error_at),
+                    'last_successful_poll_at': _sql_time(health.last_success_at),
+                    'avg_response_time_ms': None if health.avg_response_time_ms is None
+                    else int(round(health.avg_response_time_ms)),
+                })
+        metric_rows = []
+        for (source_id, day, hour), bucket in hours.items():
+            row = {'source_id': source_id, 'processing_date': day, 'processing_hour': hour}
+            row.update({name: getattr(bucket, name) for name in OUTCOMES})
+            row['processing_samples'] = bucket.processing_samples
+            row['processing_ms_sum'] = int(round(bucket.processing_ms_sum))
+            row['processing_ms_max'] = int(round(bucket.processing_ms_max))
+            metric_rows.append(row)
+        return metric_rows, health_rows
+
+    def restore(self, metric_rows: List[Dict], health_rows: List[Dict]):
+        """Put back a payload whose flush failed so the next flush retries it"""
+        with self._lock:
+            for row in metric_rows:
+                key = (row['source_id'], row['processing_date'], row['processing_hour'])
+                bucket = self._hours.setdefault(key, _HourBucket())
+                for name in OUTCOMES:
+                    setattr(bucket, name, getattr(bucket, name) + row[name])
+                bucket.processing_samples += row['processing_samples']
+                bucket.processing_ms_sum += row['processing_ms_sum']
+                bucket.processing_ms_max = max(bucket.processing_ms_max, row['processing_ms_max'])
+            for row in health_rows:
+                self._health.setdefault(row['source_id'], _SourceHealth()).dirty = True
+
+    def render_prometheus(self) -> str:
+        lines = [
+            '# HELP opsgraph_alerts_total Alerts seen by the poller, by outcome',
+            '# TYPE opsgraph_alerts_total counter',
+        ]
+        with self._lock:
+            for (source_id, outcome), value in sorted(self._totals.items()):
+                lines.append(f'opsgraph_alerts_total{{source_id="{source_id}",outcome="{outcome}"}} {value}')
+            lines += [
+                '# HELP opsgraph_source_errors Consecutive failed polls per source',
+                '# TYPE opsgraph_source_errors gauge',
+            ]
+            for source_id, health in sorted(self._health.items()):
+                lines.append(f'opsgraph_source_errors{{source_id="{source_id}"}} {health.error_count}')
+            for name, help_text, histograms in (
+                ('opsgraph_poll_response_ms', 'Vendor poll response time', self._poll_latency),
+                ('opsgraph_alert_processing_ms', 'Poll-to-queue processing time', self._processing_latency),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for source_id, hist in sorted(histograms.items()):
+                    for bound, n in hist.cumulative():
+                        lines.append(f'{name}_bucket{{source_id="{source_id}",le="{bound}"}} {n}')
+                    lines.append(f'{name}_sum{{source_id="{source_id}"}} {hist.sum:g}')
+                    lines.append(f'{name}_count{{source_id="{source_id}"}} {hist.count}')
+        return '\n'.join(lines) + '\n'
+
+
+async def start_metrics_server(metrics: AlertMetrics, host: str = '0.0.0.0', port: int = 9108,
+                               extra: Sequence[Callable[[], str]] = ()) -> web.AppRunner:
+    """Serve `GET /metrics` in Prometheus text format; returns the runner to clean up.
+
+    Each of `extra` renders more metrics, appended after the alert metrics.
+    """
+    async def handle(request: web.Request) -> web.Response:
+        text = metrics.render_prometheus() + ''.join(render() for render in extra)
+        return web.Response(text=text, content_type='text/plain', charset='utf-8')
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -1,78 +1,253 @@
 import asyncio
 import json
 import logging
-from datetime import datetime, timezone
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
 import hashlib
 import numpy as np
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 import aiohttp
 import aioodbc
 import structlog
-from sklearn.base import BaseEstimator
-from sklearn.ensemble import RandomForestClassifier
-import joblib
+
+from alert_cache import (
+    DEFAULT_DUPLICATE_WINDOW_MINS,
+    DEFAULT_THROTTLE_WINDOW_MINS,
+    AlertDedupCache,
+    AlertThrottleCache,
+)
+from alert_correlation import AlertCorrelationEngine, encode_correlations
+from alert_metrics import AlertMetrics, start_metrics_server
+from alert_rules import (
+    CHANGE_PROBE_SQL,
+    MAPPINGS_SINCE_SQL,
+    MAPPINGS_SQL,
+    PROCESSING_RULES_SQL,
+    SOURCE_LIMITS_SQL,
+    THROTTLE_RULES_SQL,
+    AlertRuleRegistry,
+)
+from device_sweep import DeviceStatusSweep
+from maintenance_scoring import (
+    ASSET_FEATURES_SQL,
+    FEATURE_NAMES,
+    asset_features_params,
+    encode_model_predictions,
+    feature_matrix,
+    Scored,
+    prepare_features,
+    score_deployment,
+)
+from model_registry import ACTIVE_MODELS_SQL, Deployment, ModelRegistry
+from monitor_adapters import (
+    STREAM_CHUNK_SIZE,
+    CallableAdapter,
+    get_adapter,
+    iter_json_array,
+    raw_data_text,
+    register_adapter,
+)
+from source_auth import AuthRejected, CredentialCache
 
 logger = structlog.get_logger()
 
+# Alerts per usp_AlertQueue_BulkIngest call
+INGEST_CHUNK_SIZE = 1000
+
+# Polling scheduler
+DEFAULT_POLL_INTERVAL_S = 60
+MAX_CONCURRENT_POLLS = 8
+POLL_TIMEOUT_S = 60
+MAX_POLL_BACKOFF_S = 900
+POLL_JITTER = 0.1
+MAX_START_JITTER_S = 10
+SOURCE_REFRESH_INTERVAL_S = 60
+QUEUE_PROCESS_INTERVAL_S = 15
+DEVICE_SWEEP_CONCURRENCY = 16
+DEVICE_REQUEST_TIMEOUT_S = 10
+METRICS_FLUSH_INTERVAL_S = 60
+CORRELATION_INTERVAL_S = 5
+CORRELATION_LATENESS_S = 30
+RULE_REFRESH_INTERVAL_S = 15
+# Reload every rule table now and then, in case a write committed with an
+# updated_at older than the watermark already read
+RULE_FULL_RELOAD_S = 900
+
+# Batch maintenance scoring
+PREDICTION_INTERVAL_S = 3600
+SCORING_WORKERS = 2
+PREDICTION_THRESHOLD = 0.7
+PREDICTION_WINDOW_DAYS = 7
+# Predictions per usp_MaintenancePredictions_BulkRecordModel call
+PREDICTION_CHUNK_SIZE = 1000
+
+
+def encode_alert_batch(alerts: List[Dict]) -> str:
+    """JSON array for usp_AlertQueue_BulkIngest.
+
+    Each alert needs a `hash_signature` (bytes); its `raw_data` is already a
+    JSON document (the vendor's bytes, or text) and is spliced in as-is
+    rather than decoded and re-encoded.
+    `asset_id`, `processing_rule_id` and `duplicate_window_mins` come from
+    the rule registry and are null when it has nothing for the alert.
+    """
+    items = []
+    for alert in alerts:
+        head = json.dumps({
+            'external_id': str(alert['external_id']),
+            'external_asset_id': str(alert['external_asset_id']),
+            'alert_type': alert['alert_type'],
+            'severity': alert['severity'],
+            'message': alert['message'],
+            'hash_signature': alert['hash_signature'].hex(),
+            'asset_id': alert.get('asset_id'),
+            'processing_rule_id': alert.get('processing_rule_id'),
+            'duplicate_window_mins': alert.get('duplicate_window_mins'),
+        })
+        items.append(f'{head[:-1]}, "raw_data": {raw_data_text(alert["raw_data"])}}}')
+    return '[' + ','.join(items) + ']'
+
 class MonitoringManager:
-    def __init__(self, db_conn_str: str):
+    """Poll health and alert counters per source.
+
+    Everything is buffered in `metrics`; `flush()` writes the hourly deltas to
+    app.AlertProcessingMetrics and the health of changed sources to
+    app.MonitorSources in one call of app.usp_AlertMetrics_Flush.
+    """
+
+    def __init__(self, db_conn_str: str, metrics: Optional[AlertMetrics] = None):
         self.db_conn_str = db_conn_str
-        self.source_metrics = {}
-        
-    async def record_poll_attempt(self, source_id: int, success: bool, 
-                                response_time_ms: Optional[int] = None, 
-                                error_msg: Optional[str] = None):
-        now = datetime.now(timezone.utc)
-        metrics = self.source_metrics.setdefault(source_id, {
-            'error_count': 0,
-            'last_success': None,
-            'avg_response_time': None
-        })
-        
-        if success:
-            metrics['last_success'] = now
-            if response_time_ms:
-                if metrics['avg_response_time'] is None:
-                    metrics['avg_response_time'] = response_time_ms
-                else:
-                    metrics['avg_response_time'] = (
-                        0.9 * metrics['avg_response_time'] + 0.1 * response_time_ms
+        self.metrics = metrics or AlertMetrics()
+
+    def next_poll_delay(self, source_id: int, interval_s: float) -> float:
+        """Seconds until the next poll: the source interval, doubled per consecutive failure"""
+        errors = self.metrics.error_count(source_id)
+        if not errors:
+            return interval_s
+        return max(interval_s, min(interval_s * 2 ** errors, MAX_POLL_BACKOFF_S))
+
+    def record_poll_attempt(self, source_id: int, success: bool,
+                            response_time_ms: Optional[int] = None):
+        self.metrics.record_poll(source_id, success, response_time_ms)
+
+    async def flush(self):
+        metric_rows, health_rows = self.metrics.flush_payload()
+        if not metric_rows and not health_rows:
+            return
+        try:
+            async with aioodbc.connect(self.db_conn_str) as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "EXEC app.usp_AlertMetrics_Flush @Metrics=?, @Health=?",
+                        (json.dumps(metric_rows), json.dumps(health_rows))
                     )
-            metrics['error_count'] = 0
-        else:
-            metrics['error_count'] += 1
-            
-        # Update database
+                    await conn.commit()
+        except Exception:
+            self.metrics.restore(metric_rows, health_rows)
+            raise
+
+    async def run_flush(self, interval_s: float = METRICS_FLUSH_INTERVAL_S):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error("Error flushing alert metrics", error=str(e))
+
+class AlertCorrelator:
+    """Feed new alerts to an AlertCorrelationEngine and record its matches.
+
+    Alerts are read from app.Alerts by their own rowversion, between the
+    previous watermark and MIN_ACTIVE_ROWVERSION(), so each poll reads only
+    new alerts, including those promoted from older events. Their app.Events
+    row gives the site and the alert type (the event's canonical_code). Matches are written in bulk with
+    app.usp_AlertCorrelations_BulkInsert and kept for the next poll if the
+    write fails.
+    """
+
+    def __init__(self, db_conn_str: str, lateness_s: float = CORRELATION_LATENESS_S):
+        self.db_conn_str = db_conn_str
+        self.engine = AlertCorrelationEngine(lateness_s)
+        self.watermark = bytes(8)
+        self._unsent: List[Dict] = []
+
+    async def load_patterns(self):
         async with aioodbc.connect(self.db_conn_str) as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute("""
-                    UPDATE app.MonitorSources 
-                    SET last_error_at = CASE WHEN ? = 0 THEN SYSUTCDATETIME() ELSE last_error_at END,
-                        error_count = ?,
-                        health_status = CASE 
-                            WHEN ? = 1 THEN 'Healthy'
-                            WHEN ? >= 3 THEN 'Failed'
-                            ELSE 'Degraded'
-                        END,
-                        last_successful_poll_at = CASE WHEN ? = 1 THEN SYSUTCDATETIME() ELSE last_successful_poll_at END,
-                        avg_response_time_ms = ?
-                    WHERE source_id = ?
-                """, (
-                    success, 
-                    metrics['error_count'],
-                    success,
-                    metrics['error_count'],
-                    success,
-                    metrics['avg_response_time'],
-                    source_id
-                ))
-                await conn.commit()
+                    SELECT pattern_id, root_alert_type, related_alert_types, correlation_window_mins
+                    FROM app.AlertCorrelationPatterns
+                    WHERE is_active = 1
+                """)
+                self.engine.load_patterns(await cursor.fetchall())
+
+    async def poll(self, now: Optional[datetime] = None) -> int:
+        """Read new alerts, record finished correlations; returns rows recorded"""
+        async with aioodbc.connect(self.db_conn_str) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))")
+                high = (await cursor.fetchone())[0]
+                await cursor.execute("""
+                    SELECT a.alert_id, e.site_id, e.canonical_code, a.raised_at
+                    FROM app.Alerts a
+                    JOIN app.Events e ON e.event_id = a.event_id
+                    WHERE a.raised_at >= DATEADD(SECOND, -?, SYSUTCDATETIME())
+                    AND a.rowversion >= ?
+                    AND a.rowversion < ?
+                """, (int(self.engine.horizon.total_seconds()), self.watermark, high))
+                self.engine.add_many(tuple(row) for row in await cursor.fetchall())
+                self.watermark = high
+
+                now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+                rows = self._unsent + self.engine.drain(now)
+                self._unsent = []
+                if not rows:
+                    return 0
+                try:
+                    await cursor.execute(
+                        "EXEC app.usp_AlertCorrelations_BulkInsert @Correlations=?",
+                        (encode_correlations(rows),)
+                    )
+                    inserted = (await cursor.fetchone())[0] or 0
+                    await conn.commit()
+                except Exception:
+                    self._unsent = rows
+                    raise
+        logger.info("Alert correlations recorded", matched=len(rows), inserted=inserted)
+        return inserted
+
+    async def run(self, interval_s: float = CORRELATION_INTERVAL_S):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.error("Error correlating alerts", error=str(e))
+            await asyncio.sleep(interval_s)
 
 class AlertProcessor:
-    def __init__(self, db_conn_str: str):
+    """Throttling and deduplication for incoming alerts.
+
+    Both checks are answered from in-process caches mirroring
+    app.usp_CheckAlertThrottling and app.usp_CheckAlertDuplication, so only
+    alerts that survive them cost a database round trip. The poller filters
+    each polled batch through them before its bulk insert. Throttle rules come
+    from the shared `throttle` cache, which the poller's AlertRuleRegistry
+    keeps loaded; call `warm()` once those rules are loaded.
+    """
+
+    def __init__(self, db_conn_str: str, metrics: Optional[AlertMetrics] = None,
+                 throttle: Optional[AlertThrottleCache] = None):
         self.db_conn_str = db_conn_str
+        self.metrics = metrics or AlertMetrics()
+        self.throttle = throttle or AlertThrottleCache()
+        self.dedup = AlertDedupCache()
         
-    def compute_alert_hash(self, alert: Dict) -> bytes:
+    @staticmethod
+    def compute_alert_hash(alert: Dict) -> bytes:
         """Compute deterministic hash for alert deduplication"""
         key_fields = [
             str(alert.get('source_id')),
@@ -81,197 +256,276 @@ class AlertProcessor:
             alert.get('message', '')
         ]
         return hashlib.sha256('|'.join(key_fields).encode()).digest()
-        
-    async def check_throttling(self, source_id: int, alert_type: str) -> bool:
-        """Check if alert should be throttled"""
+
+    async def warm(self):
+        """Seed both caches from recent AlertQueue rows"""
+        windows = [DEFAULT_DUPLICATE_WINDOW_MINS, DEFAULT_THROTTLE_WINDOW_MINS] + [
+            max(r.duplicate_window_mins, r.throttle_window_mins)
+            for rules in self.throttle.rules.values() for r in rules
+        ]
         async with aioodbc.connect(self.db_conn_str) as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "EXEC app.usp_CheckAlertThrottling @SourceId=?, @AlertType=?",
-                    (source_id, alert_type)
-                )
-                result = await cursor.fetchone()
-                return bool(result[0]) if result else False
+                await cursor.execute("""
+                    SELECT source_id, alert_type, hash_signature, received_at, suppressed
+                    FROM app.AlertQueue
+                    WHERE received_at >= DATEADD(MINUTE, -?, SYSUTCDATETIME())
+                    ORDER BY received_at
+                """, (max(windows),))
+                rows = await cursor.fetchall()
+
+        now = datetime.now(timezone.utc).timestamp()
+        for source_id, alert_type, hash_signature, received_at, suppressed in rows:
+            received = received_at.replace(tzinfo=timezone.utc).timestamp()
+            if hash_signature:
+                expires_at = received + self.duplicate_window_s(source_id, alert_type)
+                if expires_at > now:
+                    self.dedup.add(bytes(hash_signature), expires_at)
+            if not suppressed:
+                self.throttle.record(source_id, alert_type, received)
+        logger.info("Alert caches warmed", rows=len(rows), hashes=len(self.dedup))
+
+    def duplicate_window_s(self, source_id: int, alert_type: str) -> float:
+        """Duplicate window of the first matching rule that suppresses duplicates"""
+        for rule in self.throttle.matching_rules(source_id, alert_type):
+            if rule.suppress_duplicates:
+                return rule.duplicate_window_mins * 60.0
+        return DEFAULT_DUPLICATE_WINDOW_MINS * 60.0
+        
+    def check_throttling(self, source_id: int, alert_type: str) -> Optional[float]:
+        """Reserve a throttle slot for the alert; None if it should be throttled"""
+        return self.throttle.reserve(source_id, alert_type)
                 
-    async def check_duplication(self, source_id: int, alert_type: str, 
-                              payload: str, hash_signature: bytes) -> bool:
-        """Check if alert is a duplicate"""
-        async with aioodbc.connect(self.db_conn_str) as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "EXEC app.usp_CheckAlertDuplication @SourceId=?, @AlertType=?, @Payload=?, @HashSignature=?",
-                    (source_id, alert_type, payload, hash_signature)
-                )
-                result = await cursor.fetchone()
-                return bool(result[0]) if result else False
+    def check_duplication(self, source_id: int, alert_type: str,
+                          hash_signature: bytes) -> bool:
+        """Check if alert is a duplicate; remembers the signature if it is not"""
+        return self.dedup.seen(hash_signature, self.duplicate_window_s(source_id, alert_type))
 
     async def process_alert(self, alert: Dict) -> bool:
-        """Process a single alert with throttling and deduplication"""
+        """Process a single alert with throttling and deduplication.
+
+        The throttle slot and the signature are taken before the insert, so
+        concurrent alerts see each other, and both are given back if the
+        insert fails so a retry is not dropped.
+        """
+        source_id, alert_type = alert['source_id'], alert['alert_type']
         hash_sig = self.compute_alert_hash(alert)
-        
+        self.metrics.count(source_id, 'received')
+
         # Check throttling
-        if await self.check_throttling(alert['source_id'], alert['alert_type']):
+        slot = self.check_throttling(source_id, alert_type)
+        if slot is None:
             logger.warning("Alert throttled", 
-                         source_id=alert['source_id'],
-                         alert_type=alert['alert_type'])
+                         source_id=source_id,
+                         alert_type=alert_type)
+            self.metrics.count(source_id, 'throttled')
             return False
             
         # Check duplication
-        if await self.check_duplication(
-            alert['source_id'], 
-            alert['alert_type'],
-            json.dumps(alert),
-            hash_sig
-        ):
+        if self.check_duplication(source_id, alert_type, hash_sig):
+            self.throttle.release(source_id, alert_type, slot)
             logger.info("Duplicate alert detected",
-                       source_id=alert['source_id'],
-                       alert_type=alert['alert_type'])
+                       source_id=source_id,
+                       alert_type=alert_type)
+            self.metrics.count(source_id, 'duplicated')
             return False
             
         # Process alert
-        async with aioodbc.connect(self.db_conn_str) as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    INSERT INTO app.AlertQueue (
-                        source_id, external_id, external_asset_id,
-                        alert_type, severity, message, raw_data,
-                        hash_signature
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    alert['source_id'],
-                    alert['external_id'],
-                    alert['external_asset_id'],
-                    alert['alert_type'],
-                    alert['severity'],
-                    alert['message'],
-                    json.dumps(alert),
-                    hash_sig
-                ))
-                await conn.commit()
-                return True
+        try:
+            async with aioodbc.connect(self.db_conn_str) as conn:
+                async with conn.cursor() as cursor:
+                    await cursor.execute("""
+                        INSERT INTO app.AlertQueue (
+                            source_id, external_id, external_asset_id,
+                            alert_type, severity, message, raw_data,
+                            hash_signature
+                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        source_id,
+                        alert['external_id'],
+                        alert['external_asset_id'],
+                        alert_type,
+                        alert['severity'],
+                        alert['message'],
+                        raw_data_text(alert['raw_data']) if 'raw_data' in alert else json.dumps(alert),
+                        hash_sig
+                    ))
+                    await conn.commit()
+        except BaseException:
+            self.throttle.release(source_id, alert_type, slot)
+            self.dedup.discard(hash_sig)
+            self.metrics.count(source_id, 'failed')
+            raise
+        self.metrics.count(source_id, 'processed')
+        return True
 
 class MaintenancePredictor:
+    """Scores every asset of each modelled type in one batch per model.
+
+    Features for all assets of a type come from one ASSET_FEATURES_SQL
+    query, `predict_proba` runs once over the whole matrix in a process
+    pool so scoring never blocks the event loop, and every prediction at or
+    above the threshold is recorded in one usp_MaintenancePredictions_BulkRecordModel
+    call per chunk.
+
+    Deployments are tracked by a ModelRegistry keyed by (model_id, artifact
+    checksum); only the pool processes load models, memory-mapped, and each
+    drops the ones no longer deployed.
+    """
+
     def __init__(self, db_conn_str: str):
         self.db_conn_str = db_conn_str
-        self.models: Dict[str, BaseEstimator] = {}
-        
+        self.registry = ModelRegistry()
+        self._scoring_pool: Optional[Executor] = None
+
+    def _pool(self) -> Executor:
+        if self._scoring_pool is None:
+            # spawn, not fork: the poller has threads (aioodbc) that fork would copy mid-flight
+            self._scoring_pool = ProcessPoolExecutor(
+                SCORING_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return self._scoring_pool
+
+    def close(self):
+        if self._scoring_pool is not None:
+            self._scoring_pool.shutdown(wait=False, cancel_futures=True)
+            self._scoring_pool = None
+
     async def load_active_models(self):
-        """Load all active ML models"""
+        """Swap in the active deployments; unchanged artifacts are not re-read"""
         async with aioodbc.connect(self.db_conn_str) as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    SELECT model_id, asset_type, model_artifacts_path
-                    FROM app.MaintenanceModels m
-                    JOIN app.ModelDeployments d ON m.model_id = d.model_id
-                    WHERE m.is_active = 1
-                    AND d.deployment_status = 'Active'
-                """)
-                models = await cursor.fetchall()
-                
-                for model_id, asset_type, artifacts_path in models:
-                    try:
-                        self.models[asset_type] = joblib.load(artifacts_path)
-                        logger.info(f"Loaded model for {asset_type}")
-                    except Exception as e:
-                        logger.error(f"Error loading model for {asset_type}: {str(e)}")
-                        
+                await cursor.execute(ACTIVE_MODELS_SQL)
+                rows = [tuple(row) for row in await cursor.fetchall()]
+        await asyncio.get_running_loop().run_in_executor(None, self.registry.sync, rows)
+
+    async def predict_fleet(self) -> int:
+        """Score every asset of each modelled type; returns predictions recorded"""
+        await self.load_active_models()
+        recorded = 0
+        for deployment in list(self.registry.deployments.values()):
+            try:
+                recorded += await self.predict_asset_type(deployment)
+            except Exception as e:
+                logger.error("Error scoring assets", asset_type=deployment.asset_type, error=str(e))
+        return recorded
+
+    async def predict_asset_type(self, deployment: Deployment) -> int:
+        async with aioodbc.connect(self.db_conn_str) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(ASSET_FEATURES_SQL, asset_features_params(deployment.asset_type))
+                asset_ids, features = feature_matrix(await cursor.fetchall())
+        if not len(asset_ids):
+            return 0
+
+        started = time.monotonic()
+        hit, confidence, importance = await self._score(deployment, features)
+        logger.info("Scored assets", asset_type=deployment.asset_type, assets=len(asset_ids),
+                    predictions=len(hit), seconds=round(time.monotonic() - started, 3))
+        return await self._record(deployment.model_id, asset_ids[hit], confidence, importance)
+
+    async def _score(self, deployment: Deployment, features: np.ndarray) -> Scored:
+        scored, load = await asyncio.get_running_loop().run_in_executor(
+            self._pool(), score_deployment, deployment, features, PREDICTION_THRESHOLD,
+            self.registry.live_keys())
+        if load is not None:
+            self.registry.record_load(deployment.key, load)
+        return scored
+
+    async def _record(self, model_id: int, asset_ids: np.ndarray, confidence: np.ndarray,
+                      importance: Optional[np.ndarray]) -> int:
+        if not len(asset_ids):
+            return 0
+        predicted_failure_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=PREDICTION_WINDOW_DAYS)
+        recorded = 0
+        async with aioodbc.connect(self.db_conn_str) as conn:
+            async with conn.cursor() as cursor:
+                for start in range(0, len(asset_ids), PREDICTION_CHUNK_SIZE):
+                    chunk = slice(start, start + PREDICTION_CHUNK_SIZE)
+                    await cursor.execute(
+                        "EXEC app.usp_MaintenancePredictions_BulkRecordModel @ModelId=?, @Predictions=?",
+                        (model_id, encode_model_predictions(
+                            asset_ids[chunk], confidence[chunk],
+                            importance[chunk] if importance is not None else None,
+                            predicted_failure_at))
+                    )
+                    recorded += (await cursor.fetchone())[0] or 0
+                    await conn.commit()
+        return recorded
+
     async def predict_maintenance(self, asset_id: int, features: Dict) -> Optional[Dict]:
         """Generate maintenance prediction for an asset"""
         async with aioodbc.connect(self.db_conn_str) as conn:
             async with conn.cursor() as cursor:
-                # Get asset type
                 await cursor.execute(
                     "SELECT type FROM app.Assets WHERE asset_id = ?",
                     (asset_id,)
                 )
                 result = await cursor.fetchone()
-                if not result:
-                    return None
-                    
-                asset_type = result[0]
-                if asset_type not in self.models:
-                    return None
-                    
-                # Generate prediction
-                model = self.models[asset_type]
-                feature_vector = self._prepare_features(features)
-                prediction = model.predict_proba([feature_vector])[0]
-                confidence = float(max(prediction))
-                
-                if confidence >= 0.7:  # Configurable threshold
-                    feature_importance = self._get_feature_importance(
-                        model, features, prediction
-                    )
-                    
-                    # Record prediction
-                    await cursor.execute("""
-                        INSERT INTO app.MaintenancePredictions (
-                            asset_id, predicted_failure_at,
-                            confidence_score, feature_importance,
-                            prediction_explanation
-                        ) VALUES (?, DATEADD(DAY, 7, SYSUTCDATETIME()),
-                                ?, ?, ?)
-                    """, (
-                        asset_id,
-                        confidence * 100,
-                        json.dumps(feature_importance),
-                        self._generate_explanation(feature_importance)
-                    ))
-                    await conn.commit()
-                    
-                    return {
-                        'asset_id': asset_id,
-                        'confidence': confidence,
-                        'features': feature_importance,
-                        'prediction_window': '7 days'
-                    }
-                
-        return None
+        deployment = self.registry.get(result[0]) if result else None
+        if deployment is None:
+            return None
+
+        hit, confidence, importance = await self._score(
+            deployment, self._prepare_features(features)[np.newaxis, :])
+        if not len(hit):
+            return None
+
+        await self._record(deployment.model_id, np.array([asset_id]), confidence, importance)
+        return {
+            'asset_id': asset_id,
+            'confidence': float(confidence[0]),
+            'features': self._get_feature_importance(importance)[0],
+            'prediction_window': f'{PREDICTION_WINDOW_DAYS} days'
+        }
         
     def _prepare_features(self, features: Dict) -> np.ndarray:
         """Prepare feature vector for model input"""
-        # Implementation depends on feature engineering pipeline
-        pass
-        
-    def _get_feature_importance(self, model: BaseEstimator, 
-                              features: Dict, prediction: np.ndarray) -> Dict:
-        """Calculate feature importance for the prediction"""
-        if hasattr(model, 'feature_importances_'):
-            importances = model.feature_importances_
-            return {
-                name: float(imp) 
-                for name, imp in zip(features.keys(), importances)
-            }
-        return {}
-        
-    def _generate_explanation(self, feature_importance: Dict) -> str:
-        """Generate human-readable explanation of prediction"""
-        top_features = sorted(
-            feature_importance.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:3]
+        return prepare_features(features)
         
-        explanation = "Prediction based on: "
-        explanation += ", ".join(
-            f"{feature} (importance: {importance:.2f})"
-            for feature, importance in top_features
-        )
-        return explanation
+    def _get_feature_importance(self, importance: Optional[np.ndarray]) -> List[Dict]:
+        """Feature importance of each scored row, keyed by feature name"""
+        if importance is None:
+            return [{}]
+        return [dict(zip(FEATURE_NAMES, map(float, row))) for row in importance]
 
 class AlertPoller:
-    def __init__(self, db_conn_str: str):
+    def __init__(self, db_conn_str: str, metrics_port: Optional[int] = None):
         self.db_conn_str = db_conn_str
+        self.metrics_port = metrics_port
         self.session = None
         self.monitor_sources: Dict[int, Dict] = {}
+        self.monitoring = MonitoringManager(db_conn_str)
+        self._poll_slots = asyncio.Semaphore(MAX_CONCURRENT_POLLS)
+        self._source_tasks: Dict[int, asyncio.Task] = {}
+        self._device_sweeps: Dict[int, DeviceStatusSweep] = {}
+        self.credentials = CredentialCache()
+        self.correlator = AlertCorrelator(db_conn_str)
+        self.rules = AlertRuleRegistry()
+        self._rules_full_load_at = 0.0
+        self.processor = AlertProcessor(db_conn_str, self.monitoring.metrics, throttle=self.rules.throttle)
+        self.predictor = MaintenancePredictor(db_conn_str)
         
     async def setup(self):
         """Initialize HTTP session and load monitor sources"""
         self.session = aiohttp.ClientSession()
         await self.refresh_monitor_sources()
+        await self.correlator.load_patterns()
+        await self.refresh_rules()
+        try:
+            await self.processor.warm()
+        except Exception as e:
+            logger.error("Error warming alert caches", error=str(e))
         
     async def cleanup(self):
         """Cleanup resources"""
+        for task in self._source_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._source_tasks.values(), return_exceptions=True)
+        self._source_tasks.clear()
+        try:
+            await self.monitoring.flush()
+        except Exception as e:
+            logger.error("Error flushing alert metrics", error=str(e))
+        self.predictor.close()
         if self.session:
             await self.session.close()
             
@@ -286,118 +540,105 @@ class AlertPoller:
                     WHERE is_active = 1
                 """)
                 rows = await cursor.fetchall()
-                
-                self.monitor_sources = {
-                    row[0]: {
-                        'name': row[1],
-                        'api_base_url': row[2],
-                        'auth_type': row[3],
-                        'auth_config': json.loads(row[4]) if row[4] else {},
-                        'polling_interval': row[5]
-                    }
-                    for row in rows
-                }
-                
+
+        for row in rows:
+            self.credentials.configure(row[0], row[2], row[3], row[4])
+        self.credentials.retain(row[0] for row in rows)
+        self.monitor_sources = {
+            row[0]: {
+                'name': row[1],
+                'api_base_url': row[2],
+                'auth_type': row[3],
+                'polling_interval': row[5]
+            }
+            for row in rows
+        }
+
+    async def refresh_rules(self):
+        """Reload the alert rule tables and asset mappings that changed since the last refresh"""
+        rules = self.rules
+        if time.monotonic() - self._rules_full_load_at > RULE_FULL_RELOAD_S:
+            rules.versions.clear()
+            self._rules_full_load_at = time.monotonic()
+        async with aioodbc.connect(self.db_conn_str) as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(CHANGE_PROBE_SQL)
+                changed = rules.changed(await cursor.fetchall())
+                if 'processing_rules' in changed:
+                    await cursor.execute(PROCESSING_RULES_SQL)
+                    rules.load_processing_rules(await cursor.fetchall(), changed['processing_rules'])
+                if 'sources' in changed:
+                    await cursor.execute(SOURCE_LIMITS_SQL)
+                    rules.load_source_limits(await cursor.fetchall(), changed['sources'])
+                if 'throttle_rules' in changed:
+                    await cursor.execute(THROTTLE_RULES_SQL)
+                    rules.load_throttle_rules(await cursor.fetchall(), changed['throttle_rules'])
+                if 'mappings' in changed:
+                    since = rules.mapping_watermark(changed['mappings'])
+                    if since is None:
+                        await cursor.execute(MAPPINGS_SQL)
+                    else:
+                        await cursor.execute(MAPPINGS_SINCE_SQL, (since,))
+                    rules.load_mappings(await cursor.fetchall(), changed['mappings'], incremental=since is not None)
+        if changed:
+            logger.info("Alert rules reloaded", tables=sorted(changed), mappings=len(rules.mappings))
+
+    async def run_rule_refresh(self, interval_s: float = RULE_REFRESH_INTERVAL_S):
+        while True:
+            await asyncio.sleep(interval_s)
+            try:
+                await self.refresh_rules()
+            except Exception as e:
+                logger.error("Error refreshing alert rules", error=str(e))
+
+    async def run_predictions(self, interval_s: float = PREDICTION_INTERVAL_S):
+        while True:
+            try:
+                recorded = await self.predictor.predict_fleet()
+                logger.info("Maintenance predictions recorded", count=recorded)
+            except Exception as e:
+                logger.error("Error predicting maintenance", error=str(e))
+            await asyncio.sleep(interval_s)
+
+    def enrich_alert(self, source_id: int, alert: Dict):
+        """Resolve the alert's asset, processing rule and duplicate window before it is queued"""
+        if not self.rules.versions:
+            return
+        resolution = self.rules.resolve(source_id, alert['external_asset_id'], alert['alert_type'])
+        alert['asset_id'] = resolution.asset_id
+        alert['processing_rule_id'] = resolution.rule.rule_id if resolution.rule else None
+        alert['duplicate_window_mins'] = resolution.duplicate_window_mins
+
     async def get_auth_headers(self, source_id: int) -> Dict[str, str]:
         """Get authentication headers for a monitor source"""
-        source = self.monitor_sources[source_id]
-        auth_type = source['auth_type']
-        config = source['auth_config']
-        
-        if auth_type == 'ApiKey':
-            return {config['header_name']: config['key']}
-        
-        elif auth_type == 'OAuth2':
-            # Get or refresh OAuth token
-            async with self.session.post(
-                f"{source['api_base_url']}{config['token_url']}",
-                data={
-                    'client_id': config['client_id'],
-                    'client_secret': config['client_secret'],
-                    'grant_type': 'client_credentials'
-                }
-            ) as resp:
-                token_data = await resp.json()
-                return {'Authorization': f"Bearer {token_data['access_token']}"}
-                
-        elif auth_type == 'Basic':
-            return {
-                'Authorization': f"Basic {config['username']}:{config['password']}"
-            }
-            
-        return {}
+        return await self.credentials.headers(self.session, source_id)
 
-    async def poll_insight360(self, source_id: int):
-        """Poll Insight360 alerts"""
+    async def stream_json_array(self, source_id: int, path: str):
+        """GET a vendor endpoint returning a JSON array; yields each element's raw bytes as it arrives"""
         headers = await self.get_auth_headers(source_id)
         source = self.monitor_sources[source_id]
-        
-        async with self.session.get(
-            f"{source['api_base_url']}/alerts",
-            headers=headers
-        ) as resp:
-            alerts = await resp.json()
-            return [
-                {
-                    'external_id': alert['id'],
-                    'external_asset_id': alert['deviceId'],
-                    'alert_type': alert['type'],
-                    'severity': alert['severity'],
-                    'message': alert['message'],
-                    'raw_data': json.dumps(alert)
-                }
-                for alert in alerts
-            ]
-
-    async def poll_franklin_monitors(self, source_id: int):
-        """Poll FranklinMonitors alerts"""
-        headers = await self.get_auth_headers(source_id)
-        source = self.monitor_sources[source_id]
-        
-        async with self.session.get(
-            f"{source['api_base_url']}/alerts/active",
-            headers=headers
-        ) as resp:
-            alerts = await resp.json()
-            return [
-                {
-                    'external_id': alert['alertId'],
-                    'external_asset_id': alert['assetId'],
-                    'alert_type': alert['alertType'],
-                    'severity': alert['severity'],
-                    'message': alert['description'],
-                    'raw_data': json.dumps(alert)
-                }
-                for alert in alerts
-            ]
-
-    async def poll_temp_ticks(self, source_id: int):
-        """Poll TempTicks alerts"""
-        headers = await self.get_auth_headers(source_id)
-        source = self.monitor_sources[source_id]
-        
-        async with self.session.get(
-            f"{source['api_base_url']}/temperatures/alerts",
-            headers=headers
-        ) as resp:
-            alerts = await resp.json()
-            return [
-                {
-                    'external_id': alert['id'],
-                    'external_asset_id': alert['sensorId'],
-                    'alert_type': 'TemperatureAlert',
-                    'severity': 'High' if alert['level'] > 1 else 'Medium',
-                    'message': f"Temperature {alert['temp']}°F exceeds threshold",
-                    'raw_data': json.dumps(alert)
-                }
-                for alert in alerts
-            ]
+        async with self.session.get(f"{source['api_base_url']}{path}", headers=headers) as resp:
+            if resp.status == 401:
+                raise AuthRejected(f"{source['name']} rejected credentials")
+            resp.raise_for_status()
+            async for element in iter_json_array(resp.content.iter_chunked(STREAM_CHUNK_SIZE)):
+                yield element
+
+    def device_sweep(self, source_id: int) -> DeviceStatusSweep:
+        """Sweep state (ETags, last-known online state) for a TeamViewer source"""
+        base_url = self.monitor_sources[source_id]['api_base_url']
+        sweep = self._device_sweeps.get(source_id)
+        if sweep is None or sweep.session is not self.session or sweep.base_url != base_url.rstrip('/'):
+            sweep = DeviceStatusSweep(self.session, base_url,
+                                      concurrency=DEVICE_SWEEP_CONCURRENCY,
+                                      timeout_s=DEVICE_REQUEST_TIMEOUT_S)
+            self._device_sweeps[source_id] = sweep
+        return sweep
 
     async def poll_teamviewer(self, source_id: int):
-        """Poll TeamViewer device status"""
+        """Poll TeamViewer device status; alerts only on online -> offline transitions"""
         headers = await self.get_auth_headers(source_id)
-        source = self.monitor_sources[source_id]
-        
+
         # First get all mapped devices
         async with aioodbc.connect(self.db_conn_str) as conn:
             async with conn.cursor() as cursor:
@@ -408,113 +649,220 @@ class AlertPoller:
                 """, (source_id,))
                 device_ids = [row[0] for row in await cursor.fetchall()]
 
-        # Check status for each device
-        alerts = []
-        for device_id in device_ids:
-            async with self.session.get(
-                f"{source['api_base_url']}/devices/{device_id}",
-                headers=headers
-            ) as resp:
-                if resp.status == 200:
-                    device = await resp.json()
-                    if not device.get('online', False):
-                        alerts.append({
-                            'external_id': f"offline_{device_id}_{datetime.now(timezone.utc).isoformat()}",
-                            'external_asset_id': device_id,
-                            'alert_type': 'DeviceOffline',
-                            'severity': 'Medium',
-                            'message': f"Device {device.get('alias', device_id)} is offline",
-                            'raw_data': json.dumps(device)
-                        })
-        
-        return alerts
+        sweep = self.device_sweep(source_id)
+        statuses = await sweep.sweep(device_ids, headers)
+        return [
+            {
+                'external_id': f"offline_{device_id}_{offline_since}",
+                'external_asset_id': device_id,
+                'alert_type': 'DeviceOffline',
+                'severity': 'Medium',
+                'message': f"Device {device.get('alias', device_id)} is offline",
+                'raw_data': json.dumps(device)
+            }
+            for device_id, device, offline_since in sweep.offline_transitions(statuses)
+        ]
+
+    def admit_alerts(self, source_id: int, alerts: List[Dict]) -> Tuple[List[Tuple[Dict, float]], int, int]:
+        """Alerts that pass the processor's throttle and dedup caches, with their throttle slots.
+
+        Returns (admitted, throttled, duplicates).
+        """
+        admitted = []
+        throttled = duplicates = 0
+        for alert in alerts:
+            alert_type = alert['alert_type']
+            slot = self.processor.check_throttling(source_id, alert_type)
+            if slot is None:
+                throttled += 1
+                continue
+            if self.processor.check_duplication(source_id, alert_type, alert['hash_signature']):
+                self.processor.throttle.release(source_id, alert_type, slot)
+                duplicates += 1
+                continue
+            admitted.append((alert, slot))
+        if throttled:
+            logger.warning("Alerts throttled", source_id=source_id, count=throttled)
+            self.monitoring.metrics.count(source_id, 'throttled', throttled)
+        return admitted, throttled, duplicates
+
+    def release_alerts(self, source_id: int, admitted: List[Tuple[Dict, float]]):
+        """Give back the throttle slots and signatures of alerts that were not queued"""
+        for alert, slot in admitted:
+            self.processor.throttle.release(source_id, alert['alert_type'], slot)
+            self.processor.dedup.discard(alert['hash_signature'])
 
-    async def insert_alerts(self, source_id: int, alerts: List[Dict]):
-        """Insert alerts into the queue"""
+    async def insert_alerts(self, source_id: int, alerts: List[Dict]) -> Tuple[int, int]:
+        """Insert alerts into the queue in bulk, folding duplicates server-side.
+
+        Alerts are first filtered through the processor's throttle and dedup
+        caches, so a storm is cut before it reaches the database. Slots and
+        signatures of chunks that fail to insert are released, so the next
+        poll can queue them. Returns (inserted, duplicates).
+        """
         if not alerts:
-            return
-            
-        async with aioodbc.connect(self.db_conn_str) as conn:
-            async with conn.cursor() as cursor:
-                for alert in alerts:
-                    await cursor.execute("""
-                        INSERT INTO app.AlertQueue (
-                            source_id, external_id, external_asset_id,
-                            alert_type, severity, message, raw_data
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        source_id,
-                        alert['external_id'],
-                        alert['external_asset_id'],
-                        alert['alert_type'],
-                        alert['severity'],
-                        alert['message'],
-                        alert['raw_data']
-                    ))
-                await conn.commit()
+            return 0, 0
 
-    async def update_last_poll(self, source_id: int):
-        """Update last_poll_at timestamp"""
-        async with aioodbc.connect(self.db_conn_str) as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute("""
-                    UPDATE app.MonitorSources 
-                    SET last_poll_at = SYSUTCDATETIME()
-                    WHERE source_id = ?
-                """, (source_id,))
-                await conn.commit()
+        for alert in alerts:
+            alert['hash_signature'] = AlertProcessor.compute_alert_hash({**alert, 'source_id': source_id})
+        admitted, _, duplicates = self.admit_alerts(source_id, alerts)
+        for alert, _ in admitted:
+            self.enrich_alert(source_id, alert)
+        if not admitted:
+            return 0, duplicates
 
-    async def poll_source(self, source_id: int):
-        """Poll a specific monitor source"""
+        inserted = start = 0
         try:
-            source = self.monitor_sources[source_id]
-            
-            # Select appropriate polling method
-            if source['name'] == 'Insight360':
-                alerts = await self.poll_insight360(source_id)
-            elif source['name'] == 'FranklinMonitors':
-                alerts = await self.poll_franklin_monitors(source_id)
-            elif source['name'] == 'TempTicks':
-                alerts = await self.poll_temp_ticks(source_id)
-            elif source['name'] == 'TeamViewer':
-                alerts = await self.poll_teamviewer(source_id)
-            else:
-                logger.warning("Unknown monitor source", source_id=source_id)
-                return
-
-            await self.insert_alerts(source_id, alerts)
-            await self.update_last_poll(source_id)
-            
-            logger.info("Successfully polled source", 
-                       source=source['name'], 
-                       alert_count=len(alerts))
-                       
+            async with aioodbc.connect(self.db_conn_str) as conn:
+                async with conn.cursor() as cursor:
+                    while start < len(admitted):
+                        chunk = [alert for alert, _ in admitted[start:start + INGEST_CHUNK_SIZE]]
+                        await cursor.execute(
+                            "EXEC app.usp_AlertQueue_BulkIngest @SourceId=?, @Alerts=?",
+                            (source_id, encode_alert_batch(chunk))
+                        )
+                        row = await cursor.fetchone()
+                        await conn.commit()
+                        inserted += row[0] or 0
+                        duplicates += row[1] or 0
+                        start += len(chunk)
+        except BaseException:
+            self.release_alerts(source_id, admitted[start:])
+            raise
+
+        logger.info("Alerts ingested",
+                   source_id=source_id,
+                   inserted=inserted,
+                   duplicates=duplicates)
+        return inserted, duplicates
+
+    async def fetch_alerts(self, source_id: int) -> Optional[List[Dict]]:
+        """Fetch current alerts, retrying once with fresh credentials after a 401"""
+        try:
+            return await self._fetch_alerts(source_id)
+        except AuthRejected:
+            self.credentials.invalidate(source_id)
+            return await self._fetch_alerts(source_id)
+
+    async def _fetch_alerts(self, source_id: int) -> Optional[List[Dict]]:
+        adapter = get_adapter(self.monitor_sources[source_id]['name'])
+        if adapter is None:
+            logger.warning("Unknown monitor source", source_id=source_id)
+            return None
+        return await adapter.fetch(self, source_id)
+
+    async def poll_source(self, source_id: int) -> bool:
+        """Poll a specific monitor source and record its health"""
+        source = self.monitor_sources[source_id]
+        metrics = self.monitoring.metrics
+        started = time.monotonic()
+        try:
+            alerts = await asyncio.wait_for(self.fetch_alerts(source_id), POLL_TIMEOUT_S)
+            if alerts is None:
+                return False
+        except Exception as e:
+            error = 'timed out' if isinstance(e, asyncio.TimeoutError) else str(e)
+            logger.error("Error polling source",
+                        source_id=source_id,
+                        error=error)
+            self.monitoring.record_poll_attempt(source_id, False)
+            return False
+
+        response_time_ms = int((time.monotonic() - started) * 1000)
+        self.monitoring.record_poll_attempt(source_id, True, response_time_ms)
+        metrics.count(source_id, 'received', len(alerts))
+        try:
+            inserted, duplicates = await self.insert_alerts(source_id, alerts)
         except Exception as e:
-            logger.error("Error polling source", 
+            logger.error("Error queueing alerts",
                         source_id=source_id,
+                        alert_count=len(alerts),
                         error=str(e))
+            metrics.count(source_id, 'failed', len(alerts))
+            return False
+        metrics.count(source_id, 'processed', inserted)
+        metrics.count(source_id, 'duplicated', duplicates)
+        if alerts:
+            metrics.observe_processing(source_id, (time.monotonic() - started) * 1000)
 
-    async def run(self):
-        """Main polling loop"""
+        logger.info("Successfully polled source",
+                   source=source['name'],
+                   alert_count=len(alerts),
+                   response_time_ms=response_time_ms)
+        return True
+
+    async def run_source(self, source_id: int):
+        """Poll one source forever on its own interval, backing off while it fails"""
+        interval = self.monitor_sources[source_id]['polling_interval'] or DEFAULT_POLL_INTERVAL_S
+        # spread the first polls so sources do not fire in lockstep, without
+        # holding a long-interval source back for its whole interval after a restart
+        await asyncio.sleep(random.uniform(0, min(interval, MAX_START_JITTER_S)))
+        while source_id in self.monitor_sources:
+            async with self._poll_slots:
+                await self.poll_source(source_id)
+            interval = self.monitor_sources.get(source_id, {}).get('polling_interval') or DEFAULT_POLL_INTERVAL_S
+            delay = self.monitoring.next_poll_delay(source_id, interval)
+            await asyncio.sleep(delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER))
+
+    def sync_source_tasks(self):
+        """Start tasks for new sources and stop those of deactivated ones"""
+        for source_id, task in list(self._source_tasks.items()):
+            if source_id not in self.monitor_sources or task.done():
+                task.cancel()
+                del self._source_tasks[source_id]
+        for source_id in self.monitor_sources:
+            if source_id not in self._source_tasks:
+                self._source_tasks[source_id] = asyncio.create_task(self.run_source(source_id))
+
+    async def process_alert_queue(self):
+        """Run usp_ProcessAlertQueue on its own interval, independent of polling.
+
+        Correlation happens in `correlator` as alerts arrive, not here.
+        """
         while True:
             try:
-                await self.refresh_monitor_sources()
-                
-                # Poll each source
-                for source_id in self.monitor_sources:
-                    await self.poll_source(source_id)
-                    
-                # Process alert queue
                 async with aioodbc.connect(self.db_conn_str) as conn:
                     async with conn.cursor() as cursor:
                         await cursor.execute("EXEC app.usp_ProcessAlertQueue")
                         await conn.commit()
-                        
             except Exception as e:
-                logger.error("Error in polling loop", error=str(e))
-                
-            # Wait before next iteration
-            await asyncio.sleep(60)  # Poll every minute
+                logger.error("Error processing alert queue", error=str(e))
+            await asyncio.sleep(QUEUE_PROCESS_INTERVAL_S)
+
+    async def run(self):
+        """Main loop: keep one polling task per active source"""
+        background = [
+            asyncio.create_task(self.process_alert_queue()),
+            asyncio.create_task(self.monitoring.run_flush()),
+            asyncio.create_task(self.correlator.run()),
+            asyncio.create_task(self.run_rule_refresh()),
+            asyncio.create_task(self.run_predictions()),
+        ]
+        metrics_server = None
+        if self.metrics_port:
+            metrics_server = await start_metrics_server(
+                self.monitoring.metrics, port=self.metrics_port,
+                extra=[self.predictor.registry.render_prometheus])
+        try:
+            while True:
+                try:
+                    await self.refresh_monitor_sources()
+                    self.sync_source_tasks()
+                except Exception as e:
+                    logger.error("Error refreshing monitor sources", error=str(e))
+                try:
+                    await self.correlator.load_patterns()
+                except Exception as e:
+                    logger.error("Error loading correlation patterns", error=str(e))
+                await asyncio.sleep(SOURCE_REFRESH_INTERVAL_S)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            if metrics_server:
+                await metrics_server.cleanup()
+
+register_adapter(CallableAdapter('TeamViewer', AlertPoller.poll_teamviewer))
 
 async def main():
     # Configure logging
@@ -527,7 +875,7 @@ async def main():
     
     # Create and run poller
     conn_str = "Driver={ODBC Driver 17 for SQL Server};Server=localhost;Database=OpsGraph;UID=sa;PWD=Bcool102!"
-    poller = AlertPoller(conn_str)
+    poller = AlertPoller(conn_str, metrics_port=int(os.getenv("ALERT_POLLER_METRICS_PORT", "9108")))
     
     try:
         await poller.setup()
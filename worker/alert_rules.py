@@ -0,0 +1,170 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from alert_cache import (
+    DEFAULT_DUPLICATE_WINDOW_MINS,
+    MAX_MEMOISED_MATCHES,
+    AlertThrottleCache,
+    LikePatternIndex,
+    ThrottleRule,
+)
+
+# One (table, row count, MAX(updated_at)) row per table the registry mirrors
+CHANGE_PROBE_SQL = """
+    SELECT 'processing_rules', COUNT(*), MAX(updated_at) FROM app.AlertProcessingRules
+    UNION ALL SELECT 'throttle_rules', COUNT(*), MAX(updated_at) FROM app.AlertThrottleRules
+    UNION ALL SELECT 'sources', COUNT(*), MAX(updated_at) FROM app.MonitorSources
+    UNION ALL SELECT 'mappings', COUNT(*), MAX(updated_at) FROM app.MonitorAssetMappings
+"""
+
+PROCESSING_RULES_SQL = """
+    SELECT rule_id, source_id, alert_type_pattern, priority, severity,
+           category_id, auto_assign_team, correlation_window_mins
+    FROM app.AlertProcessingRules
+    WHERE is_active = 1
+    ORDER BY rule_id
+"""
+
+THROTTLE_RULES_SQL = """
+    SELECT source_id, alert_type_pattern, max_alerts_per_minute,
+           throttle_window_mins, suppress_duplicates, duplicate_window_mins
+    FROM app.AlertThrottleRules
+    WHERE is_active = 1
+    ORDER BY rule_id
+"""
+
+SOURCE_LIMITS_SQL = "SELECT source_id, max_requests_per_minute FROM app.MonitorSources"
+
+MAPPINGS_SQL = "SELECT source_id, external_id, asset_id FROM app.MonitorAssetMappings"
+MAPPINGS_SINCE_SQL = MAPPINGS_SQL + " WHERE updated_at >= ?"
+
+
+class ProcessingRule:
+    __slots__ = ('rule_id', 'source_id', 'pattern', 'priority', 'severity', 'category_id',
+                 'auto_assign_team', 'correlation_window_mins')
+
+    def __init__(self, rule_id: int, source_id: int, pattern: Optional[str], priority: str, severity: str,
+                 category_id: Optional[int], auto_assign_team: Optional[int],
+                 correlation_window_mins: Optional[int]):
+        self.rule_id = rule_id
+        self.source_id = source_id
+        self.pattern = pattern
+        self.priority = priority
+        self.severity = severity
+        self.category_id = category_id
+        self.auto_assign_team = auto_assign_team
+        self.correlation_window_mins = correlation_window_mins
+
+
+class AlertResolution:
+    __slots__ = ('asset_id', 'rule', 'duplicate_window_mins', 'throttle_limit', 'throttle_window_s')
+
+    def __init__(self, asset_id: Optional[int], rule: Optional[ProcessingRule], duplicate_window_mins: int,
+                 throttle_limit: Optional[int], throttle_window_s: float):
+        self.asset_id = asset_id
+        self.rule = rule
+        self.duplicate_window_mins = duplicate_window_mins
+        self.throttle_limit = throttle_limit
+        self.throttle_window_s = throttle_window_s
+
+
+class AlertRuleRegistry:
+    """In-process copy of the alert rule tables and monitor asset mappings.
+
+    Resolves a queued alert to its asset, processing rule (priority,
+    category, team) and throttle limits with dict and trie lookups in
+    place of the `alert_type LIKE alert_type_pattern` scans done per alert
+    by usp_ProcessAlertQueue, usp_CheckAlertThrottling and
+    usp_AlertQueue_BulkIngest. As in SQL, patterns and external ids match
+    case-insensitively, and the processing rule is the lowest rule_id that
+    matches.
+
+    `changed` compares a CHANGE_PROBE_SQL result with what was loaded last;
+    a table is reloaded only when its row count or MAX(updated_at) moved.
+    Mappings are topped up from `updated_at >= previous max` unless rows
+    were deleted, in which case they are reloaded in full.
+    """
+
+    def __init__(self, throttle: Optional[AlertThrottleCache] = None):
+        self.throttle = throttle or AlertThrottleCache()
+        self.versions: Dict[str, Tuple[int, Optional[datetime]]] = {}
+        self._processing: Dict[int, LikePatternIndex[ProcessingRule]] = {}
+        self._rule_matches: Dict[Tuple[int, str], Optional[ProcessingRule]] = {}
+        self._throttle_rules: List[ThrottleRule] = []
+        self._source_limits: Dict[int, int] = {}
+        self.mappings: Dict[Tuple[int, str], int] = {}
+
+    def changed(self, probe: Iterable[Tuple[str, int, Optional[datetime]]]) -> Dict[str, Tuple[int, Optional[datetime]]]:
+        """Tables of a change probe whose version differs from the loaded one"""
+        return {table: (count, updated_at) for table, count, updated_at in probe
+                if self.versions.get(table) != (count, updated_at)}
+
+    def mapping_watermark(self, version: Tuple[int, Optional[datetime]]) -> Optional[datetime]:
+        """Where an incremental mapping load can start, or None if a full load is needed"""
+        loaded = self.versions.get('mappings')
+        if loaded is None or loaded[1] is None or version[0] < loaded[0]:
+            return None
+        return loaded[1]
+
+    def load_processing_rules(self, rows: Iterable[Tuple], version: Optional[Tuple] = None):
+        index: Dict[int, LikePatternIndex[ProcessingRule]] = {}
+        for row in rows:
+            rule = ProcessingRule(*row)
+            index.setdefault(rule.source_id, LikePatternIndex()).add(rule.pattern, rule, rule.rule_id)
+        self._processing = index
+        self._rule_matches = {}
+        self._set_version('processing_rules', version)
+
+    def load_throttle_rules(self, rows: Iterable[Tuple], version: Optional[Tuple] = None):
+        self._throttle_rules = [ThrottleRule(*row) for row in rows]
+        self.throttle.load(self._throttle_rules, self._source_limits)
+        self._set_version('throttle_rules', version)
+
+    def load_source_limits(self, rows: Iterable[Tuple[int, int]], version: Optional[Tuple] = None):
+        self._source_limits = {source_id: limit for source_id, limit in rows}
+        self.throttle.load(self._throttle_rules, self._source_limits)
+        self._set_version('sources', version)
+
+    def load_mappings(self, rows: Iterable[Tuple[int, str, int]], version: Optional[Tuple] = None,
+                      incremental: bool = False):
+        mappings = self.mappings if incremental else {}
+        for source_id, external_id, asset_id in rows:
+            mappings[(source_id, external_id.lower())] = asset_id
+        self.mappings = mappings
+        self._set_version('mappings', version)
+
+    def _set_version(self, table: str, version: Optional[Tuple]):
+        if version is not None:
+            self.versions[table] = version
+
+    def asset_id(self, source_id: int, external_asset_id: str) -> Optional[int]:
+        return self.mappings.get((source_id, str(external_asset_id).lower()))
+
+    def processing_rule(self, source_id: int, alert_type: str) -> Optional[ProcessingRule]:
+        key = (source_id, alert_type)
+        if key in self._rule_matches:
+            return self._rule_matches[key]
+        index = self._processing.get(source_id)
+        matches = index.match(alert_type) if index is not None else []
+        rule = matches[0] if matches else None
+        if len(self._rule_matches) >= MAX_MEMOISED_MATCHES:
+            self._rule_matches.clear()
+        self._rule_matches[key] = rule
+        return rule
+
+    def duplicate_window_mins(self, source_id: int, alert_type: str) -> int:
+        """Duplicate window of the first matching rule that suppresses duplicates"""
+        for rule in self.throttle.matching_rules(source_id, alert_type):
+            if rule.suppress_duplicates:
+                return rule.duplicate_window_mins
+        return DEFAULT_DUPLICATE_WINDOW_MINS
+
+    def resolve(self, source_id: int, external_asset_id: str, alert_type: str) -> AlertResolution:
+        limit, window_s = self.throttle.limit_for(source_id, alert_type)
+        return AlertResolution(
+            self.asset_id(source_id, external_asset_id),
+            self.processing_rule(source_id, alert_type),
+            self.duplicate_window_mins(source_id, alert_type),
+            limit,
+            window_s,
+        )
@@ -1,48 +1,152 @@
 import asyncio
+import json
 import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel
-from .db import get_conn
+from .db import pooled_conn
 from .settings import settings
 
 logger = logging.getLogger('ai_agent')
 app = FastAPI()
 
+# Blocking pyodbc calls run here rather than on the event loop; sized at or
+# below the connection pool so requests queue for a thread, not a connection
+_db_executor = ThreadPoolExecutor(max(1, min(settings.ai_db_concurrency, settings.sql_pool_size)),
+                                  thread_name_prefix='ai_agent_db')
+
+DETAIL_SETS = ('assets', 'watchers', 'comments', 'attachments')
+
+
 class Recommendation(BaseModel):
     ticket_id: int
     recommendations: list
     confidence: float
 
-@app.post('/ai/ticket/{ticket_id}/generate')
-async def generate(ticket_id: int):
-    # Assemble context from DB
-    try:
-        conn = get_conn()
+
+class LatestCache:
+    """Small TTL + LRU cache of the latest recommendation per ticket.
+
+    Every `invalidate` bumps a generation counter, and `put` drops a value
+    read under an older generation, so a read racing a write never caches
+    the row the write replaced.
+    """
+
+    def __init__(self, ttl_s: float, max_entries: int):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[int, Tuple[float, Dict[str, Any]]]' = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, ticket_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(ticket_id)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[ticket_id]
+                return None
+            self._entries.move_to_end(ticket_id)
+            return entry[1]
+
+    def put(self, ticket_id: int, value: Dict[str, Any], generation: int):
+        with self._lock:
+            if generation != self._generation:
+                return
+            self._entries[ticket_id] = (time.monotonic() + self.ttl_s, value)
+            self._entries.move_to_end(ticket_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, ticket_id: int):
+        with self._lock:
+            self._entries.pop(ticket_id, None)
+            self._generation += 1
+
+
+_latest_cache = LatestCache(settings.ai_latest_ttl_s, settings.ai_latest_cache_size)
+
+
+async def _run_db(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, fn, *args)
+
+
+def _rows(cur) -> List[Dict[str, Any]]:
+    columns = [c[0] for c in cur.description]
+    return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+
+def read_ticket_detail(cur, ticket_id: int) -> Optional[Dict[str, Any]]:
+    """Every result set of usp_GetTicketDetail: the ticket plus its assets, watchers, comments and attachments"""
+    cur.execute('EXEC app.usp_GetTicketDetail @ticket_id=?', ticket_id)
+    main = _rows(cur)
+    detail: Dict[str, Any] = {'ticket': main[0] if main else None}
+    for name in DETAIL_SETS:
+        detail[name] = _rows(cur) if cur.nextset() else []
+    return detail if detail['ticket'] is not None else None
+
+
+def _generate(ticket_id: int) -> Optional[Dict[str, Any]]:
+    with pooled_conn() as conn:
         cur = conn.cursor()
-        cur.execute('EXEC app.usp_GetTicketDetail @ticket_id=?', ticket_id)
-        # read multiple result sets: main, assets, watchers, comments, attachments
-        main = cur.fetchone()
+        context = read_ticket_detail(cur, ticket_id)
+        if context is None:
+            return None
         # naive candidate generation: return assets as recommendations
-        cur.nextset()
-        assets = cur.fetchall()
-        candidates = [dict(asset_id=row.asset_id, type=row.type) for row in assets]
+        candidates = [dict(asset_id=a['asset_id'], type=a['type']) for a in context['assets']]
         recs = {'ticket_id': ticket_id, 'recommendations': candidates, 'confidence': 0.6}
-        # persist to app.TicketAIRecommendations
-        cur.execute('INSERT INTO app.TicketAIRecommendations (ticket_id, provider, recommendations, confidence) VALUES (?,?,?,?)', ticket_id, 'local', str(recs['recommendations']), recs['confidence'])
+        cur.execute('INSERT INTO app.TicketAIRecommendations (ticket_id, provider, recommendations, confidence) VALUES (?,?,?,?)',
+                    ticket_id, 'local', json.dumps(recs['recommendations']), recs['confidence'])
         conn.commit()
-        conn.close()
-        return recs
-    except Exception as e:
+    _latest_cache.invalidate(ticket_id)
+    return recs
+
+
+def _read_latest(ticket_id: int) -> Optional[Dict[str, Any]]:
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT TOP(1) recommendations, confidence, created_at FROM app.TicketAIRecommendations WHERE ticket_id=? ORDER BY created_at DESC', ticket_id)
+        row = cur.fetchone()
+    if not row:
+        return None
+    return {'recommendations': row[0], 'confidence': row[1], 'created_at': row[2].isoformat()}
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    _db_executor.shutdown(wait=False)
+
+
+@app.post('/ai/ticket/{ticket_id}/generate')
+async def generate(ticket_id: int):
+    try:
+        recs = await _run_db(_generate, ticket_id)
+    except Exception:
         logger.exception('AI generate failed')
         raise HTTPException(status_code=500, detail='AI generation failed')
+    if recs is None:
+        raise HTTPException(status_code=404, detail='Not found')
+    return recs
+
 
 @app.get('/ai/ticket/{ticket_id}/latest')
 async def latest(ticket_id: int):
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute('SELECT TOP(1) recommendations, confidence, created_at FROM app.TicketAIRecommendations WHERE ticket_id=? ORDER BY created_at DESC', ticket_id)
-    row = cur.fetchone()
-    conn.close()
-    if not row:
+    cached = _latest_cache.get(ticket_id)
+    if cached is not None:
+        return cached
+    generation = _latest_cache.generation
+    result = await _run_db(_read_latest, ticket_id)
+    if result is None:
         raise HTTPException(status_code=404, detail='Not found')
-    return {'recommendations': row[0], 'confidence': row[1], 'created_at': row[2].isoformat()}
+    _latest_cache.put(ticket_id, result, generation)
+    return result
@@ -0,0 +1,243 @@
+import bisect
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .db import pooled_conn
+
+logger = logging.getLogger('cofail')
+
+# Events fetched per round trip while reading past the watermark
+FETCH_SIZE = 5000
+
+PairKey = Tuple[int, int, int]
+
+
+class SiteWindow:
+    """Recent events of one site, kept sorted by occurred_at."""
+
+    __slots__ = ('times', 'event_ids', 'assets', 'seen')
+
+    def __init__(self):
+        self.times: List[datetime] = []
+        self.event_ids: List[str] = []
+        self.assets: List[int] = []
+        self.seen = set()
+
+    def insert(self, event_id: str, asset_id: int, occurred_at: datetime):
+        i = bisect.bisect_right(self.times, occurred_at)
+        self.times.insert(i, occurred_at)
+        self.event_ids.insert(i, event_id)
+        self.assets.insert(i, asset_id)
+        self.seen.add(event_id)
+
+    def evict(self, cutoff: datetime):
+        """Drop events that occurred before `cutoff`"""
+        n = bisect.bisect_left(self.times, cutoff)
+        if n:
+            self.seen.difference_update(self.event_ids[:n])
+            del self.times[:n], self.event_ids[:n], self.assets[:n]
+
+
+class CofailEngine:
+    """Incremental co-failure pair counter.
+
+    Counts the same pairs as kg.usp_RefreshCofailScores: for every two events
+    of a site, (asset of the earlier, asset of the later) co-occur when the
+    later one follows within `window_minutes`. Each new event is inserted into
+    its site's sorted window and paired, via binary search on the timestamps,
+    with the events up to one window before and after it, so every pair is
+    counted once, when the second of its two events arrives.
+
+    Events are read past a rowversion watermark that is stored with the
+    counters; with `site_id` set the engine covers that site only. Events
+    already in the window (updates) are not counted again, and events older
+    than `lateness_minutes` behind the newest event of their site are
+    skipped, since their partners may already have been evicted.
+    """
+
+    def __init__(self, window_minutes: int = 120, lateness_minutes: int = 15, site_id: Optional[int] = None):
+        self.window_minutes = window_minutes
+        self.site_id = site_id
+        self.window = timedelta(minutes=window_minutes)
+        self.lateness = timedelta(minutes=lateness_minutes)
+        self.watermark: Optional[bytes] = None
+        self.late = 0
+        self._sites: Dict[int, SiteWindow] = {}
+        self._newest: Dict[int, datetime] = {}
+        self._pairs: Dict[PairKey, List] = {}
+
+    def add(self, event_id: str, site_id: int, asset_id: int, occurred_at: datetime, count: bool = True):
+        """Insert one event; with `count` false the window is only seeded"""
+        site = self._sites.get(site_id)
+        if site is None:
+            site = self._sites[site_id] = SiteWindow()
+        if event_id in site.seen:
+            return
+        newest = self._newest.get(site_id)
+        if newest is None or occurred_at > newest:
+            newest = self._newest[site_id] = occurred_at
+        elif occurred_at < newest - self.lateness:
+            if count:
+                self.late += 1
+            return
+
+        if count:
+            times, assets = site.times, site.assets
+            # earlier partners: (their asset, this asset), last co-occurrence at this event
+            lo = bisect.bisect_left(times, occurred_at - self.window)
+            hi = bisect.bisect_right(times, occurred_at)
+            for i in range(lo, hi):
+                self._count(site_id, assets[i], asset_id, occurred_at)
+            # later partners: (this asset, their asset), last co-occurrence at theirs
+            lo = bisect.bisect_left(times, occurred_at)
+            hi = bisect.bisect_right(times, occurred_at + self.window)
+            for i in range(lo, hi):
+                self._count(site_id, asset_id, assets[i], times[i])
+
+        site.insert(event_id, asset_id, occurred_at)
+        site.evict(newest - self.window - self.lateness)
+
+    def add_many(self, rows: Iterable, count: bool = True) -> int:
+        """Insert (event_id, site_id, asset_id, occurred_at) rows, ideally sorted by occurred_at"""
+        n = 0
+        for event_id, site_id, asset_id, occurred_at in rows:
+            self.add(event_id, site_id, asset_id, occurred_at, count)
+            n += 1
+        return n
+
+    def _count(self, site_id: int, asset_a: int, asset_b: int, at: datetime):
+        pair = self._pairs.get((site_id, asset_a, asset_b))
+        if pair is None:
+            self._pairs[(site_id, asset_a, asset_b)] = [1, at]
+        else:
+            pair[0] += 1
+            if at > pair[1]:
+                pair[1] = at
+
+    def drain(self) -> List[Tuple[int, int, int, int, datetime]]:
+        """Pair deltas since the last drain as kg_analytics.CofailPairList rows"""
+        pairs, self._pairs = self._pairs, {}
+        return [(site_id, a, b, n, last) for (site_id, a, b), (n, last) in pairs.items()]
+
+    def reset(self):
+        self.watermark = None
+        self._sites.clear()
+        self._newest.clear()
+        self._pairs.clear()
+
+    def _site_filter(self) -> Tuple[str, tuple]:
+        return ('', ()) if self.site_id is None else (' AND site_id = ?', (self.site_id,))
+
+    def _load(self, cur):
+        """Start from the stored watermark, rebuilding once when there is none.
+
+        A site without its own watermark starts from the global one, which
+        covers every site counted before scoring was sharded.
+        """
+        row = None
+        if self.site_id is not None:
+            row = cur.execute("SELECT watermark FROM kg_analytics.CofailSiteWatermark WHERE site_id=? AND window_minutes=?",
+                              self.site_id, self.window_minutes).fetchone()
+        if row is None:
+            row = cur.execute("SELECT watermark FROM kg_analytics.CofailWatermark WHERE window_minutes=?",
+                              self.window_minutes).fetchone()
+        if row is None:
+            logger.info('No co-fail watermark stored, rebuilding scores for site=%s window=%s',
+                        self.site_id, self.window_minutes)
+            row = cur.execute("EXEC kg.usp_CofailScores_Rebuild @window_minutes=?, @site_id=?",
+                              self.window_minutes, self.site_id).fetchone()
+            cur.connection.commit()
+        watermark = bytes(row[0])
+        where, params = self._site_filter()
+        cur.execute(
+            f"""
+            SELECT event_id, site_id, asset_id, occurred_at
+            FROM app.Events
+            WHERE rowversion < ?
+            AND occurred_at >= DATEADD(MINUTE, -?, SYSUTCDATETIME()){where}
+            ORDER BY occurred_at
+            """,
+            watermark, self.window_minutes + int(self.lateness.total_seconds() // 60), *params)
+        seeded = self.add_many(cur.fetchall(), count=False)
+        self.watermark = watermark
+        logger.info('Co-fail window seeded site=%s events=%s', self.site_id, seeded)
+
+    def tick(self) -> int:
+        """Fold events written since the watermark into the scores; returns the number of pairs updated.
+
+        On failure the in-memory state is dropped, since the window may hold
+        events whose pairs were never stored, and the error is re-raised; the
+        next tick starts over from the stored watermark.
+        """
+        try:
+            with pooled_conn() as conn:
+                cur = conn.cursor()
+                if self.watermark is None:
+                    self._load(cur)
+                high = bytes(cur.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))").fetchval())
+                where, params = self._site_filter()
+                cur.execute(
+                    f"""
+                    SELECT event_id, site_id, asset_id, occurred_at
+                    FROM app.Events
+                    WHERE rowversion >= ? AND rowversion < ?{where}
+                    ORDER BY occurred_at
+                    """,
+                    self.watermark, high, *params)
+                read = 0
+                while True:
+                    rows = cur.fetchmany(FETCH_SIZE)
+                    if not rows:
+                        break
+                    read += self.add_many(rows)
+                if not read:
+                    self.watermark = high
+                    return 0
+                pairs = self.drain()
+                if pairs:
+                    cur.execute("EXEC kg.usp_CofailScores_Apply @pairs=?, @window_minutes=?, @watermark=?, @site_id=?",
+                                (['CofailPairList', 'kg_analytics', *pairs],), self.window_minutes, high, self.site_id)
+                else:
+                    # an omitted table-valued parameter is an empty table
+                    cur.execute("EXEC kg.usp_CofailScores_Apply @window_minutes=?, @watermark=?, @site_id=?",
+                                self.window_minutes, high, self.site_id)
+                updated = cur.fetchval()
+                conn.commit()
+                self.watermark = high
+                logger.debug('Co-fail update site=%s events=%s pairs=%s late_skipped=%s',
+                             self.site_id, read, updated, self.late)
+                return updated
+        except Exception:
+            self.reset()
+            raise
+
+
+def rescore(site_id: Optional[int] = None) -> int:
+    """Recompute time-decayed scores for all pairs, or those of one site; returns the rows rescored"""
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute('EXEC kg.usp_CofailScores_Rescore @site_id=?', site_id)
+        rescored = cur.fetchval()
+        conn.commit()
+        return rescored
+
+
+class CofailShards:
+    """One CofailEngine per site, so each site keeps its own window and watermark"""
+
+    def __init__(self, window_minutes: int = 120, lateness_minutes: int = 15):
+        self.window_minutes = window_minutes
+        self.lateness_minutes = lateness_minutes
+        self._engines: Dict[int, CofailEngine] = {}
+
+    def tick(self, site_id: int) -> int:
+        engine = self._engines.get(site_id)
+        if engine is None:
+            engine = self._engines[site_id] = CofailEngine(self.window_minutes, self.lateness_minutes, site_id)
+        return engine.tick()
+
+    def retain(self, site_ids: Iterable[int]):
+        """Forget sites that no longer exist"""
+        for site_id in set(self._engines) - set(site_ids):
+            del self._engines[site_id]
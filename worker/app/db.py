@@ -1,8 +1,187 @@
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Optional
+
 import pyodbc
 from .settings import settings
 
+logger = logging.getLogger('db')
+
+
 def get_conn():
+    """Open a new, unpooled connection. Prefer `pooled_conn()` for job and request work."""
     conn_str = (
         f"DRIVER={{ODBC Driver 18 for SQL Server}};SERVER={settings.sql_host},{settings.sql_port};DATABASE={settings.sql_database};UID={settings.sql_user};PWD={settings.sql_password};Encrypt=yes;TrustServerCertificate=yes"
     )
     return pyodbc.connect(conn_str, autocommit=False)
+
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class _PooledConnection:
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.last_used_at = self.created_at
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived ODBC connections.
+
+    Connections are created lazily up to `size`, recycled once older than
+    `max_age_s`, and pinged with `SELECT 1` when they have sat idle for longer
+    than `health_check_s`. `on_connect` runs once per physical connection, so
+    per-session state such as SESSION_CONTEXT survives across checkouts.
+    """
+
+    def __init__(self, connect: Callable[[], 'pyodbc.Connection'], size: int = 5,
+                 max_age_s: float = 1800.0, health_check_s: float = 30.0,
+                 acquire_timeout_s: float = 30.0,
+                 on_connect: Optional[Callable[['pyodbc.Connection'], None]] = None):
+        self._connect = connect
+        self._on_connect = on_connect
+        self.size = size
+        self.max_age_s = max_age_s
+        self.health_check_s = health_check_s
+        self.acquire_timeout_s = acquire_timeout_s
+        self._idle: Deque[_PooledConnection] = deque()
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(size)
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator['pyodbc.Connection']:
+        """Check out a connection for the duration of the block.
+
+        The connection is rolled back on checkin, whether or not the block
+        raised, so uncommitted work and its locks never reach the next
+        borrower; if the rollback itself fails the connection is discarded
+        instead of reused.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout_s):
+            raise PoolTimeout(f'no connection available within {self.acquire_timeout_s}s')
+        try:
+            pooled = self._checkout()
+        except Exception:
+            self._slots.release()
+            raise
+        try:
+            yield pooled.conn
+        finally:
+            self._checkin(pooled)
+            self._slots.release()
+
+    def close(self):
+        """Close idle connections; connections in use are closed on checkin."""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = list(self._idle), deque()
+        for pooled in idle:
+            self._discard(pooled)
+
+    def _checkout(self) -> _PooledConnection:
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise RuntimeError('connection pool is closed')
+                pooled = self._idle.pop() if self._idle else None
+            if pooled is None:
+                return self._open()
+            now = time.monotonic()
+            if now - pooled.created_at > self.max_age_s:
+                self._discard(pooled)
+                continue
+            if now - pooled.last_used_at > self.health_check_s and not self._ping(pooled):
+                self._discard(pooled)
+                continue
+            return pooled
+
+    def _checkin(self, pooled: _PooledConnection):
+        pooled.last_used_at = time.monotonic()
+        if self._closed or pooled.last_used_at - pooled.created_at > self.max_age_s:
+            self._discard(pooled)
+            return
+        try:
+            pooled.conn.rollback()
+        except Exception:
+            logger.warning('Discarding pooled connection that failed to roll back')
+            self._discard(pooled)
+            return
+        with self._lock:
+            self._idle.append(pooled)
+
+    def _open(self) -> _PooledConnection:
+        conn = self._connect()
+        try:
+            if self._on_connect:
+                self._on_connect(conn)
+        except Exception:
+            conn.close()
+            raise
+        return _PooledConnection(conn)
+
+    @staticmethod
+    def _ping(pooled: _PooledConnection) -> bool:
+        try:
+            cur = pooled.conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            return True
+        except Exception:
+            logger.warning('Discarding pooled connection that failed health check')
+            return False
+
+    @staticmethod
+    def _discard(pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+
+
+def _set_worker_session_context(conn):
+    cur = conn.cursor()
+    cur.execute("EXEC sys.sp_set_session_context @key=N'user_id', @value=?", settings.worker_user_id)
+    conn.commit()
+    cur.close()
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    get_conn,
+                    size=settings.sql_pool_size,
+                    max_age_s=settings.sql_pool_max_age_s,
+                    health_check_s=settings.sql_pool_health_check_s,
+                    acquire_timeout_s=settings.sql_pool_acquire_timeout_s,
+                    on_connect=_set_worker_session_context,
+                )
+    return _pool
+
+
+def set_pool(pool: Optional[ConnectionPool]) -> Optional[ConnectionPool]:
+    """Install `pool` as the process-wide pool, e.g. one over a stand-in database. Returns the previous pool."""
+    global _pool
+    with _pool_lock:
+        previous, _pool = _pool, pool
+    return previous
+
+
+def pooled_conn():
+    """Context manager yielding a pooled connection with the worker session context applied."""
+    return get_pool().connection()
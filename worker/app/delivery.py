@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+logger = logging.getLogger('outbox_delivery')
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Statuses that mean "slow down" rather than "this event is bad"
+BACKPRESSURE_STATUSES = {429, 503}
+
+
+class DeliverySkipped(Exception):
+    """An ordered delivery was not attempted because an earlier item for its key failed."""
+
+
+class _Target:
+    """Concurrency gate and pause state for one destination host."""
+
+    __slots__ = ('semaphore', 'paused_until')
+
+    def __init__(self, limit: int):
+        self.semaphore = asyncio.Semaphore(limit)
+        self.paused_until = 0.0
+
+
+class OutboxDelivery:
+    """Concurrent webhook delivery over a shared keep-alive `httpx.AsyncClient`.
+
+    `concurrency` bounds in-flight requests overall and `per_target` bounds them
+    per destination host. A 429/503 pauses that host for its Retry-After (or
+    `pause_s`) so a struggling target is not hammered by the rest of the batch.
+    """
+
+    def __init__(self, concurrency: int = 32, per_target: int = 8, timeout_s: float = 10.0,
+                 http2: bool = True, pause_s: float = 5.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.concurrency = concurrency
+        self.per_target = per_target
+        self.pause_s = pause_s
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning('h2 is not installed; delivering outbox events over HTTP/1.1')
+            http2 = False
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            timeout=timeout_s,
+            transport=transport,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+        self._slots = asyncio.Semaphore(concurrency)
+        self._targets: Dict[str, _Target] = {}
+
+    async def __aenter__(self) -> 'OutboxDelivery':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    def _target(self, url: str) -> _Target:
+        key = urlsplit(url).netloc
+        target = self._targets.get(key)
+        if target is None:
+            target = self._targets[key] = _Target(self.per_target)
+        return target
+
+    async def deliver(self, url: str, body: Any):
+        """POST one event to `url`; raises on transport errors and non-2xx responses.
+
+        `body` is JSON-encoded unless it is already `bytes`, which are sent as-is.
+        """
+        if isinstance(body, bytes):
+            kwargs = {'content': body, 'headers': {'Content-Type': 'application/json'}}
+        else:
+            kwargs = {'json': body}
+        target = self._target(url)
+        async with target.semaphore:
+            # wait out a pause before taking a global slot so other targets keep flowing
+            delay = target.paused_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self._slots:
+                r = await self._client.post(url, **kwargs)
+            if r.status_code in BACKPRESSURE_STATUSES:
+                target.paused_until = time.monotonic() + self._retry_after(r)
+                logger.warning('Target %s returned %s; pausing deliveries', urlsplit(url).netloc, r.status_code)
+            r.raise_for_status()
+
+    async def deliver_many(self, url: str, bodies: Iterable[Any]) -> List[Optional[BaseException]]:
+        """Deliver `bodies` concurrently; returns one exception (or None) per body, in order."""
+        return await asyncio.gather(*(self._deliver_safe(url, body) for body in bodies))
+
+    async def _deliver_safe(self, url: str, body: Any) -> Optional[BaseException]:
+        try:
+            await self.deliver(url, body)
+            return None
+        except Exception as e:
+            return e
+
+    def _retry_after(self, response: httpx.Response) -> float:
+        value = response.headers.get('Retry-After')
+        try:
+            return min(60.0, max(0.0, float(value))) if value else self.pause_s
+        except ValueError:
+            return self.pause_s
+
+    async def deliver_ordered(self, url: str, items: Sequence[Tuple[Hashable, Any]]) -> List[Optional[BaseException]]:
+        """Deliver `(key, body)` items, sequentially per key and concurrently across keys.
+
+        Items must be in delivery order. Once an item fails, the remaining items
+        with the same key are not sent and report `DeliverySkipped`.
+        """
+        results: List[Optional[BaseException]] = [None] * len(items)
+        chains: Dict[Hashable, List[int]] = {}
+        for index, (key, _) in enumerate(items):
+            chains.setdefault(key, []).append(index)
+
+        async def run_chain(indexes: List[int]):
+            for position, index in enumerate(indexes):
+                try:
+                    await self.deliver(url, items[index][1])
+                except Exception as e:
+                    results[index] = e
+                    for skipped in indexes[position + 1:]:
+                        results[skipped] = DeliverySkipped(f'blocked behind failed item {index}')
+                    return
+
+        await asyncio.gather(*(run_chain(indexes) for indexes in chains.values()))
+        return results
@@ -0,0 +1,357 @@
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .db import pooled_conn
+
+logger = logging.getLogger('graph_index')
+
+KINDS = ('site', 'zone', 'asset', 'ticket')
+
+_EMPTY = np.empty(0, dtype=np.int64)
+
+# Outbox events that change a ticket's asset links
+TICKET_ASSET_EVENTS = ('ticket.created', 'ticket.upserted')
+
+MIN_ACTIVE_ROWVERSION_SQL = 'SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))'
+
+# Latest asset-link event per ticket, so replaying an older one cannot undo a newer one
+TICKET_EVENT_IDS_SQL = """
+    SELECT TRY_CAST(aggregate_id AS INT), MAX(event_id)
+    FROM app.Outbox
+    WHERE aggregate = 'ticket' AND type IN ('ticket.created', 'ticket.upserted')
+    GROUP BY TRY_CAST(aggregate_id AS INT)
+"""
+
+
+class CSR:
+    """Compressed sparse rows: the neighbours of node i are indices[indptr[i]:indptr[i + 1]]"""
+
+    __slots__ = ('indptr', 'indices')
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray):
+        self.indptr = indptr
+        self.indices = indices
+
+    @classmethod
+    def from_edges(cls, n: int, src: np.ndarray, dst: np.ndarray) -> 'CSR':
+        order = np.argsort(src, kind='stable')
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+        return cls(indptr, dst[order].astype(np.int64, copy=False))
+
+    @property
+    def n(self) -> int:
+        return len(self.indptr) - 1
+
+    def row(self, i: int) -> np.ndarray:
+        if i >= self.n:
+            return _EMPTY
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def gather(self, rows: np.ndarray) -> np.ndarray:
+        """Concatenated neighbours of `rows`, without a Python-level loop"""
+        rows = rows[rows < self.n]
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return _EMPTY
+        offsets = np.cumsum(lengths) - lengths
+        return self.indices[np.repeat(starts - offsets, lengths) + np.arange(total)]
+
+
+def _undirected(n: int, pairs: Sequence[Tuple[np.ndarray, np.ndarray]]) -> CSR:
+    src = np.concatenate([a for a, b in pairs] + [b for a, b in pairs]) if pairs else _EMPTY
+    dst = np.concatenate([b for a, b in pairs] + [a for a, b in pairs]) if pairs else _EMPTY
+    return CSR.from_edges(n, src, dst)
+
+
+class GraphSnapshot:
+    """Immutable node numbering and adjacency built from one load.
+
+    Nodes of each kind take a contiguous range of internal ids, in ascending
+    external id order, so external ids map to internal ones with a binary
+    search instead of a dict. `adj` holds every structural edge in both
+    directions, `zones` only zone adjacency, and `cofail_by_a`/`cofail_by_b`
+    map an asset to its kg_analytics.CofailScores rows. `outbox_position` is
+    the MIN_ACTIVE_ROWVERSION() read before the load and `ticket_events` the
+    latest asset-link event_id of each ticket it reflects.
+    """
+
+    def __init__(self, nodes: Dict[str, np.ndarray], edges: Dict[Tuple[str, str], Tuple[np.ndarray, np.ndarray]],
+                 zone_adjacency: Tuple[np.ndarray, np.ndarray], cofail: np.ndarray,
+                 outbox_position: bytes = bytes(8), ticket_events: Optional[Dict[int, int]] = None):
+        self.keys: Dict[str, np.ndarray] = {}
+        self.base: Dict[str, int] = {}
+        offset = 0
+        for kind in KINDS:
+            keys = np.unique(np.asarray(nodes.get(kind, _EMPTY), dtype=np.int64))
+            self.keys[kind] = keys
+            self.base[kind] = offset
+            offset += len(keys)
+        self.n = offset
+        self.kind_of = np.repeat(np.arange(len(KINDS), dtype=np.int8), [len(self.keys[k]) for k in KINDS])
+        self.key_of = np.concatenate([self.keys[k] for k in KINDS]) if offset else _EMPTY
+
+        pairs = []
+        for (src_kind, dst_kind), (src, dst) in edges.items():
+            pairs.append(self._internal_pairs(src_kind, src, dst_kind, dst))
+        self.adj = _undirected(self.n, pairs)
+        self.edge_count = len(self.adj.indices) // 2
+        self.zones = _undirected(self.n, [self._internal_pairs('zone', zone_adjacency[0], 'zone', zone_adjacency[1])])
+
+        # cofail rows: site_id, asset_a, asset_b, co_count, score (NULL scores rank last)
+        cofail = np.asarray(cofail, dtype=np.float64).reshape(-1, 5)
+        a, found_a = self.lookup('asset', cofail[:, 1].astype(np.int64))
+        b, found_b = self.lookup('asset', cofail[:, 2].astype(np.int64))
+        keep = found_a & found_b
+        self.cofail = cofail[keep]
+        self.cofail_rank = np.nan_to_num(self.cofail[:, 4], nan=-np.inf)
+        rows = np.arange(len(self.cofail), dtype=np.int64)
+        self.cofail_by_a = CSR.from_edges(self.n, a[keep], rows)
+        self.cofail_by_b = CSR.from_edges(self.n, b[keep], rows)
+        self.outbox_position = outbox_position
+        self.ticket_events = ticket_events or {}
+        self.loaded_at = time.time()
+
+    def lookup(self, kind: str, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(internal ids, found mask) for external ids of one kind"""
+        keys = self.keys[kind]
+        ids = np.asarray(ids, dtype=np.int64)
+        pos = np.searchsorted(keys, ids)
+        found = pos < len(keys)
+        found[found] = keys[pos[found]] == ids[found]
+        return self.base[kind] + pos, found
+
+    def node(self, kind: str, key: int) -> Optional[int]:
+        internal, found = self.lookup(kind, np.array([key]))
+        return int(internal[0]) if found[0] else None
+
+    def _internal_pairs(self, src_kind, src, dst_kind, dst) -> Tuple[np.ndarray, np.ndarray]:
+        s, found_s = self.lookup(src_kind, src)
+        d, found_d = self.lookup(dst_kind, dst)
+        keep = found_s & found_d
+        return s[keep], d[keep]
+
+
+class GraphIndex:
+    """Snapshot plus the ticket-asset changes seen in app.Outbox since it was loaded.
+
+    Only ticket events change the graph between loads; assets, zones,
+    adjacency and cofail scores are picked up by the next full reload.
+    Not thread-safe: apply events and query from one thread (the event loop).
+    """
+
+    def __init__(self, snapshot: GraphSnapshot):
+        self.snapshot = snapshot
+        self.outbox_position = snapshot.outbox_position
+        self._reset_overlay()
+
+    def _reset_overlay(self):
+        self._ticket_events = dict(self.snapshot.ticket_events)
+        self._ticket_nodes: Dict[int, int] = {}        # tickets unknown to the snapshot
+        self._ticket_keys: List[int] = []
+        self._ticket_assets: Dict[int, np.ndarray] = {}  # ticket node -> asset nodes, overriding the snapshot
+        self._asset_added: Dict[int, Set[int]] = {}
+        self._asset_removed: Dict[int, Set[int]] = {}
+        self._touched = _EMPTY
+
+    def swap(self, snapshot: GraphSnapshot):
+        """Install a freshly loaded snapshot; events from its outbox position on are replayed by the tailer"""
+        self.snapshot = snapshot
+        self.outbox_position = snapshot.outbox_position
+        self._reset_overlay()
+
+    # node ids
+
+    def node(self, kind: str, key: int) -> Optional[int]:
+        node = self.snapshot.node(kind, key)
+        if node is None and kind == 'ticket':
+            node = self._ticket_nodes.get(key)
+        return node
+
+    def describe(self, node: int) -> Tuple[str, int]:
+        snap = self.snapshot
+        if node < snap.n:
+            return KINDS[snap.kind_of[node]], int(snap.key_of[node])
+        return 'ticket', self._ticket_keys[node - snap.n]
+
+    # outbox events
+
+    def advance(self, position: bytes):
+        """Move the outbox position forward; a position read before a swap is ignored"""
+        if position > self.outbox_position:
+            self.outbox_position = position
+
+    def apply_event(self, event_id: int, event_type: str, aggregate_id: str, payload: str):
+        if event_type not in TICKET_ASSET_EVENTS:
+            return
+        ticket_id = int(aggregate_id)
+        if event_id <= self._ticket_events.get(ticket_id, 0):
+            # already applied or part of the snapshot: an outbox row is read
+            # again whenever a consumer updates it, and a reload replays
+            # everything from its position
+            return
+        self._ticket_events[ticket_id] = event_id
+        body = json.loads(payload)
+        asset_ids = body.get('asset_ids')
+        if asset_ids is None:
+            return
+        # usp_CreateOrUpdateTicket only adds asset links; usp_CreateOrUpdateTicket_v2 replaces them
+        self.set_ticket_assets(ticket_id, asset_ids, replace=event_type == 'ticket.upserted')
+
+    def set_ticket_assets(self, ticket_id: int, asset_ids: Iterable[int], replace: bool):
+        snap = self.snapshot
+        ticket = self.node('ticket', ticket_id)
+        if ticket is None:
+            ticket = self._ticket_nodes[ticket_id] = snap.n + len(self._ticket_keys)
+            self._ticket_keys.append(ticket_id)
+        assets, found = snap.lookup('asset', np.fromiter((int(a) for a in asset_ids), dtype=np.int64))
+        old = set(self.ticket_assets(ticket).tolist())
+        new = set(assets[found].tolist()) if replace else old | set(assets[found].tolist())
+        for asset in old - new:
+            self._asset_removed.setdefault(asset, set()).add(ticket)
+            self._asset_added.get(asset, set()).discard(ticket)
+        for asset in new - old:
+            self._asset_added.setdefault(asset, set()).add(ticket)
+            self._asset_removed.get(asset, set()).discard(ticket)
+        self._ticket_assets[ticket] = np.array(sorted(new), dtype=np.int64)
+        self._touched = np.array(sorted(set(self._ticket_assets) | set(self._asset_added) | set(self._asset_removed)),
+                                 dtype=np.int64)
+
+    # queries
+
+    def ticket_assets(self, ticket: int) -> np.ndarray:
+        override = self._ticket_assets.get(ticket)
+        if override is not None:
+            return override
+        row = self.snapshot.adj.row(ticket)
+        return row[self.snapshot.kind_of[row] == KINDS.index('asset')] if len(row) else row
+
+    def _node_neighbours(self, node: int) -> np.ndarray:
+        if node in self._ticket_assets:
+            return self._ticket_assets[node]
+        row = self.snapshot.adj.row(node)
+        removed = self._asset_removed.get(node)
+        if removed:
+            row = row[~np.isin(row, np.fromiter(removed, dtype=np.int64))]
+        added = self._asset_added.get(node)
+        if added:
+            row = np.concatenate([row, np.fromiter(added, dtype=np.int64)])
+        return row
+
+    def neighbours(self, nodes: np.ndarray) -> np.ndarray:
+        if not len(self._touched):
+            return self.snapshot.adj.gather(nodes)
+        touched = np.isin(nodes, self._touched)
+        parts = [self.snapshot.adj.gather(nodes[~touched])]
+        parts += [self._node_neighbours(int(node)) for node in nodes[touched]]
+        return np.concatenate(parts)
+
+    def k_hop(self, node: int, hops: int, zones_only: bool = False, limit: int = 1000) -> List[Tuple[int, int]]:
+        """(node, distance) within `hops` of `node`, nearest first, at most `limit` nodes"""
+        expand = self.snapshot.zones.gather if zones_only else self.neighbours
+        visited = np.array([node], dtype=np.int64)
+        frontier = visited
+        found: List[Tuple[int, int]] = []
+        for distance in range(1, hops + 1):
+            frontier = np.setdiff1d(expand(frontier), visited)
+            if not len(frontier):
+                break
+            visited = np.union1d(visited, frontier)
+            found.extend((int(n), distance) for n in frontier[:limit - len(found)])
+            if len(found) >= limit:
+                break
+        return found
+
+    def root_cause_candidates(self, ticket_id: int, top: int = 10) -> List[Dict]:
+        """Top cofail rows touching the ticket's assets, as kg.fn_RootCauseCandidates"""
+        ticket = self.node('ticket', ticket_id)
+        if ticket is None:
+            return []
+        assets = self.ticket_assets(ticket)
+        snap = self.snapshot
+        rows = np.union1d(snap.cofail_by_a.gather(assets), snap.cofail_by_b.gather(assets))
+        if not len(rows):
+            return []
+        if len(rows) > top:
+            rows = rows[np.argpartition(-snap.cofail_rank[rows], top - 1)[:top]]
+        rows = rows[np.argsort(-snap.cofail_rank[rows], kind='stable')]
+        return [
+            {
+                'site_id': int(site_id),
+                'candidate_asset_id': int(asset_a),
+                'related_asset_id': int(asset_b),
+                'co_count': int(co_count),
+                'score': None if np.isnan(score) else float(score),
+            }
+            for site_id, asset_a, asset_b, co_count, score in snap.cofail[rows]
+        ]
+
+
+def _id_pairs(rows) -> Tuple[np.ndarray, np.ndarray]:
+    arr = np.array([tuple(r) for r in rows], dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def _ids(rows) -> np.ndarray:
+    return np.fromiter((r[0] for r in rows), dtype=np.int64)
+
+
+def load_snapshot() -> GraphSnapshot:
+    """Read nodes, edges and cofail scores in one pass"""
+    started = time.monotonic()
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        # events from this position on are replayed onto the snapshot; read
+        # before TicketAssets so a transaction still open is not missed
+        outbox_position = bytes(cur.execute(MIN_ACTIVE_ROWVERSION_SQL).fetchval())
+        ticket_events = {ticket_id: event_id for ticket_id, event_id in cur.execute(TICKET_EVENT_IDS_SQL).fetchall()
+                         if ticket_id is not None}
+        nodes = {
+            'site': _ids(cur.execute('SELECT site_id FROM kg.Site').fetchall()),
+            'zone': _ids(cur.execute('SELECT zone_id FROM kg.Zone').fetchall()),
+            'asset': _ids(cur.execute('SELECT asset_id FROM kg.Asset').fetchall()),
+        }
+        edges = {
+            ('site', 'zone'): _id_pairs(cur.execute(
+                'SELECT s.site_id, z.zone_id FROM kg.Site s, kg.HAS_ZONE e, kg.Zone z WHERE MATCH(s-(e)->z)').fetchall()),
+            ('site', 'asset'): _id_pairs(cur.execute(
+                'SELECT s.site_id, a.asset_id FROM kg.Site s, kg.HAS_ASSET e, kg.Asset a WHERE MATCH(s-(e)->a)').fetchall()),
+            ('asset', 'zone'): _id_pairs(cur.execute(
+                'SELECT a.asset_id, z.zone_id FROM kg.Asset a, kg.IN_ZONE e, kg.Zone z WHERE MATCH(a-(e)->z)').fetchall()),
+            ('ticket', 'asset'): _id_pairs(cur.execute(
+                'SELECT ticket_id, asset_id FROM app.TicketAssets').fetchall()),
+        }
+        nodes['ticket'] = edges[('ticket', 'asset')][0]
+        adjacency = _id_pairs(cur.execute(
+            'SELECT z1.zone_id, z2.zone_id FROM kg.Zone z1, kg.ADJACENT_TO e, kg.Zone z2 WHERE MATCH(z1-(e)->z2)').fetchall())
+        edges[('zone', 'zone')] = adjacency
+        cofail = np.array([
+            (r.site_id, r.asset_a, r.asset_b, r.co_count, np.nan if r.score is None else r.score)
+            for r in cur.execute('SELECT site_id, asset_a, asset_b, co_count, score FROM kg_analytics.CofailScores').fetchall()
+        ], dtype=np.float64).reshape(-1, 5)
+    snapshot = GraphSnapshot(nodes, edges, adjacency, cofail, outbox_position, ticket_events)
+    logger.info('Graph snapshot loaded nodes=%s edges=%s cofail_rows=%s in %.1fs',
+                snapshot.n, snapshot.edge_count, len(snapshot.cofail), time.monotonic() - started)
+    return snapshot
+
+
+def read_outbox(after: bytes) -> Tuple[bytes, List[Tuple[int, str, str, str]]]:
+    """(new position, ticket events with rowversion in [after, MIN_ACTIVE_ROWVERSION())).
+
+    Events are read without claiming them from the outbox consumers. The
+    upper bound leaves rows of transactions still open to a later read.
+    """
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        high = bytes(cur.execute(MIN_ACTIVE_ROWVERSION_SQL).fetchval())
+        cur.execute(
+            'SELECT event_id, type, aggregate_id, payload FROM app.Outbox '
+            'WHERE aggregate = ? AND rowversion >= ? AND rowversion < ? ORDER BY event_id',
+            'ticket', after, high)
+        return high, [tuple(r) for r in cur.fetchall()]
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+
+from .graph_index import KINDS, GraphIndex, load_snapshot, read_outbox
+from .settings import settings
+
+logger = logging.getLogger('graph_service')
+app = FastAPI()
+
+_index: Optional[GraphIndex] = None
+_tasks: List[asyncio.Task] = []
+
+
+def _require_index() -> GraphIndex:
+    if _index is None:
+        raise HTTPException(status_code=503, detail='Graph index is loading')
+    return _index
+
+
+def _node_or_404(index: GraphIndex, kind: str, key: int) -> int:
+    if kind not in KINDS:
+        raise HTTPException(status_code=400, detail=f'kind must be one of {", ".join(KINDS)}')
+    node = index.node(kind, key)
+    if node is None:
+        raise HTTPException(status_code=404, detail='Not found')
+    return node
+
+
+def _clamp_hops(hops: int) -> int:
+    return max(1, min(hops, settings.graph_max_hops))
+
+
+async def tail_outbox():
+    """Apply ticket events written since the snapshot, by outbox rowversion"""
+    while True:
+        try:
+            index = _index
+            position, rows = await asyncio.to_thread(read_outbox, index.outbox_position)
+            for row in rows:
+                index.apply_event(*row)
+            index.advance(position)
+        except Exception:
+            logger.exception('Graph outbox tail failed')
+        await asyncio.sleep(settings.graph_outbox_poll_s)
+
+
+async def reload_periodically():
+    """Rebuild the snapshot to pick up asset, zone and cofail changes"""
+    while True:
+        await asyncio.sleep(settings.graph_reload_minutes * 60)
+        try:
+            _index.swap(await asyncio.to_thread(load_snapshot))
+        except Exception:
+            logger.exception('Graph snapshot reload failed')
+
+
+@app.on_event('startup')
+async def startup():
+    global _index
+    _index = GraphIndex(await asyncio.to_thread(load_snapshot))
+    _tasks.extend([asyncio.create_task(tail_outbox()), asyncio.create_task(reload_periodically())])
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    for task in _tasks:
+        task.cancel()
+    await asyncio.gather(*_tasks, return_exceptions=True)
+    _tasks.clear()
+
+
+@app.get('/graph/health')
+async def health():
+    index = _require_index()
+    snapshot = index.snapshot
+    return {'nodes': snapshot.n, 'edges': snapshot.edge_count, 'cofail_rows': len(snapshot.cofail),
+            'loaded_at': snapshot.loaded_at, 'outbox_position': index.outbox_position.hex()}
+
+
+@app.get('/graph/{kind}/{key}/neighbourhood')
+async def neighbourhood(kind: str, key: int, hops: int = 2, limit: int = 1000):
+    index = _require_index()
+    node = _node_or_404(index, kind, key)
+    found = []
+    for n, distance in index.k_hop(node, _clamp_hops(hops), limit=max(1, limit)):
+        found_kind, found_id = index.describe(n)
+        found.append({'kind': found_kind, 'id': found_id, 'hops': distance})
+    return found
+
+
+@app.get('/graph/zone/{zone_id}/adjacent')
+async def adjacent_zones(zone_id: int, hops: int = 1):
+    index = _require_index()
+    node = _node_or_404(index, 'zone', zone_id)
+    return [{'zone_id': index.describe(n)[1], 'hops': distance}
+            for n, distance in index.k_hop(node, _clamp_hops(hops), zones_only=True)]
+
+
+@app.get('/graph/ticket/{ticket_id}/root-cause')
+async def root_cause(ticket_id: int, top: int = 10):
+    index = _require_index()
+    return index.root_cause_candidates(ticket_id, max(1, min(top, 100)))
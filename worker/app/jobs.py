@@ -1,7 +1,8 @@
 import time
 import logging
+import threading
 from apscheduler.schedulers.background import BackgroundScheduler
-from .outbox import process_batch
+from .outbox import run_forever
 from .settings import settings
 
 logger = logging.getLogger('worker_jobs')
@@ -9,21 +10,18 @@ logger = logging.getLogger('worker_jobs')
 scheduler = BackgroundScheduler()
 
 def start():
-    scheduler.add_job(process_batch, 'interval', seconds=max(1,int(settings.outbox_poll_ms/1000)))
-    # schedule cofail refresh every 2 minutes
-    from .db import get_conn
-    def refresh_cofails():
-        conn = get_conn()
-        cur = conn.cursor()
-        try:
-            cur.execute('EXEC kg.usp_RefreshCofailScores @site_id=NULL, @window_minutes=120')
-            conn.commit()
-        except Exception:
-            conn.rollback()
-        finally:
-            conn.close()
-
-    scheduler.add_job(refresh_cofails, 'interval', minutes=2)
+    # the outbox drains and long-polls on its own thread rather than on an interval
+    threading.Thread(target=run_forever, name='outbox', daemon=True).start()
+    # fold new events into the co-fail pair counters site by site; decay scores separately
+    from .cofail import CofailShards, rescore
+    from .site_shards import SiteShardRunner
+    cofail = CofailShards(settings.cofail_window_minutes, settings.cofail_lateness_minutes)
+    runner_options = dict(slow_s=settings.analytics_slow_site_s, max_backoff_s=settings.analytics_max_backoff_s)
+    cofail_runner = SiteShardRunner('cofail', cofail.tick, concurrency=settings.analytics_site_concurrency,
+                                    on_sites=cofail.retain, **runner_options)
+    rescore_runner = SiteShardRunner('cofail_rescore', rescore, concurrency=1, **runner_options)
+    scheduler.add_job(cofail_runner.run_once, 'interval', seconds=settings.cofail_poll_s)
+    scheduler.add_job(rescore_runner.run_once, 'interval', minutes=settings.cofail_rescore_minutes)
     scheduler.start()
     logger.info('Worker jobs started')
 
@@ -1,41 +1,63 @@
-import time
 import json
 import logging
-from .db import get_conn
+from .db import pooled_conn
+from .outbox_scheduler import AdaptiveBatchSizer, drain, drain_and_wait
 from .settings import settings
 import httpx
 
 logger = logging.getLogger('outbox')
 
+_sizer = AdaptiveBatchSizer(settings.outbox_batch_min, settings.outbox_batch_max)
+
+
+def _process_rows(cur, batch_size: int) -> int:
+    # call stored proc to dequeue batch
+    cur.execute("EXEC app.usp_Outbox_DequeueBatch @batch_size=?", batch_size)
+    rows = cur.fetchall()
+    for row in rows:
+        try:
+            event_id = row.event_id
+            event_type = row.event_type
+            payload = json.loads(row.payload)
+            # POST to internal API SSE fan-in if configured
+            if settings.api_sse_post_url:
+                httpx.post(settings.api_sse_post_url, json={'event_type': event_type, 'payload': payload}, timeout=10)
+            # mark published - depends on proc implementation; here assume proc marks published
+        except Exception as e:
+            logger.exception('Failed to process outbox row %s', row)
+    return len(rows)
+
+
 def process_batch():
-    conn = get_conn()
-    try:
+    """Drain the outbox, growing the batch size while batches come back full."""
+    with pooled_conn() as conn:
+        try:
+            cur = conn.cursor()
+
+            def run_batch(batch_size: int) -> int:
+                processed = _process_rows(cur, batch_size)
+                conn.commit()
+                return processed
+
+            drain(run_batch, _sizer)
+        except Exception as e:
+            logger.exception('Outbox processing failed')
+            conn.rollback()
+
+
+def wait_for_work() -> bool:
+    """Block server-side until a row is due or the wait times out; True when work is waiting."""
+    with pooled_conn() as conn:
         cur = conn.cursor()
-        # set session context for worker
-        cur.execute("EXEC sys.sp_set_session_context @key=N'user_id', @value=?", settings.worker_user_id)
-        conn.commit()
-        # call stored proc to dequeue batch
-        cur.execute("EXEC app.usp_Outbox_DequeueBatch @batch_size=10")
-        rows = cur.fetchall()
-        for row in rows:
-            try:
-                event_id = row.event_id
-                event_type = row.event_type
-                payload = json.loads(row.payload)
-                # POST to internal API SSE fan-in if configured
-                if settings.api_sse_post_url:
-                    httpx.post(settings.api_sse_post_url, json={'event_type': event_type, 'payload': payload}, timeout=10)
-                # mark published - depends on proc implementation; here assume proc marks published
-            except Exception as e:
-                logger.exception('Failed to process outbox row %s', row)
+        cur.execute("EXEC app.usp_Outbox_WaitForWork @timeout_ms=?", settings.outbox_wait_timeout_ms)
+        row = cur.fetchone()
         conn.commit()
-    except Exception as e:
-        logger.exception('Outbox processing failed')
-        conn.rollback()
-    finally:
-        conn.close()
+        return bool(row[0]) if row else False
+
+
+def run_forever():
+    """Drain the outbox, then long-poll for new work instead of sleeping a fixed interval."""
+    drain_and_wait(process_batch, wait_for_work, settings.outbox_poll_ms / 1000.0)
 
 if __name__ == '__main__':
-    while True:
-        process_batch()
-        time.sleep(settings.outbox_poll_ms / 1000.0)
+    run_forever()
@@ -0,0 +1,69 @@
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger('outbox_scheduler')
+
+
+class AdaptiveBatchSizer:
+    """Batch size that follows the outbox backlog.
+
+    Full batches double the size (up to `max_size`) and mean more work is
+    waiting, so callers should dequeue again immediately. Sparse batches
+    halve it back towards `min_size`.
+    """
+
+    def __init__(self, min_size: int = 10, max_size: int = 500, initial: int | None = None,
+                 sparse_ratio: float = 0.25):
+        if not 0 < min_size <= max_size:
+            raise ValueError('batch sizes must satisfy 0 < min_size <= max_size')
+        self.min_size = min_size
+        self.max_size = max_size
+        self.sparse_ratio = sparse_ratio
+        self.size = min(max(initial or min_size, min_size), max_size)
+
+    def observe(self, fetched: int) -> bool:
+        """Record how many rows the last batch returned; True when it came back full."""
+        full = fetched >= self.size
+        if full:
+            self.size = min(self.max_size, self.size * 2)
+        elif fetched < self.size * self.sparse_ratio:
+            self.size = max(self.min_size, self.size // 2)
+        return full
+
+
+def drain(run_batch: Callable[[int], int], sizer: AdaptiveBatchSizer) -> int:
+    """Run `run_batch(size)` back to back until a batch comes back short.
+
+    For the synchronous, scheduler-driven consumers: one tick empties the
+    backlog instead of taking one fixed-size bite per interval.
+    """
+    total = 0
+    while True:
+        fetched = run_batch(sizer.size)
+        total += fetched
+        if not sizer.observe(fetched):
+            return total
+
+
+def drain_and_wait(drain_once: Callable[[], object], wait_for_work: Callable[[], object],
+                   fallback_s: float) -> None:
+    """Drain the backlog, then block in `wait_for_work` until rows are due; never returns.
+
+    The synchronous consumers run this on a thread of their own instead of
+    a fixed-interval job. `wait_for_work` is a call to
+    app.usp_Outbox_WaitForWork, which returns as soon as a row is due; if a
+    drain or the wakeup call fails, the loop sleeps `fallback_s` instead.
+    """
+    while True:
+        try:
+            drain_once()
+        except Exception:
+            logger.exception('Outbox drain failed')
+            time.sleep(fallback_s)
+            continue
+        try:
+            wait_for_work()
+        except Exception:
+            logger.exception('Outbox wakeup check failed; falling back to polling')
+            time.sleep(fallback_s)
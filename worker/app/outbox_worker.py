@@ -1,11 +1,12 @@
+import asyncio
 import json
 import logging
-import time
-from typing import Any, Dict, List, Optional
+from typing import Any, List, Optional, Tuple
 
-import pyodbc
-import httpx
-from .db import get_conn
+from .db import pooled_conn
+from .delivery import DeliverySkipped, OutboxDelivery
+from .outbox_scheduler import AdaptiveBatchSizer
+from .partitions import LeaseManager, default_consumer_id
 from .settings import settings
 
 logger = logging.getLogger('outbox_worker')
@@ -15,110 +16,170 @@ def backoff(attempt: int) -> float:
     return min(60.0, (2 ** attempt) + (0.5 * attempt))
 
 
-def process_batch_once(batch_size: int = 25) -> int:
-    """Process one batch from the Outbox. Returns number of rows processed."""
-    conn = get_conn()
-    try:
-        cur = conn.cursor()
-        # set session context for worker
-        try:
-            cur.execute("EXEC sys.sp_set_session_context @key=N'user_id', @value=?", settings.worker_user_id)
-            conn.commit()
-        except Exception:
-            # session context set failure should not block; log and continue
-            logger.exception('Failed to set session context')
-            conn.rollback()
+def make_delivery() -> OutboxDelivery:
+    """Build the shared HTTP delivery stage from settings."""
+    return OutboxDelivery(
+        concurrency=settings.outbox_delivery_concurrency,
+        per_target=settings.outbox_target_concurrency,
+        timeout_s=settings.outbox_delivery_timeout_s,
+        http2=settings.outbox_http2,
+    )
+
+
+# Lease owner identity when running in partitioned mode
+CONSUMER_ID = settings.outbox_consumer_id or default_consumer_id()
+
 
+def _dequeue(batch_size: int) -> List[Any]:
+    with pooled_conn() as conn:
+        cur = conn.cursor()
         # Call dequeue proc which marks rows as published and returns them
-        cur.execute("EXEC app.usp_Outbox_DequeueBatch @batch_size=?", batch_size)
+        if settings.outbox_partitioned:
+            cur.execute("EXEC app.usp_Outbox_DequeuePartitioned @owner_id=?, @batch_size=?, @claim_seconds=?",
+                        CONSUMER_ID, batch_size, settings.outbox_lease_seconds)
+        else:
+            cur.execute("EXEC app.usp_Outbox_DequeueBatch @batch_size=?", batch_size)
         rows = cur.fetchall()
-        if not rows:
-            conn.close()
-            return 0
+        conn.commit()
+        return rows
 
-        # Process each row sequentially; the dequeue proc already set published=1
-        for row in rows:
-            try:
-                event_id = getattr(row, 'event_id', None)
-                aggregate = getattr(row, 'aggregate', None)
-                aggregate_id = getattr(row, 'aggregate_id', None)
-                etype = getattr(row, 'type', None)
-                payload = getattr(row, 'payload', None)
-
-                data = json.loads(payload) if payload else {}
-
-                # If API fan-in is configured, POST to it; else, try to publish to configured WEBHOOK_URL
-                if settings.api_sse_post_url:
-                    try:
-                        r = httpx.post(settings.api_sse_post_url, json={'event_type': etype, 'payload': data}, timeout=10)
-                        r.raise_for_status()
-                    except Exception:
-                        logger.exception('Failed to post to api_sse_post_url for event %s', event_id)
-                        # revert published flag and increment try_count
-                        cur.execute("UPDATE app.Outbox SET published=0, try_count = try_count + 1 WHERE event_id = ?", event_id)
-                        conn.commit()
-                        continue
-                elif settings.webhook_url:
-                    try:
-                        r = httpx.post(settings.webhook_url, json={'event_type': etype, 'payload': data}, timeout=10)
-                        r.raise_for_status()
-                    except Exception:
-                        logger.exception('Failed to post to webhook for event %s', event_id)
-                        cur.execute("UPDATE app.Outbox SET published=0, try_count = try_count + 1 WHERE event_id = ?", event_id)
-                        conn.commit()
-                        continue
-                else:
-                    # No target configured — write IntegrationErrors and continue
-                    cur.execute("INSERT INTO app.IntegrationErrors (source, ref_id, message, details, created_at) VALUES (?, ?, ?, ?, SYSUTCDATETIME())",
-                                'outbox_worker', str(event_id), 'no target configured', str({'type': etype}))
-                    conn.commit()
-                    continue
 
-                # If we reach here, event processed successfully; optionally insert a published marker
-                logger.info('Processed outbox event %s type=%s', event_id, etype)
+def encode_event(event_type: str, payload: Optional[str]) -> bytes:
+    """Build the delivery body around the stored payload without re-parsing it.
 
-            except Exception:
-                logger.exception('Failed processing outbox row, marking for retry')
-                try:
-                    cur.execute("UPDATE app.Outbox SET published=0, try_count = try_count + 1 WHERE event_id = ?", getattr(row, 'event_id', None))
-                    conn.commit()
-                except Exception:
-                    conn.rollback()
-        conn.close()
-        return len(rows)
-    except Exception:
-        logger.exception('Outbox batch processing failed')
-        try:
-            conn.rollback()
-        except Exception:
-            pass
-        conn.close()
+    app.Outbox enforces ISJSON(payload), so the text can be spliced in verbatim.
+    """
+    return b'{"event_type":%s,"payload":%s}' % (
+        json.dumps(event_type).encode(), (payload or '{}').encode())
+
+
+def _write_acks(acks: List[Tuple[int, bool, Optional[int]]]):
+    """Persist (event_id, succeeded, retry_after_ms) outcomes with a single proc call."""
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("EXEC app.usp_Outbox_AckBatch @acks=?", (['OutboxAckList', 'app', *acks],))
+        conn.commit()
+
+
+def _record_no_target(rows: List[Any]):
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.fast_executemany = True
+        cur.executemany("INSERT INTO app.IntegrationErrors (source, ref_id, message, details, created_at) VALUES (?, ?, ?, ?, SYSUTCDATETIME())",
+                        [('outbox_worker', str(row.event_id), 'no target configured', str({'type': row.type})) for row in rows])
+        conn.commit()
+
+
+async def process_batch_once(batch_size: int = 25, delivery: Optional[OutboxDelivery] = None) -> int:
+    """Process one batch from the Outbox. Returns number of rows processed.
+
+    Rows are delivered concurrently through `delivery`; DB work runs in a thread
+    so the event loop keeps driving in-flight requests. Outcomes are written back
+    in one call, with failures scheduled for retry after a capped backoff.
+    """
+    rows = await asyncio.to_thread(_dequeue, batch_size)
+    if not rows:
         return 0
 
+    # If API fan-in is configured, POST to it; else, try to publish to configured WEBHOOK_URL
+    url = settings.api_sse_post_url or settings.webhook_url
+    if not url:
+        # No target configured — write IntegrationErrors and continue
+        await asyncio.to_thread(_record_no_target, rows)
+        if settings.outbox_partitioned:
+            # settle the claims so the rows are not reclaimed and reported again
+            await asyncio.to_thread(_write_acks, [(row.event_id, True, None) for row in rows])
+        return len(rows)
+
+    own_delivery = delivery is None
+    if own_delivery:
+        delivery = make_delivery()
+    try:
+        if settings.outbox_partitioned:
+            # strict per-aggregate order: sequential within an aggregate, concurrent across them
+            rows = sorted(rows, key=lambda row: row.event_id)
+            results = await delivery.deliver_ordered(
+                url, [((row.aggregate, row.aggregate_id), encode_event(row.type, row.payload)) for row in rows])
+        else:
+            results = await delivery.deliver_many(url, [encode_event(row.type, row.payload) for row in rows])
+    finally:
+        if own_delivery:
+            await delivery.aclose()
+
+    acks: List[Tuple[int, bool, Optional[int]]] = []
+    for row, error in zip(rows, results):
+        if error is None:
+            logger.debug('Processed outbox event %s type=%s', row.event_id, row.type)
+            acks.append((row.event_id, True, None))
+        elif isinstance(error, DeliverySkipped):
+            # due again at once, but held back by the dequeue until its predecessor succeeds
+            acks.append((row.event_id, False, 0))
+        else:
+            logger.warning('Failed to post outbox event %s: %r', row.event_id, error)
+            acks.append((row.event_id, False, int(backoff(row.try_count + 1) * 1000)))
+
+    await asyncio.to_thread(_write_acks, acks)
+    failed = sum(1 for ack in acks if not ack[1])
+    logger.info('Outbox batch delivered=%s failed=%s', len(acks) - failed, failed)
+    return len(rows)
+
+
+def wait_for_work(timeout_ms: int) -> bool:
+    """Block server-side until a row is due or `timeout_ms` passes; True when work is waiting."""
+    owner_id = CONSUMER_ID if settings.outbox_partitioned else None
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute("EXEC app.usp_Outbox_WaitForWork @timeout_ms=?, @owner_id=?", timeout_ms, owner_id)
+        row = cur.fetchone()
+        conn.commit()
+        return bool(row[0]) if row else False
+
 
 async def run_loop(poll_seconds: float = 2.0):
+    """Drain the outbox while batches come back full, then long-poll for new work.
+
+    `poll_seconds` is only used as a fallback sleep if the wakeup call fails.
+    With OUTBOX_PARTITIONED set, a LeaseManager heartbeats in the background and
+    this worker only consumes the partitions it holds.
+    """
+    sizer = AdaptiveBatchSizer(settings.outbox_batch_min, settings.outbox_batch_max)
+    leases = None
+    if settings.outbox_partitioned:
+        manager = LeaseManager(CONSUMER_ID, settings.outbox_lease_seconds)
+        await asyncio.to_thread(manager.renew)
+        leases = asyncio.create_task(manager.run())
+    try:
+        await _drain_forever(sizer, poll_seconds)
+    finally:
+        if leases:
+            leases.cancel()
+            await asyncio.gather(leases, return_exceptions=True)
+
+
+async def _drain_forever(sizer: AdaptiveBatchSizer, poll_seconds: float):
     attempt = 0
-    while True:
-        try:
-            processed = process_batch_once()
-            if processed == 0:
-                # no work — sleep poll interval
-                await asyncio.sleep(poll_seconds)
-                attempt = 0
-            else:
-                # got work, reset attempt
+    async with make_delivery() as delivery:
+        while True:
+            try:
+                processed = await process_batch_once(sizer.size, delivery=delivery)
                 attempt = 0
-        except Exception:
-            logger.exception('Outbox worker loop error')
-            await asyncio.sleep(backoff(attempt))
-            attempt += 1
+                if sizer.observe(processed):
+                    # backlog — go straight back for the next batch
+                    continue
+                try:
+                    await asyncio.to_thread(wait_for_work, settings.outbox_wait_timeout_ms)
+                except Exception:
+                    logger.exception('Outbox wakeup check failed; falling back to polling')
+                    await asyncio.sleep(poll_seconds)
+            except Exception:
+                logger.exception('Outbox worker loop error')
+                await asyncio.sleep(backoff(attempt))
+                attempt += 1
 
 
 if __name__ == '__main__':
     logging.basicConfig(level=logging.INFO)
     try:
-        import asyncio
-
         asyncio.run(run_loop(settings.outbox_poll_ms / 1000.0))
     except KeyboardInterrupt:
         logger.info('Outbox worker stopped')
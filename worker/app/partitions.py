@@ -0,0 +1,69 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import FrozenSet
+
+from .db import pooled_conn
+
+logger = logging.getLogger('outbox_partitions')
+
+
+def default_consumer_id() -> str:
+    """Identity used for lease rows when OUTBOX_CONSUMER_ID is not set."""
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+class LeaseManager:
+    """Holds this worker's share of outbox partitions through app.OutboxConsumerLeases.
+
+    `run()` heartbeats every third of the lease period. Each heartbeat
+    registers the consumer in app.OutboxConsumers, renews the leases already
+    held and lets app.usp_Outbox_RenewLeases hand back or pick up partitions
+    so that live consumers converge on an even split; the partitions of a
+    consumer that stops heartbeating are taken over once its leases expire.
+    """
+
+    def __init__(self, owner_id: str, lease_seconds: int = 60):
+        self.owner_id = owner_id
+        self.lease_seconds = lease_seconds
+        self.partitions: FrozenSet[int] = frozenset()
+
+    def renew(self) -> FrozenSet[int]:
+        with pooled_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("EXEC app.usp_Outbox_RenewLeases @owner_id=?, @lease_seconds=?",
+                        self.owner_id, self.lease_seconds)
+            partitions = frozenset(row.partition_id for row in cur.fetchall())
+            conn.commit()
+        if partitions != self.partitions:
+            logger.info('Outbox consumer %s now owns %s partitions (gained=%s lost=%s)',
+                        self.owner_id, len(partitions),
+                        sorted(partitions - self.partitions), sorted(self.partitions - partitions))
+        self.partitions = partitions
+        return partitions
+
+    def release(self):
+        """Give up all leases so other consumers can take over immediately."""
+        with pooled_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE app.OutboxConsumerLeases SET owner_id = NULL, lease_expires_at = NULL, heartbeat_at = NULL WHERE owner_id = ?",
+                        self.owner_id)
+            cur.execute("DELETE FROM app.OutboxConsumers WHERE owner_id = ?", self.owner_id)
+            conn.commit()
+        self.partitions = frozenset()
+
+    async def run(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(self.renew)
+                except Exception:
+                    logger.exception('Outbox lease heartbeat failed')
+                await asyncio.sleep(interval)
+        finally:
+            try:
+                await asyncio.to_thread(self.release)
+            except Exception:
+                logger.exception('Failed to release outbox leases')
@@ -7,9 +7,36 @@ class Settings(BaseSettings):
     sql_password: str
     sql_database: str = 'OpsGraph'
     outbox_poll_ms: int = 2000
+    outbox_batch_min: int = 10
+    outbox_batch_max: int = 500
+    outbox_wait_timeout_ms: int = 20000
+    outbox_partitioned: bool = False
+    outbox_consumer_id: str | None = None
+    outbox_lease_seconds: int = 60
     api_sse_post_url: str | None = None
     webhook_url: str | None = None
     worker_user_id: int = 0
+    outbox_delivery_concurrency: int = 32
+    outbox_target_concurrency: int = 8
+    outbox_delivery_timeout_s: float = 10.0
+    outbox_http2: bool = True
+    sql_pool_size: int = 5
+    sql_pool_max_age_s: float = 1800.0
+    sql_pool_health_check_s: float = 30.0
+    sql_pool_acquire_timeout_s: float = 30.0
+    cofail_window_minutes: int = 120
+    cofail_lateness_minutes: int = 15
+    cofail_poll_s: int = 30
+    cofail_rescore_minutes: int = 15
+    analytics_site_concurrency: int = 3
+    analytics_slow_site_s: float = 60.0
+    analytics_max_backoff_s: float = 1800.0
+    graph_outbox_poll_s: float = 2.0
+    graph_reload_minutes: int = 10
+    graph_max_hops: int = 4
+    ai_db_concurrency: int = 4
+    ai_latest_ttl_s: float = 30.0
+    ai_latest_cache_size: int = 1024
 
     class Config:
         env_file = '.env'
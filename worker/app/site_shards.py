@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .db import pooled_conn
+
+logger = logging.getLogger('site_shards')
+
+
+def list_sites() -> List[int]:
+    with pooled_conn() as conn:
+        cur = conn.cursor()
+        cur.execute('SELECT site_id FROM kg.Site ORDER BY site_id')
+        return [row[0] for row in cur.fetchall()]
+
+
+class SiteRunStats:
+    __slots__ = ('runs', 'failures', 'consecutive_failures', 'last_duration_s', 'last_rows',
+                 'last_error', 'next_run_at', 'running')
+
+    def __init__(self):
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_duration_s: Optional[float] = None
+        self.last_rows: Optional[int] = None
+        self.last_error: Optional[str] = None
+        self.next_run_at = 0.0
+        self.running = False
+
+
+class SiteShardRunner:
+    """Run a per-site analytics task for every site on a bounded thread pool.
+
+    `run_once` submits each site that is due and not already running, and
+    returns without waiting, so a slow site never holds up the others.
+    A failing site backs off exponentially from `base_backoff_s` up to
+    `max_backoff_s`; a site slower than `slow_s` waits its own duration
+    before running again. Per-site duration and row counts are kept in
+    `stats`. Threads rather than processes: the work runs in SQL Server and
+    pyodbc releases the GIL while it waits.
+    """
+
+    def __init__(self, name: str, task: Callable[[int], Optional[int]], concurrency: int = 4,
+                 slow_s: float = 60.0, base_backoff_s: float = 30.0, max_backoff_s: float = 1800.0,
+                 sites: Callable[[], Iterable[int]] = list_sites,
+                 on_sites: Optional[Callable[[Iterable[int]], None]] = None):
+        self.name = name
+        self.task = task
+        self.slow_s = slow_s
+        self.base_backoff_s = base_backoff_s
+        self.max_backoff_s = max_backoff_s
+        self._sites = sites
+        self._on_sites = on_sites
+        self._pool = ThreadPoolExecutor(concurrency, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self.stats: Dict[int, SiteRunStats] = {}
+
+    def run_once(self) -> int:
+        """Submit every due site; returns how many were submitted"""
+        site_ids = list(self._sites())
+        if self._on_sites:
+            self._on_sites(site_ids)
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            for site_id in set(self.stats) - set(site_ids):
+                if not self.stats[site_id].running:
+                    del self.stats[site_id]
+            for site_id in site_ids:
+                stats = self.stats.get(site_id)
+                if stats is None:
+                    stats = self.stats[site_id] = SiteRunStats()
+                if not stats.running and stats.next_run_at <= now:
+                    stats.running = True
+                    due.append(site_id)
+        for site_id in due:
+            self._pool.submit(self._run_site, site_id)
+        return len(due)
+
+    def backoff(self, failures: int) -> float:
+        return min(self.max_backoff_s, self.base_backoff_s * 2 ** (failures - 1))
+
+    def _run_site(self, site_id: int):
+        started = time.monotonic()
+        rows, error = None, None
+        try:
+            rows = self.task(site_id)
+        except Exception as e:
+            error = e
+        finished = time.monotonic()
+        duration = finished - started
+        with self._lock:
+            stats = self.stats.setdefault(site_id, SiteRunStats())
+            stats.running = False
+            stats.runs += 1
+            stats.last_duration_s = duration
+            if error is None:
+                stats.consecutive_failures = 0
+                stats.last_rows = rows
+                stats.last_error = None
+                stats.next_run_at = finished + duration if duration > self.slow_s else 0.0
+            else:
+                stats.failures += 1
+                stats.consecutive_failures += 1
+                stats.last_error = str(error)
+                stats.next_run_at = finished + self.backoff(stats.consecutive_failures)
+            failures = stats.consecutive_failures
+            retry_in = max(0.0, stats.next_run_at - finished)
+        if error is not None:
+            logger.error('%s site=%s failed (%s in a row), retry in %.0fs: %r',
+                         self.name, site_id, failures, retry_in, error)
+        elif duration > self.slow_s:
+            logger.warning('%s site=%s slow: rows=%s duration_ms=%d, next run in %.0fs',
+                           self.name, site_id, rows, duration * 1000, retry_in)
+        else:
+            logger.debug('%s site=%s rows=%s duration_ms=%d', self.name, site_id, rows, duration * 1000)
+
+    def close(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
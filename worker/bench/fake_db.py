@@ -0,0 +1,177 @@
+"""In-process stand-in for the slice of SQL Server the outbox worker talks to.
+
+`FakeOutboxDB.connect` plugs into `app.db.ConnectionPool` in place of
+`get_conn`, so the worker code under benchmark runs unchanged. Only the
+statements the non-partitioned outbox path issues are understood; anything
+else raises so a drifting worker cannot silently benchmark a no-op.
+"""
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+
+class OutboxRow:
+    __slots__ = ('event_id', 'aggregate', 'aggregate_id', 'type', 'payload', 'created_at',
+                 'published', 'try_count', 'next_attempt_at')
+
+    def __init__(self, event_id: int, aggregate: str, aggregate_id: str, type: str, payload: str):
+        self.event_id = event_id
+        self.aggregate = aggregate
+        self.aggregate_id = aggregate_id
+        self.type = type
+        self.payload = payload
+        self.created_at = datetime.now(timezone.utc)
+        self.published = False
+        self.try_count = 0
+        self.next_attempt_at: Optional[datetime] = None
+
+    def copy(self) -> 'OutboxRow':
+        row = OutboxRow(self.event_id, self.aggregate, self.aggregate_id, self.type, self.payload)
+        for name in ('created_at', 'published', 'try_count', 'next_attempt_at'):
+            setattr(row, name, getattr(self, name))
+        return row
+
+    def __getitem__(self, index):
+        return getattr(self, self.__slots__[index])
+
+
+class FakeOutboxDB:
+    """Shared state behind every fake connection; thread-safe like the real server."""
+
+    def __init__(self, round_trip_ms: float = 0.0):
+        self.round_trip_s = round_trip_ms / 1000.0
+        self.rows: Dict[int, OutboxRow] = {}
+        self.integration_errors: List[tuple] = []
+        self.round_trips = 0
+        self.connections_opened = 0
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def seed(self, payloads: List[Dict[str, Any]], aggregate: str = 'ticket', event_type: str = 'ticket.updated'):
+        with self._lock:
+            for i, payload in enumerate(payloads):
+                row = OutboxRow(self._next_id, aggregate, str(i % 97), event_type, json.dumps(payload))
+                self.rows[row.event_id] = row
+                self._next_id += 1
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return sum(1 for row in self.rows.values() if not row.published)
+
+    def connect(self) -> 'FakeConnection':
+        with self._lock:
+            self.connections_opened += 1
+        return FakeConnection(self)
+
+    # statement handlers -------------------------------------------------
+
+    def round_trip(self):
+        with self._lock:
+            self.round_trips += 1
+        if self.round_trip_s:
+            time.sleep(self.round_trip_s)
+
+    def execute(self, sql: str, params: tuple) -> List[Any]:
+        statement = ' '.join(sql.split())
+        if statement.startswith('EXEC app.usp_Outbox_DequeueBatch'):
+            return self._dequeue(params[0])
+        if statement.startswith('EXEC app.usp_Outbox_AckBatch'):
+            return self._ack(params[0][2:])
+        if statement.startswith('EXEC app.usp_Outbox_WaitForWork'):
+            return self._wait_for_work(params[0])
+        if statement.startswith('EXEC sys.sp_set_session_context') or statement == 'SELECT 1':
+            return [(1,)]
+        if statement.startswith('INSERT INTO app.IntegrationErrors'):
+            with self._lock:
+                self.integration_errors.append(params)
+            return []
+        raise NotImplementedError(f'FakeOutboxDB does not understand: {statement[:80]}')
+
+    def _due(self, row: OutboxRow, now: datetime) -> bool:
+        return not row.published and (row.next_attempt_at is None or row.next_attempt_at <= now)
+
+    def _dequeue(self, batch_size: int) -> List[OutboxRow]:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            due = [row for row in self.rows.values() if self._due(row, now)]
+            due.sort(key=lambda row: row.created_at)
+            batch = due[:batch_size]
+            for row in batch:
+                row.published = True
+            return [row.copy() for row in batch]
+
+    def _ack(self, acks: List[tuple]) -> List[Any]:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for event_id, succeeded, retry_after_ms in acks:
+                row = self.rows.get(event_id)
+                if row is None or (succeeded and row.next_attempt_at is None):
+                    continue
+                if succeeded:
+                    row.published, row.next_attempt_at = True, None
+                else:
+                    row.published = False
+                    row.try_count += 1
+                    row.next_attempt_at = now + timedelta(milliseconds=retry_after_ms or 0)
+        return []
+
+    def _wait_for_work(self, timeout_ms: int) -> List[tuple]:
+        deadline = time.monotonic() + timeout_ms / 1000.0
+        while True:
+            now = datetime.now(timezone.utc)
+            with self._lock:
+                if any(self._due(row, now) for row in self.rows.values()):
+                    return [(True,)]
+            if time.monotonic() >= deadline:
+                return [(False,)]
+            time.sleep(0.01)
+
+
+class FakeCursor:
+    def __init__(self, db: FakeOutboxDB):
+        self._db = db
+        self._results: List[Any] = []
+        self.fast_executemany = False
+
+    def execute(self, sql: str, *params):
+        if len(params) == 1 and isinstance(params[0], tuple):
+            params = params[0]
+        self._db.round_trip()
+        self._results = self._db.execute(sql, params)
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        # one round trip, as with fast_executemany against the real driver
+        self._db.round_trip()
+        for params in seq_of_params:
+            self._db.execute(sql, tuple(params))
+
+    def fetchall(self):
+        results, self._results = self._results, []
+        return results
+
+    def fetchone(self):
+        return self._results.pop(0) if self._results else None
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    def __init__(self, db: FakeOutboxDB):
+        self._db = db
+
+    def cursor(self) -> FakeCursor:
+        return FakeCursor(self._db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
@@ -0,0 +1,302 @@
+"""Outbox throughput/latency benchmark.
+
+Seeds app.Outbox with synthetic events, drives `outbox_worker.process_batch_once`
+(or `run_loop`) against a local webhook sink and reports events/sec,
+end-to-end latency percentiles (seed time to first successful delivery) and
+DB round trips per event. Each run is appended to bench/results/outbox.jsonl
+together with the current commit so later runs can be compared.
+
+    python -m bench.outbox_bench --events 5000 --db-latency-ms 1
+    python -m bench.outbox_bench --db sql --events 20000 --mode loop --compare
+
+`--db fake` (default) runs against bench.fake_db; `--db sql` uses the
+SQL_* settings of the worker and should point at a scratch database.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+RESULTS_FILE = Path(__file__).parent / 'results' / 'outbox.jsonl'
+BENCH_AGGREGATE = 'bench'
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+class RoundTripCounter:
+    """Counts statements sent through wrapped connections (thread-safe)."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, n: int = 1):
+        with self._lock:
+            self.count += n
+
+    def wrap(self, conn):
+        return _CountingConnection(conn, self)
+
+
+class _CountingCursor:
+    def __init__(self, cursor, counter: RoundTripCounter):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, '_counter', counter)
+
+    def execute(self, *args):
+        self._counter.add()
+        return self._cursor.execute(*args)
+
+    def executemany(self, *args):
+        self._counter.add()
+        return self._cursor.executemany(*args)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._cursor, name, value)
+
+
+class _CountingConnection:
+    def __init__(self, conn, counter: RoundTripCounter):
+        self._conn = conn
+        self._counter = counter
+
+    def cursor(self):
+        return _CountingCursor(self._conn.cursor(), self._counter)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+class WebhookSink:
+    """Local HTTP endpoint that records the first successful delivery of each seeded event."""
+
+    def __init__(self, run_id: str, expected: int, latency_ms: float = 0.0, error_rate: float = 0.0):
+        self.run_id = run_id
+        self.expected = expected
+        self.latency_s = latency_ms / 1000.0
+        self.error_rate = error_rate
+        self.latencies_ms: Dict[int, float] = {}
+        self.requests = 0
+        self.done = asyncio.Event()
+        self.url: Optional[str] = None
+        self._runner: Optional[web.AppRunner] = None
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post('/events', self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, '127.0.0.1', 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f'http://127.0.0.1:{port}/events'
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        body = await request.json()
+        if self.latency_s:
+            await asyncio.sleep(self.latency_s)
+        if self.error_rate and random.random() < self.error_rate:
+            return web.Response(status=500)
+        payload = body.get('payload') or {}
+        if payload.get('run_id') == self.run_id and payload['seq'] not in self.latencies_ms:
+            self.latencies_ms[payload['seq']] = (time.time() - payload['seeded_at']) * 1000.0
+            if len(self.latencies_ms) >= self.expected:
+                self.done.set()
+        return web.Response(status=204)
+
+
+def _payloads(run_id: str, n: int) -> List[Dict[str, Any]]:
+    now = time.time()
+    return [{'run_id': run_id, 'seq': i, 'seeded_at': now, 'ticket_id': i % 997, 'status': 'Open'} for i in range(n)]
+
+
+def _seed_sql(conn, payloads: List[Dict[str, Any]]):
+    cur = conn.cursor()
+    cur.fast_executemany = True
+    cur.executemany("INSERT INTO app.Outbox (aggregate, aggregate_id, type, payload) VALUES (?, ?, ?, ?)",
+                    [(BENCH_AGGREGATE, str(p['seq'] % 97), 'bench.event', json.dumps(p)) for p in payloads])
+    conn.commit()
+
+
+def _cleanup_sql(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM app.Outbox WHERE aggregate = ?", BENCH_AGGREGATE)
+    conn.commit()
+
+
+def _git_revision() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True).stdout.strip())
+        return {'commit': commit, 'dirty': dirty}
+    except Exception:
+        return {'commit': None, 'dirty': None}
+
+
+async def run_benchmark(events: int = 2000, db: str = 'fake', mode: str = 'batch', batch_size: int = 100,
+                        db_latency_ms: float = 0.0, sink_latency_ms: float = 0.0, sink_error_rate: float = 0.0,
+                        timeout_s: float = 300.0) -> Dict[str, Any]:
+    """Run one benchmark and return its parameters and metrics."""
+    if db == 'fake':
+        for key in ('SQL_HOST', 'SQL_USER', 'SQL_PASSWORD'):
+            os.environ.setdefault(key, 'fake')
+    # imported late so the fake backend can satisfy required settings first
+    from app import db as app_db
+    from app import outbox_worker
+    from app.settings import settings
+
+    run_id = uuid.uuid4().hex
+    sink = WebhookSink(run_id, events, sink_latency_ms, sink_error_rate)
+    await sink.start()
+    previous_urls = settings.api_sse_post_url, settings.webhook_url
+    settings.api_sse_post_url = None
+    settings.webhook_url = sink.url
+
+    counter = RoundTripCounter()
+    fake = None
+    if db == 'fake':
+        from bench.fake_db import FakeOutboxDB
+
+        fake = FakeOutboxDB(round_trip_ms=db_latency_ms)
+        connect = fake.connect
+    else:
+        connect = app_db.get_conn
+    pool = app_db.ConnectionPool(lambda: counter.wrap(connect()), size=settings.sql_pool_size,
+                                 on_connect=app_db._set_worker_session_context)
+    previous_pool = app_db.set_pool(pool)
+
+    payloads = _payloads(run_id, events)
+    if fake:
+        fake.seed(payloads, aggregate=BENCH_AGGREGATE, event_type='bench.event')
+    else:
+        with pool.connection() as conn:
+            _seed_sql(conn, payloads)
+    counter.count = 0
+
+    started = time.perf_counter()
+    loop_task = None
+    try:
+        if mode == 'loop':
+            loop_task = asyncio.create_task(outbox_worker.run_loop())
+            await asyncio.wait_for(sink.done.wait(), timeout_s)
+        else:
+            async with outbox_worker.make_delivery() as delivery:
+                deadline = time.monotonic() + timeout_s
+                while not sink.done.is_set():
+                    if time.monotonic() > deadline:
+                        raise asyncio.TimeoutError()
+                    if await outbox_worker.process_batch_once(batch_size, delivery=delivery) == 0:
+                        # everything left is backing off after failures
+                        await asyncio.sleep(0.05)
+        elapsed = time.perf_counter() - started
+    finally:
+        if loop_task:
+            loop_task.cancel()
+            await asyncio.gather(loop_task, return_exceptions=True)
+        await sink.stop()
+        if not fake:
+            with pool.connection() as conn:
+                _cleanup_sql(conn)
+        pool.close()
+        app_db.set_pool(previous_pool)
+        settings.api_sse_post_url, settings.webhook_url = previous_urls
+
+    latencies = list(sink.latencies_ms.values())
+    return {
+        'params': {
+            'events': events, 'db': db, 'mode': mode, 'batch_size': batch_size,
+            'db_latency_ms': db_latency_ms, 'sink_latency_ms': sink_latency_ms,
+            'sink_error_rate': sink_error_rate,
+        },
+        'metrics': {
+            'events_per_sec': round(events / elapsed, 1),
+            'elapsed_s': round(elapsed, 3),
+            'latency_p50_ms': round(percentile(latencies, 50), 2),
+            'latency_p95_ms': round(percentile(latencies, 95), 2),
+            'latency_p99_ms': round(percentile(latencies, 99), 2),
+            'db_round_trips_per_event': round(counter.count / events, 3),
+            'http_requests_per_event': round(sink.requests / events, 3),
+        },
+    }
+
+
+def save_result(result: Dict[str, Any], path: Path = RESULTS_FILE) -> Dict[str, Any]:
+    record = {'at': datetime.now(timezone.utc).isoformat(), **_git_revision(), **result}
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open('a') as fh:
+        fh.write(json.dumps(record) + '\n')
+    return record
+
+
+def previous_result(params: Dict[str, Any], path: Path = RESULTS_FILE, skip_last: bool = True) -> Optional[Dict[str, Any]]:
+    """Most recent stored run with identical parameters."""
+    if not path.exists():
+        return None
+    matches = [r for r in map(json.loads, path.read_text().splitlines()) if r.get('params') == params]
+    if skip_last:
+        matches = matches[:-1]
+    return matches[-1] if matches else None
+
+
+def format_comparison(current: Dict[str, Any], baseline: Dict[str, Any]) -> str:
+    lines = [f"vs {baseline.get('commit')} ({baseline.get('at')}):"]
+    for name, value in current['metrics'].items():
+        before = baseline['metrics'].get(name)
+        if before:
+            lines.append(f'  {name:<28} {before:>10} -> {value:<10} ({(value - before) / before * 100:+.1f}%)')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--events', type=int, default=2000)
+    parser.add_argument('--db', choices=('fake', 'sql'), default='fake')
+    parser.add_argument('--mode', choices=('batch', 'loop'), default='batch')
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--db-latency-ms', type=float, default=0.0, help='simulated round trip cost for --db fake')
+    parser.add_argument('--sink-latency-ms', type=float, default=0.0)
+    parser.add_argument('--sink-error-rate', type=float, default=0.0)
+    parser.add_argument('--timeout', type=float, default=300.0)
+    parser.add_argument('--no-save', action='store_true')
+    parser.add_argument('--compare', action='store_true', help='compare against the last stored run with the same parameters')
+    args = parser.parse_args()
+
+    result = asyncio.run(run_benchmark(
+        events=args.events, db=args.db, mode=args.mode, batch_size=args.batch_size,
+        db_latency_ms=args.db_latency_ms, sink_latency_ms=args.sink_latency_ms,
+        sink_error_rate=args.sink_error_rate, timeout_s=args.timeout,
+    ))
+    print(json.dumps(result, indent=2))
+    if not args.no_save:
+        save_result(result)
+    if args.compare:
+        baseline = previous_result(result['params'], skip_last=not args.no_save)
+        print(format_comparison(result, baseline) if baseline else 'no earlier run with these parameters')
+
+
+if __name__ == '__main__':
+    main()
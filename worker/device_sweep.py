@@ -0,0 +1,114 @@
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import structlog
+
+from source_auth import AuthRejected
+
+logger = structlog.get_logger()
+
+# Status codes meaning the API has no bulk /devices listing
+BULK_UNSUPPORTED_STATUSES = {404, 405, 501}
+
+
+def device_key(device: Dict) -> Optional[str]:
+    key = device.get('device_id', device.get('id'))
+    return None if key is None else str(key)
+
+
+def is_online(device: Dict) -> bool:
+    if 'online' in device:
+        return bool(device['online'])
+    return str(device.get('online_state', '')).lower() == 'online'
+
+
+class DeviceStatusSweep:
+    """Device status sweep for one TeamViewer source.
+
+    Prefers a single `GET /devices` listing and falls back to concurrent
+    `GET /devices/{id}` requests bounded by `concurrency`. Responses are
+    cached with their ETag and revalidated with If-None-Match, so unchanged
+    devices cost a 304. Last-known online state is kept per device so
+    `offline_transitions` reports each outage once.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, base_url: str,
+                 concurrency: int = 16, timeout_s: float = 10.0):
+        self.session = session
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout_s)
+        self.bulk_supported: Optional[bool] = None
+        self._slots = asyncio.Semaphore(concurrency)
+        self._etags: Dict[str, str] = {}
+        self._bodies: Dict[str, object] = {}
+        self._offline_since: Dict[str, Optional[str]] = {}
+
+    async def _get(self, path: str, headers: Dict[str, str]) -> Tuple[int, object]:
+        """GET with ETag revalidation; a 304 returns the cached body with status 200"""
+        request_headers = dict(headers)
+        etag = self._etags.get(path)
+        if etag:
+            request_headers['If-None-Match'] = etag
+        async with self.session.get(f'{self.base_url}{path}', headers=request_headers,
+                                    timeout=self.timeout) as resp:
+            if resp.status == 401:
+                raise AuthRejected('TeamViewer rejected credentials')
+            if resp.status == 304 and path in self._bodies:
+                return 200, self._bodies[path]
+            if resp.status != 200:
+                return resp.status, None
+            body = await resp.json()
+            if resp.headers.get('ETag'):
+                self._etags[path] = resp.headers['ETag']
+                self._bodies[path] = body
+            return 200, body
+
+    async def list_devices(self, headers: Dict[str, str]) -> Optional[Dict[str, Dict]]:
+        """All devices from the bulk listing, or None when the API has none"""
+        if self.bulk_supported is False:
+            return None
+        status, body = await self._get('/devices', headers)
+        if status in BULK_UNSUPPORTED_STATUSES:
+            self.bulk_supported = False
+            return None
+        if status != 200:
+            raise RuntimeError(f'device listing returned HTTP {status}')
+        self.bulk_supported = True
+        devices = body.get('devices', []) if isinstance(body, dict) else body
+        return {key: d for d in devices if (key := device_key(d)) is not None}
+
+    async def fetch_device(self, device_id: str, headers: Dict[str, str]) -> Optional[Dict]:
+        async with self._slots:
+            try:
+                status, body = await self._get(f'/devices/{device_id}', headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning("Device status request failed", device_id=device_id, error=str(e) or type(e).__name__)
+                return None
+        return body if status == 200 else None
+
+    async def sweep(self, device_ids: Iterable[str], headers: Dict[str, str]) -> Dict[str, Dict]:
+        """Current status of every requested device that answered"""
+        device_ids = [str(d) for d in device_ids]
+        listed = await self.list_devices(headers)
+        if listed is not None:
+            return {d: listed[d] for d in device_ids if d in listed}
+        results = await asyncio.gather(*(self.fetch_device(d, headers) for d in device_ids))
+        return {d: device for d, device in zip(device_ids, results) if device is not None}
+
+    def offline_transitions(self, statuses: Dict[str, Dict]) -> List[Tuple[str, Dict, str]]:
+        """(device_id, device, offline_since) for devices that went offline since the last sweep.
+
+        A device seen offline for the first time counts as a transition.
+        Devices missing from `statuses` keep their last-known state.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        went_offline = []
+        for device_id, device in statuses.items():
+            if is_online(device):
+                self._offline_since[device_id] = None
+            elif self._offline_since.get(device_id) is None:
+                self._offline_since[device_id] = now
+                went_offline.append((device_id, device, now))
+        return went_offline
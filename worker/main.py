@@ -1,9 +1,11 @@
+import threading
+
 import pyodbc
 import structlog
 from fastapi import FastAPI
-from apscheduler.schedulers.background import BackgroundScheduler
 import httpx
 from pydantic_settings import BaseSettings
+from app.outbox_scheduler import AdaptiveBatchSizer, drain, drain_and_wait
 
 log = structlog.get_logger()
 app = FastAPI()
@@ -11,22 +13,44 @@ app = FastAPI()
 class Settings(BaseSettings):
     db_dsn: str
     webhook_url: str
+    outbox_wait_timeout_ms: int = 20000
+    outbox_poll_s: float = 5.0
 
 settings = Settings()
 
+_sizer = AdaptiveBatchSizer()
+
 def dequeue_and_fanout():
     conn = pyodbc.connect(settings.db_dsn, autocommit=True)
-    cursor = conn.cursor()
-    cursor.execute("EXEC sys.sp_set_session_context @key=N'user_id', @value=?;", 'worker')
-    cursor.execute("EXEC app.usp_Outbox_DequeueBatch")
-    rows = cursor.fetchall()
-    for row in rows:
-        httpx.post(settings.webhook_url, json=row._asdict())
-    conn.close()
-
-scheduler = BackgroundScheduler()
-scheduler.add_job(dequeue_and_fanout, 'interval', seconds=5)
-scheduler.start()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXEC sys.sp_set_session_context @key=N'user_id', @value=?;", 'worker')
+
+        def fanout(batch_size):
+            cursor.execute("EXEC app.usp_Outbox_DequeueBatch @batch_size=?", batch_size)
+            rows = cursor.fetchall()
+            for row in rows:
+                httpx.post(settings.webhook_url, json=row._asdict())
+            return len(rows)
+
+        # keep dequeuing while batches come back full
+        drain(fanout, _sizer)
+    finally:
+        conn.close()
+
+def wait_for_work():
+    conn = pyodbc.connect(settings.db_dsn, autocommit=True)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("EXEC app.usp_Outbox_WaitForWork @timeout_ms=?", settings.outbox_wait_timeout_ms)
+        row = cursor.fetchone()
+        return bool(row[0]) if row else False
+    finally:
+        conn.close()
+
+# drain, then long-poll in usp_Outbox_WaitForWork until rows are due
+threading.Thread(target=drain_and_wait, args=(dequeue_and_fanout, wait_for_work, settings.outbox_poll_s),
+                 name='outbox-fanout', daemon=True).start()
 
 @app.get("/health")
 def health():
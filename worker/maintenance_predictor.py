@@ -1,7 +1,11 @@
 import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import json
+import numpy as np
+import pandas as pd
 import pyodbc
 import structlog
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
@@ -9,10 +13,187 @@ from apscheduler.triggers.interval import IntervalTrigger
 
 log = structlog.get_logger()
 
+EVENT_COLUMNS = ['event_id', 'asset_id', 'canonical_code', 'level', 'occurred_at']
+
+# Predictions per usp_MaintenancePredictions_BulkRecord call
+PREDICTION_CHUNK_SIZE = 1000
+# Predictions at or above this confidence get a preventive maintenance ticket
+TICKET_CONFIDENCE = 90
+
+# Concurrent usp_AnalyzeSiteImpact calls, one connection each
+IMPACT_WORKERS = 4
+IMPACT_INTERVAL_MINUTES = 15
+# Scores also drift with time and with graph edges, which carry no rowversion
+IMPACT_FULL_SWEEP_HOURS = 24
+
+IMPACT_DIRTY_SQL = """
+    SELECT DISTINCT a.site_id, a.asset_id
+    FROM app.Assets a
+    JOIN (
+        SELECT e.asset_id
+        FROM app.Events e
+        WHERE e.rowversion >= ? AND e.rowversion < ?
+        UNION
+        SELECT ta.asset_id
+        FROM app.Tickets t
+        JOIN app.TicketAssets ta ON ta.ticket_id = t.ticket_id
+        WHERE t.rowversion >= ? AND t.rowversion < ?
+    ) d ON d.asset_id = a.asset_id
+"""
+
+
+def dirty_impact_sites(cursor, watermark: Optional[bytes]) -> Tuple[bytes, Dict[int, Optional[List[int]]]]:
+    """(new watermark, {site_id: asset_ids}) of assets whose events or tickets changed.
+
+    With no watermark every site is returned with None, meaning the whole site.
+    """
+    high = cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))").fetchval()
+    if watermark is None:
+        rows = cursor.execute("SELECT DISTINCT site_id FROM app.Assets").fetchall()
+        return high, {row[0]: None for row in rows}
+    rows = cursor.execute(IMPACT_DIRTY_SQL, watermark, high, watermark, high).fetchall()
+    sites: Dict[int, Optional[List[int]]] = {}
+    for site_id, asset_id in rows:
+        sites.setdefault(site_id, []).append(asset_id)
+    return high, sites
+
+
+def encode_predictions(predictions: List[Tuple[int, Any, Dict[str, Any]]]) -> str:
+    """JSON array of (asset_id, rule, prediction) for usp_MaintenancePredictions_BulkRecord"""
+    return json.dumps([
+        {
+            'asset_id': asset_id,
+            'rule_id': rule.rule_id,
+            'predicted_failure_at': prediction['predicted_failure_at'].isoformat(timespec='milliseconds'),
+            'confidence_score': prediction['confidence_score'],
+            'contributing_factors': prediction['factors'],
+            'create_ticket': prediction['confidence_score'] >= TICKET_CONFIDENCE,
+        }
+        for asset_id, rule, prediction in predictions
+    ])
+
+
+class EventWindow:
+    """Recent events of one asset type, held as columns and topped up incrementally.
+
+    Each refresh reads only rows whose rowversion falls between the previous
+    watermark and MIN_ACTIVE_ROWVERSION(), so rows written by transactions
+    still in flight are picked up by a later refresh rather than skipped.
+    Updated events replace their earlier copy by event_id, and rows older
+    than `horizon_hours` are trimmed.
+    """
+
+    def __init__(self, asset_type: str, horizon_hours: int):
+        self.asset_type = asset_type
+        self.horizon_hours = horizon_hours
+        self.watermark = bytes(8)
+        self.events = pd.DataFrame({
+            'event_id': pd.Series(dtype=object),
+            'asset_id': pd.Series(dtype='int64'),
+            'canonical_code': pd.Series(dtype=object),
+            'level': pd.Series(dtype=object),
+            'occurred_at': pd.Series(dtype='datetime64[ns]'),
+            'is_error': pd.Series(dtype=bool),
+            'is_warning': pd.Series(dtype=bool),
+        })
+
+    def refresh(self, cursor, now: datetime) -> int:
+        """Read new events; returns how many rows were read"""
+        high = cursor.execute("SELECT CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))").fetchval()
+        cursor.execute("""
+            SELECT e.event_id, e.asset_id, e.canonical_code, e.level, e.occurred_at
+            FROM app.Events e
+            JOIN app.Assets a ON e.asset_id = a.asset_id
+            WHERE a.type = ?
+            AND e.occurred_at >= DATEADD(HOUR, -?, SYSUTCDATETIME())
+            AND e.rowversion >= ?
+            AND e.rowversion < ?
+        """, self.asset_type, self.horizon_hours, self.watermark, high)
+        rows = cursor.fetchall()
+        self.watermark = high
+        if rows:
+            self.append(pd.DataFrame.from_records([tuple(r) for r in rows], columns=EVENT_COLUMNS))
+        self.trim(now)
+        return len(rows)
+
+    def append(self, new: pd.DataFrame):
+        new = new.assign(
+            occurred_at=pd.to_datetime(new['occurred_at']),
+            is_error=new['level'].isin(('Error', 'Critical')),
+            is_warning=new['level'].eq('Warning'),
+        )
+        combined = pd.concat([self.events, new], ignore_index=True)
+        self.events = combined.drop_duplicates('event_id', keep='last').reset_index(drop=True)
+
+    def trim(self, now: datetime):
+        cutoff = pd.Timestamp(now - timedelta(hours=self.horizon_hours))
+        if len(self.events) and self.events['occurred_at'].min() < cutoff:
+            self.events = self.events[self.events['occurred_at'] >= cutoff].reset_index(drop=True)
+
+    def asset_counts(self, since: datetime) -> pd.DataFrame:
+        """Per-asset error and warning counts for events since `since`"""
+        recent = self.events[self.events['occurred_at'] >= pd.Timestamp(since)]
+        return recent.groupby('asset_id')[['is_error', 'is_warning']].sum().rename(
+            columns={'is_error': 'error_count', 'is_warning': 'warning_count'})
+
+    def code_patterns(self, asset_ids, since: datetime) -> Dict[int, List[Dict[str, Any]]]:
+        """Distinct (code, level) per asset, with each code's total count in the window"""
+        recent = self.events[(self.events['occurred_at'] >= pd.Timestamp(since))
+                             & self.events['asset_id'].isin(asset_ids)]
+        code_totals = recent.groupby(['asset_id', 'canonical_code']).size().rename('count')
+        pairs = recent[['asset_id', 'canonical_code', 'level']].drop_duplicates()
+        pairs = pairs.join(code_totals, on=['asset_id', 'canonical_code'])
+        patterns: Dict[int, List[Dict[str, Any]]] = {}
+        for asset_id, code, level, count in pairs.itertuples(index=False):
+            patterns.setdefault(int(asset_id), []).append({'code': code, 'level': level, 'count': int(count)})
+        return patterns
+
+
+def evaluate_rule(window: EventWindow, prediction_window_hours: int, confidence_threshold: float,
+                  now: datetime) -> List[Tuple[int, Dict[str, Any]]]:
+    """(asset_id, prediction) for every asset of the window's type that trips the rule.
+
+    Counts errors (Error/Critical) and warnings over twice the prediction
+    window; confidence is 20 per error plus 5 per warning, capped at 100.
+    """
+    since = now - timedelta(hours=prediction_window_hours * 2)
+    counts = window.asset_counts(since)
+    if counts.empty:
+        return []
+    errors = counts['error_count'].to_numpy()
+    warnings = counts['warning_count'].to_numpy()
+    confidence = np.minimum(errors * 20 + warnings * 5, 100)
+    hit = ((errors > 0) | (warnings >= 3)) & (confidence >= confidence_threshold)
+    if not hit.any():
+        return []
+
+    asset_ids = counts.index.to_numpy()[hit]
+    patterns = window.code_patterns(asset_ids, since)
+    predicted_failure_at = now + timedelta(hours=prediction_window_hours)
+    return [
+        (int(asset_id), {
+            'predicted_failure_at': predicted_failure_at,
+            'confidence_score': int(score),
+            'factors': {
+                'error_count': int(error_count),
+                'warning_count': int(warning_count),
+                'event_patterns': patterns.get(int(asset_id), []),
+            }
+        })
+        for asset_id, score, error_count, warning_count
+        in zip(asset_ids, confidence[hit], errors[hit], warnings[hit])
+    ]
+
+
 class MaintenancePredictor:
     def __init__(self, connection_string: str):
         self.connection_string = connection_string
         self.scheduler = AsyncIOScheduler()
+        self._windows: Dict[str, EventWindow] = {}
+        self._impact_pool = ThreadPoolExecutor(IMPACT_WORKERS, thread_name_prefix='impact')
+        self._impact_local = threading.local()
+        self._impact_watermark: Optional[bytes] = None
+        self._impact_full_sweep_at: Optional[datetime] = None
 
     async def start(self):
         """Start the predictive maintenance scheduler"""
@@ -24,10 +205,10 @@ class MaintenancePredictor:
             name='Predictive Maintenance Analysis'
         )
         
-        # Update impact scores every 6 hours
+        # Refresh impact scores of changed assets
         self.scheduler.add_job(
             self.update_impact_scores,
-            IntervalTrigger(hours=6),
+            IntervalTrigger(minutes=IMPACT_INTERVAL_MINUTES),
             id='impact_analyzer',
             name='Asset Impact Analysis'
         )
@@ -50,88 +231,41 @@ class MaintenancePredictor:
             """)
             rules = cursor.fetchall()
 
+            rules_by_type: Dict[str, List[Any]] = {}
             for rule in rules:
-                # Parse the condition pattern (JSON format)
-                pattern = json.loads(rule.condition_pattern)
-                
-                # Get relevant events for analysis
-                cursor.execute("""
-                    SELECT e.asset_id, e.canonical_code, e.level,
-                           e.occurred_at, e.message,
-                           a.type as asset_type
-                    FROM app.Events e
-                    JOIN app.Assets a ON e.asset_id = a.asset_id
-                    WHERE a.type = ?
-                    AND e.occurred_at >= DATEADD(HOUR, -?, SYSUTCDATETIME())
-                    ORDER BY e.asset_id, e.occurred_at
-                """, rule.asset_type, rule.prediction_window_hours * 2)
-                
-                events = cursor.fetchall()
-
-                # Group events by asset
-                asset_events: Dict[int, List[Any]] = {}
-                for event in events:
-                    if event.asset_id not in asset_events:
-                        asset_events[event.asset_id] = []
-                    asset_events[event.asset_id].append(event)
-
-                # Analyze each asset's events
-                for asset_id, asset_events in asset_events.items():
-                    prediction = self._analyze_events(
-                        asset_id, asset_events, pattern,
-                        rule.prediction_window_hours,
-                        rule.confidence_threshold
-                    )
-                    
-                    if prediction:
-                        # Record the prediction
-                        cursor.execute("""
-                            INSERT INTO app.MaintenancePredictions (
-                                asset_id, rule_id, predicted_failure_at,
-                                confidence_score, contributing_factors
-                            )
-                            VALUES (?, ?, ?, ?, ?)
-                        """, (
-                            asset_id,
-                            rule.rule_id,
-                            prediction['predicted_failure_at'],
-                            prediction['confidence_score'],
-                            json.dumps(prediction['factors'])
-                        ))
-
-                        # Create a preventive maintenance ticket if confidence is high
-                        if prediction['confidence_score'] >= 90:
-                            cursor.execute("""
-                                INSERT INTO app.Tickets (
-                                    site_id, asset_id, category_id,
-                                    priority, severity, summary,
-                                    status, created_at, updated_at
-                                )
-                                SELECT 
-                                    a.site_id,
-                                    a.asset_id,
-                                    (SELECT category_id FROM app.Categories WHERE name = 'Preventive Maintenance'),
-                                    'P2',
-                                    'High',
-                                    'Predictive Maintenance Required - ' + a.name,
-                                    'Open',
-                                    SYSUTCDATETIME(),
-                                    SYSUTCDATETIME()
-                                FROM app.Assets a
-                                WHERE a.asset_id = ?
-                            """, asset_id)
-                            
-                            ticket_id = cursor.execute("SELECT SCOPE_IDENTITY()").fetchval()
-                            
-                            # Update prediction with ticket reference
-                            cursor.execute("""
-                                UPDATE app.MaintenancePredictions
-                                SET ticket_id = ?
-                                WHERE prediction_id = SCOPE_IDENTITY()
-                            """, ticket_id)
-
-            conn.commit()
-            log.info("Completed predictive maintenance analysis")
+                rules_by_type.setdefault(rule.asset_type, []).append(rule)
+
+            now = datetime.utcnow()
+            predictions = []
+            for asset_type, type_rules in rules_by_type.items():
+                window = self._event_window(asset_type, max(r.prediction_window_hours * 2 for r in type_rules))
+                read = window.refresh(cursor, now)
+                log.debug("Refreshed event window", asset_type=asset_type,
+                          new_events=read, events=len(window.events))
+                for rule in type_rules:
+                    for asset_id, prediction in evaluate_rule(
+                        window, rule.prediction_window_hours, rule.confidence_threshold, now
+                    ):
+                        predictions.append((asset_id, rule, prediction))
+            for asset_type in set(self._windows) - set(rules_by_type):
+                del self._windows[asset_type]
+
+            recorded = tickets_created = tickets_reused = 0
+            for start in range(0, len(predictions), PREDICTION_CHUNK_SIZE):
+                cursor.execute(
+                    "EXEC app.usp_MaintenancePredictions_BulkRecord @Predictions=?",
+                    encode_predictions(predictions[start:start + PREDICTION_CHUNK_SIZE])
+                )
+                row = cursor.fetchone()
+                recorded += row.predictions_recorded
+                tickets_created += row.tickets_created
+                tickets_reused += row.tickets_reused
+                conn.commit()
+
+            log.info("Completed predictive maintenance analysis",
+                     predictions=recorded,
+                     tickets_created=tickets_created,
+                     tickets_reused=tickets_reused)
 
         except Exception as e:
             log.error("Failed to run maintenance predictions", error=str(e))
@@ -139,71 +273,80 @@ class MaintenancePredictor:
             cursor.close()
             conn.close()
 
+    def _event_window(self, asset_type: str, horizon_hours: int) -> EventWindow:
+        window = self._windows.get(asset_type)
+        if window is None or window.horizon_hours < horizon_hours:
+            # a longer horizon needs history the window never read
+            window = self._windows[asset_type] = EventWindow(asset_type, horizon_hours)
+        window.horizon_hours = horizon_hours
+        return window
+
     async def update_impact_scores(self):
-        """Update impact scores for all assets"""
+        """Recompute impact scores for assets touched since the last run.
+
+        Assets are found through Events/Tickets rowversions and analysed one
+        site per call across the impact pool. The first run, and one run per
+        IMPACT_FULL_SWEEP_HOURS, analyse every site in full. The watermark only
+        advances when every site succeeded, so failures are retried next run.
+        """
+        loop = asyncio.get_running_loop()
+        now = datetime.utcnow()
+        full = (self._impact_full_sweep_at is None
+                or now - self._impact_full_sweep_at >= timedelta(hours=IMPACT_FULL_SWEEP_HOURS))
+        watermark = None if full else self._impact_watermark
         try:
-            conn = pyodbc.connect(self.connection_string)
-            cursor = conn.cursor()
+            high, sites = await loop.run_in_executor(
+                self._impact_pool, self._on_impact_connection, dirty_impact_sites, watermark)
+        except Exception as e:
+            log.error("Failed to find changed assets", error=str(e))
+            return
 
-            # Get all assets
-            cursor.execute("SELECT asset_id FROM app.Assets")
-            assets = cursor.fetchall()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(self._impact_pool, self._on_impact_connection,
+                                 self._analyze_site, site_id, asset_ids)
+            for site_id, asset_ids in sites.items()
+        ), return_exceptions=True)
 
-            for asset in assets:
-                # Update impact score
-                cursor.execute("EXEC app.usp_AnalyzeAssetImpact @asset_id = ?", 
-                             asset.asset_id)
+        analyzed = 0
+        failed = []
+        for site_id, result in zip(sites, results):
+            if isinstance(result, Exception):
+                failed.append(site_id)
+                log.error("Failed to update site impact scores", site_id=site_id, error=str(result))
+            else:
+                analyzed += result
+        if not failed:
+            self._impact_watermark = high
+            if full:
+                self._impact_full_sweep_at = now
+        log.info("Updated asset impact scores", full_sweep=full, sites=len(sites),
+                 assets=analyzed, failed_sites=len(failed))
 
-            conn.commit()
-            log.info("Updated all asset impact scores")
+    @staticmethod
+    def _analyze_site(cursor, site_id: int, asset_ids: Optional[List[int]]) -> int:
+        cursor.execute(
+            "EXEC app.usp_AnalyzeSiteImpact @site_id=?, @asset_ids=?, @return_scores=0",
+            site_id, None if asset_ids is None else json.dumps(asset_ids)
+        )
+        analyzed = cursor.fetchval()
+        cursor.commit()
+        return analyzed
 
-        except Exception as e:
-            log.error("Failed to update impact scores", error=str(e))
-        finally:
-            cursor.close()
+    def _on_impact_connection(self, fn, *args):
+        """Run fn(cursor, *args) on this pool thread's connection, reconnecting after errors"""
+        conn = getattr(self._impact_local, 'conn', None)
+        if conn is None:
+            conn = self._impact_local.conn = pyodbc.connect(self.connection_string)
+        try:
+            cursor = conn.cursor()
+            try:
+                return fn(cursor, *args)
+            finally:
+                cursor.close()
+        except pyodbc.Error:
+            self._impact_local.conn = None
             conn.close()
-
-    def _analyze_events(self, asset_id: int, events: List[Any], 
-                       pattern: Dict[str, Any], window_hours: int,
-                       confidence_threshold: float) -> Dict[str, Any]:
-        """
-        Analyze events for an asset to predict potential failures.
-        Returns prediction details if confidence threshold is met.
-        """
-        now = datetime.utcnow()
-        prediction_window = timedelta(hours=window_hours)
-        
-        # Example pattern matching (customize based on your needs)
-        error_count = sum(1 for e in events if e.level in ('Error', 'Critical'))
-        warning_count = sum(1 for e in events if e.level == 'Warning')
-        
-        # Simple prediction model (enhance with ML as needed)
-        if error_count > 0 or warning_count >= 3:
-            confidence = min(
-                ((error_count * 20) + (warning_count * 5)), 
-                100
-            )
-            
-            if confidence >= confidence_threshold:
-                return {
-                    'predicted_failure_at': now + prediction_window,
-                    'confidence_score': confidence,
-                    'factors': {
-                        'error_count': error_count,
-                        'warning_count': warning_count,
-                        'event_patterns': [
-                            {
-                                'code': e.canonical_code,
-                                'level': e.level,
-                                'count': sum(1 for x in events 
-                                           if x.canonical_code == e.canonical_code)
-                            }
-                            for e in events
-                        ]
-                    }
-                }
-        
-        return None
+            raise
 
 if __name__ == "__main__":
     import os
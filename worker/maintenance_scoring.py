@@ -0,0 +1,169 @@
+import json
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from model_registry import Deployment, ModelCache, ModelKey, ModelLoad
+
+# Model inputs, in column order
+FEATURE_NAMES = [
+    'error_count',
+    'critical_count',
+    'warning_count',
+    'distinct_codes',
+    'hours_since_last_event',
+    'open_tickets',
+    'age_days',
+]
+# Event counts cover this many days; assets with no events in it report it as hours_since_last_event
+FEATURE_WINDOW_DAYS = 7
+
+# One row per asset of a type: asset_id followed by FEATURE_NAMES
+ASSET_FEATURES_SQL = """
+    SELECT
+        a.asset_id,
+        COALESCE(e.error_count, 0),
+        COALESCE(e.critical_count, 0),
+        COALESCE(e.warning_count, 0),
+        COALESCE(e.distinct_codes, 0),
+        COALESCE(e.hours_since_last_event, ? * 24),
+        t.open_tickets,
+        COALESCE(DATEDIFF(DAY, a.installed_at, SYSUTCDATETIME()), 0)
+    FROM app.Assets a
+    LEFT JOIN (
+        SELECT
+            ev.asset_id,
+            SUM(CASE WHEN ev.level IN ('Error', 'Critical') THEN 1 ELSE 0 END) AS error_count,
+            SUM(CASE WHEN ev.level = 'Critical' THEN 1 ELSE 0 END) AS critical_count,
+            SUM(CASE WHEN ev.level = 'Warning' THEN 1 ELSE 0 END) AS warning_count,
+            COUNT(DISTINCT ev.canonical_code) AS distinct_codes,
+            DATEDIFF(HOUR, MAX(ev.occurred_at), SYSUTCDATETIME()) AS hours_since_last_event
+        FROM app.Events ev
+        JOIN app.Assets x ON x.asset_id = ev.asset_id
+        WHERE x.type = ?
+        AND ev.occurred_at >= DATEADD(DAY, -?, SYSUTCDATETIME())
+        GROUP BY ev.asset_id
+    ) e ON e.asset_id = a.asset_id
+    OUTER APPLY (
+        SELECT COUNT(*) AS open_tickets
+        FROM app.TicketAssets ta
+        JOIN app.Tickets tk ON tk.ticket_id = ta.ticket_id
+        WHERE ta.asset_id = a.asset_id
+        AND tk.status IN ('Open', 'In Progress', 'Pending')
+    ) t
+    WHERE a.type = ?
+    ORDER BY a.asset_id
+"""
+
+# (row indices, confidence, importance) of the rows at or above a threshold
+Scored = Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]
+
+# Features named in each prediction's explanation
+EXPLANATION_FEATURES = 3
+
+# Models loaded by this process
+_models = ModelCache()
+
+
+def asset_features_params(asset_type: str) -> Tuple:
+    return (FEATURE_WINDOW_DAYS, asset_type, FEATURE_WINDOW_DAYS, asset_type)
+
+
+def feature_matrix(rows: Sequence[Sequence]) -> Tuple[np.ndarray, np.ndarray]:
+    """(asset_ids, features) from ASSET_FEATURES_SQL rows"""
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, len(FEATURE_NAMES)))
+    data = np.array([tuple(row) for row in rows], dtype=np.float64)
+    return data[:, 0].astype(np.int64), data[:, 1:]
+
+
+def prepare_features(features: Dict[str, float]) -> np.ndarray:
+    """Feature vector for one asset; missing features are 0"""
+    return np.array([float(features.get(name) or 0) for name in FEATURE_NAMES])
+
+
+def failure_probability(model, proba: np.ndarray) -> np.ndarray:
+    """Probability of the failure class per row.
+
+    Binary models score the positive class; anything else falls back to the
+    most likely class.
+    """
+    classes = getattr(model, 'classes_', None)
+    if classes is not None and len(classes) == 2:
+        return proba[:, 1]
+    return proba.max(axis=1)
+
+
+def local_importance(importances: Optional[np.ndarray], features: np.ndarray) -> Optional[np.ndarray]:
+    """Per-row feature importance, or None if the model exposes none.
+
+    The model's global importances are weighted by how far each row's
+    features sit from the batch mean (in standard deviations) and each row
+    is normalised to sum to 1. Rows at the mean keep the global importances.
+    """
+    if importances is None:
+        return None
+    importances = np.asarray(importances, dtype=np.float64)
+    std = features.std(axis=0)
+    std[std == 0] = 1.0
+    weights = np.abs(features - features.mean(axis=0)) / std * importances
+    totals = weights.sum(axis=1, keepdims=True)
+    base = importances / (importances.sum() or 1.0)
+    return np.where(totals > 0, weights / np.where(totals > 0, totals, 1.0), base)
+
+
+def explain(importance: np.ndarray, names: Sequence[str] = FEATURE_NAMES) -> List[str]:
+    """Explanation naming the top features of each importance row"""
+    top = np.argsort(-importance, axis=1, kind='stable')[:, :EXPLANATION_FEATURES]
+    return [
+        'Prediction based on: ' + ', '.join(
+            f'{names[i]} (importance: {row[i]:.2f})' for i in order
+        )
+        for row, order in zip(importance, top)
+    ]
+
+
+def score(model, features: np.ndarray, threshold: float) -> Scored:
+    """(row indices, confidence, importance) of rows scoring at or above `threshold`.
+
+    `predict_proba` runs once over the whole matrix.
+    """
+    if not len(features):
+        return np.empty(0, dtype=np.int64), np.empty(0), None
+    confidence = failure_probability(model, model.predict_proba(features))
+    hit = np.flatnonzero(confidence >= threshold)
+    importance = local_importance(getattr(model, 'feature_importances_', None), features)
+    return hit, confidence[hit], importance[hit] if importance is not None else None
+
+
+def score_deployment(deployment: Deployment, features: np.ndarray, threshold: float,
+                     live_keys: FrozenSet[ModelKey]) -> Tuple[Scored, Optional[ModelLoad]]:
+    """`score` with a deployed model, and the load cost if this call loaded it.
+
+    Runs in the predictor's process pool, so only the deployment, the
+    matrix and the live keys cross the process boundary. Each process keeps
+    its models in a ModelCache and evicts any not in `live_keys`.
+    """
+    _models.retain(live_keys)
+    model, load = _models.get(deployment)
+    return score(model, features, threshold), load
+
+
+def encode_model_predictions(asset_ids: np.ndarray, confidence: np.ndarray, importance: Optional[np.ndarray],
+                             predicted_failure_at: datetime) -> str:
+    """JSON array for usp_MaintenancePredictions_BulkRecordModel"""
+    at = predicted_failure_at.isoformat(timespec='milliseconds')
+    explanations = explain(importance) if importance is not None else [None] * len(asset_ids)
+    return json.dumps([
+        {
+            'asset_id': int(asset_id),
+            'predicted_failure_at': at,
+            'confidence_score': round(float(conf) * 100, 2),
+            'feature_importance': (
+                dict(zip(FEATURE_NAMES, map(float, importance[i]))) if importance is not None else {}
+            ),
+            'prediction_explanation': explanations[i],
+        }
+        for i, (asset_id, conf) in enumerate(zip(asset_ids, confidence))
+    ])
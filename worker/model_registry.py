@@ -0,0 +1,231 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+
+import joblib
+import structlog
+
+logger = structlog.get_logger()
+
+# (model_id, artifact checksum)
+ModelKey = Tuple[int, str]
+
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+# Active deployment per asset type, with the artifact of its latest completed training run
+ACTIVE_MODELS_SQL = """
+    SELECT m.model_id, m.asset_type, h.model_artifacts_path
+    FROM app.MaintenanceModels m
+    JOIN app.ModelDeployments d ON m.model_id = d.model_id
+    CROSS APPLY (
+        SELECT TOP 1 th.model_artifacts_path
+        FROM app.ModelTrainingHistory th
+        WHERE th.model_id = m.model_id
+        AND th.training_status = 'Completed'
+        AND th.model_artifacts_path IS NOT NULL
+        ORDER BY th.training_completed_at DESC
+    ) h
+    WHERE m.is_active = 1
+    AND d.deployment_status = 'Active'
+"""
+
+
+class Deployment(NamedTuple):
+    model_id: int
+    asset_type: str
+    path: str
+    checksum: str
+
+    @property
+    def key(self) -> ModelKey:
+        return (self.model_id, self.checksum)
+
+
+class ModelLoad(NamedTuple):
+    """What loading one model cost the process that loaded it"""
+    load_seconds: float
+    rss_bytes: Optional[int]
+    artifact_bytes: int
+
+
+def artifact_checksum(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resident_bytes() -> Optional[int]:
+    """Resident set size of this process, where /proc is available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_model(path: str) -> Tuple[Any, ModelLoad]:
+    """Load an artifact with its arrays memory-mapped read-only.
+
+    Mapped arrays live in the page cache, so every process that loads the
+    same artifact shares one copy of them. Arrays an estimator copies while
+    unpickling (tree nodes, for one) are still private to each process, and
+    artifacts dumped with compression cannot be mapped at all.
+    """
+    rss_before = resident_bytes()
+    started = time.monotonic()
+    model = joblib.load(path, mmap_mode='r')
+    load_seconds = time.monotonic() - started
+    rss_after = resident_bytes()
+    rss = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+    return model, ModelLoad(load_seconds, rss, os.path.getsize(path))
+
+
+class ChecksumCache:
+    """Artifact checksums, recomputed only when the file's size, mtime or inode change"""
+
+    def __init__(self):
+        self._sums: Dict[str, Tuple[Tuple[int, int, int], str]] = {}
+
+    def checksum(self, path: str) -> str:
+        st = os.stat(path)
+        stamp = (st.st_size, st.st_mtime_ns, st.st_ino)
+        cached = self._sums.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        checksum = artifact_checksum(path)
+        self._sums[path] = (stamp, checksum)
+        return checksum
+
+    def retain(self, paths: Iterable[str]):
+        keep = set(paths)
+        self._sums = {path: v for path, v in self._sums.items() if path in keep}
+
+
+class ModelCache:
+    """Models loaded in this process, keyed by (model_id, checksum).
+
+    A new checksum for a model_id is a new entry, so an artifact replaced on
+    disk is never served from its old copy; `retain` drops everything that
+    is no longer deployed.
+    """
+
+    def __init__(self):
+        self._models: Dict[ModelKey, Any] = {}
+
+    def get(self, deployment: Deployment) -> Tuple[Any, Optional[ModelLoad]]:
+        """(model, load cost if it was loaded by this call)"""
+        model = self._models.get(deployment.key)
+        if model is not None:
+            return model, None
+        model, load = load_model(deployment.path)
+        self._models[deployment.key] = model
+        return model, load
+
+    def retain(self, keys: FrozenSet[ModelKey]) -> int:
+        """Evict models whose key is not in `keys`; returns how many were evicted"""
+        stale = [key for key in self._models if key not in keys]
+        for key in stale:
+            del self._models[key]
+        return len(stale)
+
+    def __len__(self):
+        return len(self._models)
+
+
+class ModelRegistry:
+    """Which artifact is deployed for each asset type, by (model_id, checksum).
+
+    `sync` takes ACTIVE_MODELS_SQL rows, checksums each artifact (cached by
+    file stat, so an unchanged fleet costs one stat per model) and swaps in
+    the new deployment map with a single assignment: scoring in flight keeps
+    the map it started with. A deployment whose artifact cannot be read
+    keeps the asset type's previous deployment rather than leaving it
+    unscored. Models themselves are loaded by the processes that score
+    them, which report their load cost back through `record_load`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checksums = ChecksumCache()
+        self.deployments: Dict[str, Deployment] = {}
+        self._loads: Dict[ModelKey, ModelLoad] = {}
+        self.retired_total = 0
+
+    def sync(self, rows: Iterable[Tuple[int, str, str]]) -> Tuple[List[Deployment], List[Deployment]]:
+        """Apply the active deployment rows; returns (deployed, retired). Blocking: reads artifacts."""
+        with self._lock:
+            current = self.deployments
+            deployments: Dict[str, Deployment] = {}
+            for model_id, asset_type, path in rows:
+                try:
+                    deployments[asset_type] = Deployment(model_id, asset_type, path, self._checksums.checksum(path))
+                except OSError as e:
+                    logger.error("Cannot read model artifact", model_id=model_id, path=path, error=str(e))
+                    if asset_type in current:
+                        deployments[asset_type] = current[asset_type]
+
+            live = {d.key for d in deployments.values()}
+            previous = {d.key for d in current.values()}
+            deployed = [d for d in deployments.values() if d.key not in previous]
+            retired = [d for d in current.values() if d.key not in live]
+            self.deployments = deployments
+            self._loads = {key: load for key, load in self._loads.items() if key in live}
+            self._checksums.retain(d.path for d in deployments.values())
+            self.retired_total += len(retired)
+
+        for d in deployed:
+            logger.info("Model deployed", model_id=d.model_id, asset_type=d.asset_type, checksum=d.checksum[:12])
+        for d in retired:
+            logger.info("Model retired", model_id=d.model_id, asset_type=d.asset_type, checksum=d.checksum[:12])
+        return deployed, retired
+
+    def get(self, asset_type: str) -> Optional[Deployment]:
+        return self.deployments.get(asset_type)
+
+    def live_keys(self) -> FrozenSet[ModelKey]:
+        return frozenset(d.key for d in self.deployments.values())
+
+    def record_load(self, key: ModelKey, load: ModelLoad):
+        with self._lock:
+            if key in self.live_keys():
+                self._loads[key] = load
+        logger.info("Model loaded", model_id=key[0], checksum=key[1][:12],
+                    seconds=round(load.load_seconds, 3), rss_bytes=load.rss_bytes)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per deployed model: its key, artifact size and the cost of its latest load"""
+        out = []
+        for d in sorted(self.deployments.values(), key=lambda d: d.model_id):
+            load = self._loads.get(d.key)
+            out.append({
+                'model_id': d.model_id,
+                'asset_type': d.asset_type,
+                'checksum': d.checksum,
+                'artifact_bytes': load.artifact_bytes if load else None,
+                'load_seconds': load.load_seconds if load else None,
+                'rss_bytes': load.rss_bytes if load else None,
+            })
+        return out
+
+    def render_prometheus(self) -> str:
+        lines = []
+        stats = self.stats()
+        for name, field, help_text in (
+            ('opsgraph_model_load_seconds', 'load_seconds', 'Time to load the deployed model artifact'),
+            ('opsgraph_model_rss_bytes', 'rss_bytes', 'Resident memory added by loading the model'),
+            ('opsgraph_model_artifact_bytes', 'artifact_bytes', 'Size of the model artifact'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            for s in stats:
+                if s[field] is not None:
+                    lines.append(f'{name}{{model_id="{s["model_id"]}",asset_type="{s["asset_type"]}"}} {s[field]:g}')
+        lines += [
+            '# HELP opsgraph_models_retired_total Deployments swapped out or retired',
+            '# TYPE opsgraph_models_retired_total counter',
+            f'opsgraph_models_retired_total {self.retired_total}',
+        ]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,222 @@
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Bytes read from a vendor response at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_STRUCTURAL = re.compile(rb'[\[\]{},"]')
+_STRING_SPECIAL = re.compile(rb'["\\]')
+_NON_WHITESPACE = re.compile(rb'[^ \t\r\n]')
+_OPEN = frozenset(b'[{')
+_CLOSE = frozenset(b']}')
+_QUOTE, _BACKSLASH = ord('"'), ord('\\')
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Parse JSON with orjson when it is installed, else the standard library"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class JSONArraySplitter:
+    """Split a JSON array, fed in arbitrary byte chunks, into the raw bytes of each element.
+
+    Only nesting depth and string state are tracked, jumping between
+    structural characters with regex searches, so elements are never
+    decoded here and each one comes out exactly as the vendor sent it.
+    Input that does not start with `[` raises ValueError.
+    """
+
+    def __init__(self):
+        self._buf = bytearray()
+        self._pos = 0
+        self._start = 0
+        self._depth = 0
+        self._in_string = False
+        self._opened = False
+        self.closed = False
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        buf = self._buf
+        buf += chunk
+        elements: List[bytes] = []
+        i = self._pos
+        while not self.closed:
+            if self._in_string:
+                m = _STRING_SPECIAL.search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                j = m.start()
+                if buf[j] == _BACKSLASH:
+                    if j + 1 >= len(buf):
+                        # the escaped byte is in the next chunk
+                        i = j
+                        break
+                    i = j + 2
+                    continue
+                self._in_string = False
+                i = j + 1
+                continue
+            if not self._opened:
+                m = _NON_WHITESPACE.search(buf, i)
+                if m is None:
+                    i = len(buf)
+                    break
+                if buf[m.start()] != ord('['):
+                    raise ValueError('expected a JSON array')
+                self._opened = True
+                self._depth = 1
+                i = self._start = m.start() + 1
+                continue
+            m = _STRUCTURAL.search(buf, i)
+            if m is None:
+                i = len(buf)
+                break
+            j = m.start()
+            c = buf[j]
+            if c == _QUOTE:
+                self._in_string = True
+            elif c in _OPEN:
+                self._depth += 1
+            elif c in _CLOSE:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(elements, j)
+                    self.closed = True
+            elif self._depth == 1:
+                self._emit(elements, j)
+                self._start = j + 1
+            i = j + 1
+        # Drop consumed bytes, keeping the element in progress
+        keep = min(self._start, i) if self._opened and not self.closed else i
+        del buf[:keep]
+        self._pos = i - keep
+        self._start = max(0, self._start - keep)
+        return elements
+
+    def _emit(self, elements: List[bytes], end: int):
+        element = bytes(self._buf[self._start:end]).strip()
+        if element:
+            elements.append(element)
+
+    def close(self):
+        if not self.closed:
+            raise ValueError('truncated JSON array')
+
+
+async def iter_json_array(chunks: AsyncIterable[bytes]) -> AsyncIterator[bytes]:
+    """Raw bytes of each element of a streamed JSON array, as soon as the element is complete"""
+    splitter = JSONArraySplitter()
+    async for chunk in chunks:
+        for element in splitter.feed(chunk):
+            yield element
+        if splitter.closed:
+            break
+    splitter.close()
+
+
+Field = Union[str, Callable[[Dict[str, Any]], Any]]
+
+
+class VendorAdapter:
+    """How to poll one monitoring vendor.
+
+    `fetch(poller, source_id)` returns the source's alerts, or None when
+    the source cannot be polled.
+    """
+
+    name: str
+
+    async def fetch(self, poller, source_id: int) -> Optional[List[Dict]]:
+        raise NotImplementedError
+
+
+class FieldMappingAdapter(VendorAdapter):
+    """A vendor whose endpoint returns a JSON array of alert objects.
+
+    `fields` maps each queue field (external_id, external_asset_id,
+    alert_type, severity, message) to the vendor's key, or to a function
+    of the parsed alert. The response is split as it streams in, each
+    element is parsed once to read those fields, and its original bytes
+    become `raw_data`.
+    """
+
+    def __init__(self, name: str, path: str, fields: Dict[str, Field]):
+        self.name = name
+        self.path = path
+        self.fields = fields
+
+    def map_alert(self, raw: bytes) -> Dict:
+        item = loads(raw)
+        alert = {
+            field: source(item) if callable(source) else item[source]
+            for field, source in self.fields.items()
+        }
+        alert['raw_data'] = raw
+        return alert
+
+    async def fetch(self, poller, source_id: int) -> List[Dict]:
+        return [self.map_alert(raw) async for raw in poller.stream_json_array(source_id, self.path)]
+
+
+class CallableAdapter(VendorAdapter):
+    """A vendor polled by a coroutine of its own, e.g. a device status sweep"""
+
+    def __init__(self, name: str, fetch: Callable[[Any, int], Awaitable[Optional[List[Dict]]]]):
+        self.name = name
+        self._fetch = fetch
+
+    async def fetch(self, poller, source_id: int) -> Optional[List[Dict]]:
+        return await self._fetch(poller, source_id)
+
+
+ADAPTERS: Dict[str, VendorAdapter] = {}
+
+
+def register_adapter(adapter: VendorAdapter) -> VendorAdapter:
+    """Register `adapter` for MonitorSources rows whose name is `adapter.name`"""
+    ADAPTERS[adapter.name] = adapter
+    return adapter
+
+
+def get_adapter(name: str) -> Optional[VendorAdapter]:
+    return ADAPTERS.get(name)
+
+
+def raw_data_text(raw: Union[bytes, str]) -> str:
+    """raw_data as text for the database; vendor bytes are decoded, not re-serialised"""
+    return raw.decode('utf-8') if isinstance(raw, (bytes, bytearray)) else raw
+
+
+register_adapter(FieldMappingAdapter('Insight360', '/alerts', {
+    'external_id': 'id',
+    'external_asset_id': 'deviceId',
+    'alert_type': 'type',
+    'severity': 'severity',
+    'message': 'message',
+}))
+
+register_adapter(FieldMappingAdapter('FranklinMonitors', '/alerts/active', {
+    'external_id': 'alertId',
+    'external_asset_id': 'assetId',
+    'alert_type': 'alertType',
+    'severity': 'severity',
+    'message': 'description',
+}))
+
+register_adapter(FieldMappingAdapter('TempTicks', '/temperatures/alerts', {
+    'external_id': 'id',
+    'external_asset_id': 'sensorId',
+    'alert_type': lambda a: 'TemperatureAlert',
+    'severity': lambda a: 'High' if a['level'] > 1 else 'Medium',
+    'message': lambda a: f"Temperature {a['temp']}°F exceeds threshold",
+}))
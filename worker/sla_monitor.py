@@ -1,73 +1,321 @@
 import asyncio
-from datetime import datetime, timedelta
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
 import pyodbc
 import structlog
 
 log = structlog.get_logger()
 
+CHANGE_POLL_SECONDS = 2
+# A deadline that is still pending after its escalation (clock skew against the
+# server) is retried this much later instead of being fired in a tight loop
+RETRY_DELAY = timedelta(seconds=1)
+FAILURE_RETRY_DELAY = timedelta(seconds=30)
+
+POSITIONS_SQL = "SELECT SYSUTCDATETIME(), CAST(MIN_ACTIVE_ROWVERSION() AS BINARY(8))"
+
+PENDING_SQL = """
+    SELECT s.id, s.ticket_id, s.target_at
+    FROM app.TicketSLAs s
+    JOIN app.Tickets t ON t.ticket_id = s.ticket_id
+    WHERE s.breached = 0
+    AND t.status NOT IN ('Closed', 'Resolved')
+"""
+
+TICKET_PENDING_SQL = PENDING_SQL + """
+    AND s.ticket_id IN (SELECT value FROM OPENJSON(?) WITH (value INT '$'))
+"""
+
+TICKET_EVENTS_SQL = """
+    SELECT DISTINCT aggregate_id
+    FROM app.Outbox
+    WHERE aggregate = 'ticket'
+    AND rowversion >= ? AND rowversion < ?
+"""
+
+CHANGED_SLAS_SQL = """
+    SELECT DISTINCT ticket_id
+    FROM app.TicketSLAs
+    WHERE rowversion >= ? AND rowversion < ?
+"""
+
+Deadline = Tuple[int, int, datetime]  # (sla_id, ticket_id, target_at)
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class DeadlineQueue:
+    """Pending SLA deadlines ordered by target_at.
+
+    A min-heap with lazy deletion: rescheduling or dropping an SLA only
+    updates `_pending`, and heap entries that no longer match it are
+    skipped when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[datetime, int, int]] = []
+        self._pending: Dict[int, Tuple[datetime, int]] = {}
+        self._by_ticket: Dict[int, Set[int]] = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def set(self, sla_id: int, ticket_id: int, target_at: datetime):
+        if self._pending.get(sla_id) == (target_at, ticket_id):
+            return
+        self.discard(sla_id)
+        self._pending[sla_id] = (target_at, ticket_id)
+        self._by_ticket.setdefault(ticket_id, set()).add(sla_id)
+        heapq.heappush(self._heap, (target_at, sla_id, ticket_id))
+
+    def discard(self, sla_id: int):
+        entry = self._pending.pop(sla_id, None)
+        if entry is None:
+            return
+        ticket_slas = self._by_ticket[entry[1]]
+        ticket_slas.discard(sla_id)
+        if not ticket_slas:
+            del self._by_ticket[entry[1]]
+
+    def replace_tickets(self, ticket_ids: Iterable[int], deadlines: Iterable[Deadline]):
+        """Make `deadlines` the only pending SLAs of `ticket_ids`"""
+        for ticket_id in ticket_ids:
+            for sla_id in list(self._by_ticket.get(ticket_id, ())):
+                self.discard(sla_id)
+        for sla_id, ticket_id, target_at in deadlines:
+            self.set(sla_id, ticket_id, target_at)
+
+    def _prune(self):
+        while self._heap:
+            target_at, sla_id, ticket_id = self._heap[0]
+            if self._pending.get(sla_id) == (target_at, ticket_id):
+                return
+            heapq.heappop(self._heap)
+
+    def next_deadline(self) -> Optional[datetime]:
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> List[Deadline]:
+        """Remove and return every SLA due at `now`, earliest first"""
+        due = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            target_at, sla_id, ticket_id = heapq.heappop(self._heap)
+            self.discard(sla_id)
+            due.append((sla_id, ticket_id, target_at))
+
+
+def read_positions(cursor) -> Tuple[datetime, bytes]:
+    """Server clock and MIN_ACTIVE_ROWVERSION()"""
+    cursor.execute(POSITIONS_SQL)
+    server_now, position = cursor.fetchone()
+    return server_now, bytes(position)
+
+
+def load_pending(cursor) -> List[Deadline]:
+    cursor.execute(PENDING_SQL)
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def load_ticket_pending(cursor, ticket_ids: List[int]) -> List[Deadline]:
+    cursor.execute(TICKET_PENDING_SQL, json_list(ticket_ids))
+    return [tuple(row) for row in cursor.fetchall()]
+
+
+def read_changes(cursor, after: bytes, before: bytes) -> Set[int]:
+    """Tickets touched by outbox events or TicketSLAs changes with rowversion in [after, before).
+
+    `before` is MIN_ACTIVE_ROWVERSION(), so rows of transactions still open
+    are read by a later call rather than skipped. The outbox is read without
+    claiming events, so the webhook consumer still delivers them; an event
+    is seen again when it is marked published, and reloading its ticket
+    twice is harmless. TicketSLAs rows are written by usp_AutoAssignTicket
+    without an outbox event, so they are followed directly.
+    """
+    touched = set()
+    cursor.execute(TICKET_EVENTS_SQL, after, before)
+    for aggregate_id, in cursor.fetchall():
+        try:
+            touched.add(int(aggregate_id))
+        except (TypeError, ValueError):
+            log.warning("Ignoring ticket event with bad aggregate_id", aggregate_id=aggregate_id)
+    cursor.execute(CHANGED_SLAS_SQL, after, before)
+    touched.update(ticket_id for ticket_id, in cursor.fetchall())
+    return touched
+
+
+def json_list(values: Iterable[int]) -> str:
+    return '[' + ','.join(str(int(v)) for v in values) + ']'
+
+
 class SLAMonitor:
-    def __init__(self, connection_string: str):
+    """Escalate tickets when their SLA deadline passes.
+
+    Pending deadlines are loaded once from app.TicketSLAs into a
+    `DeadlineQueue`, then kept current by following ticket outbox events and
+    TicketSLAs changes by rowversion and reloading the tickets they touch. The scheduler sleeps until the earliest deadline (or
+    until a change moves it) and runs app.usp_EscalateTicketSLA for just the
+    tickets that are due. All DB work runs on one worker thread with its own
+    connection, off the event loop.
+    """
+
+    def __init__(self, connection_string: str, poll_seconds: float = CHANGE_POLL_SECONDS):
         self.connection_string = connection_string
-        self.scheduler = AsyncIOScheduler()
+        self.poll_seconds = poll_seconds
+        self.queue = DeadlineQueue()
+        self._db = ThreadPoolExecutor(max_workers=1, thread_name_prefix='sla-db')
+        self._conn = None
+        self._wake = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._position = bytes(8)
+        # Server clock minus local clock, so deadlines fire on the server's time
+        self._clock_offset = timedelta(0)
 
     async def start(self):
-        """Start the SLA monitoring scheduler"""
-        self.scheduler.add_job(
-            self.check_slas,
-            IntervalTrigger(minutes=5),  # Check every 5 minutes
-            id='sla_monitor',
-            name='SLA Breach Monitor'
-        )
-        self.scheduler.start()
-        log.info("SLA monitor started")
-
-    async def check_slas(self):
-        """Check for SLA breaches and escalate tickets"""
+        """Load pending deadlines and start following changes and firing escalations"""
+        await self.seed()
+        self._tasks = [
+            asyncio.create_task(self.follow_changes()),
+            asyncio.create_task(self.fire_deadlines()),
+        ]
+        log.info("SLA monitor started", pending=len(self.queue))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._db.shutdown(wait=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def server_now(self) -> datetime:
+        return _utcnow() + self._clock_offset
+
+    def _sync_clock(self, server_now: datetime):
+        self._clock_offset = server_now - _utcnow()
+
+    async def _run_db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db, self._on_connection, fn, *args)
+
+    def _on_connection(self, fn, *args):
+        """Run fn(cursor, *args) on the monitor's connection, reconnecting after errors"""
+        if self._conn is None:
+            self._conn = pyodbc.connect(self.connection_string)
+        conn = self._conn
         try:
-            conn = pyodbc.connect(self.connection_string)
             cursor = conn.cursor()
-            
-            # Execute the stored proc
-            cursor.execute("EXEC app.usp_EscalateOverdueTickets")
-            conn.commit()
-            
-            # Log escalation counts
-            cursor.execute("""
-                SELECT COUNT(*) as escalated_count 
-                FROM app.TicketSLAs 
-                WHERE breached = 1 
-                AND computed_at > DATEADD(MINUTE, -5, SYSUTCDATETIME())
-            """)
-            row = cursor.fetchone()
-            if row and row[0] > 0:
-                log.info("Tickets escalated", count=row[0])
+            try:
+                result = fn(cursor, *args)
+                conn.commit()
+                return result
+            finally:
+                cursor.close()
+        except pyodbc.Error:
+            self._conn = None
+            conn.close()
+            raise
+
+    async def seed(self):
+        # Position first: anything written while the pending set loads is
+        # read again as a change, and replaying it is harmless
+        server_now, self._position = await self._run_db(read_positions)
+        self._sync_clock(server_now)
+        self.queue = DeadlineQueue()
+        for sla_id, ticket_id, target_at in await self._run_db(load_pending):
+            self.queue.set(sla_id, ticket_id, target_at)
+        self._wake.set()
+
+    async def poll_changes(self) -> int:
+        """Apply the changes since the last poll; returns how many tickets they touched"""
+        server_now, position = await self._run_db(read_positions)
+        self._sync_clock(server_now)
+        touched = await self._run_db(read_changes, self._position, position)
+        if touched:
+            ticket_ids = sorted(touched)
+            self.queue.replace_tickets(ticket_ids, await self._run_db(load_ticket_pending, ticket_ids))
+            self._wake.set()
+        self._position = position
+        return len(touched)
+
+    async def follow_changes(self):
+        while True:
+            try:
+                await self.poll_changes()
+            except Exception as e:
+                log.error("Failed to read SLA changes", error=str(e))
+            await asyncio.sleep(self.poll_seconds)
 
+    async def fire_deadlines(self):
+        while True:
+            deadline = self.queue.next_deadline()
+            timeout = None if deadline is None else (deadline - self.server_now()).total_seconds()
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            due = self.queue.pop_due(self.server_now())
+            if due:
+                await self.escalate(due)
+
+    async def escalate(self, due: List[Deadline]) -> int:
+        """Escalate the tickets of the due SLAs and reschedule whatever is still pending on them"""
+        ticket_ids = list(dict.fromkeys(ticket_id for _, ticket_id, _ in due))
+        try:
+            breached, pending = await self._run_db(self._escalate_tickets, ticket_ids)
         except Exception as e:
-            log.error("Failed to check SLAs", error=str(e))
-        finally:
-            cursor.close()
-            conn.close()
+            log.error("Failed to escalate tickets", tickets=len(ticket_ids), error=str(e))
+            retry_at = self.server_now() + FAILURE_RETRY_DELAY
+            for sla_id, ticket_id, _ in due:
+                self.queue.set(sla_id, ticket_id, retry_at)
+            return 0
+        retry_at = self.server_now() + RETRY_DELAY
+        self.queue.replace_tickets(ticket_ids, [
+            (sla_id, ticket_id, max(target_at, retry_at)) for sla_id, ticket_id, target_at in pending
+        ])
+        if breached:
+            log.info("Tickets escalated", count=breached, tickets=len(ticket_ids))
+        return breached
+
+    @staticmethod
+    def _escalate_tickets(cursor, ticket_ids: List[int]) -> Tuple[int, List[Deadline]]:
+        breached = 0
+        for ticket_id in ticket_ids:
+            cursor.execute("EXEC app.usp_EscalateTicketSLA @ticket_id=?", ticket_id)
+            breached += cursor.fetchval() or 0
+        return breached, load_ticket_pending(cursor, ticket_ids)
+
 
 if __name__ == "__main__":
     import os
     from dotenv import load_dotenv
-    
+
     load_dotenv()
-    
+
     CONNECTION_STRING = os.getenv("DB_CONNECTION_STRING")
     if not CONNECTION_STRING:
         raise ValueError("DB_CONNECTION_STRING environment variable not set")
 
     monitor = SLAMonitor(CONNECTION_STRING)
-    
+
     loop = asyncio.get_event_loop()
     loop.create_task(monitor.start())
-    
+
     try:
         loop.run_forever()
     except KeyboardInterrupt:
         pass
     finally:
+        loop.run_until_complete(monitor.stop())
         loop.close()
@@ -0,0 +1,128 @@
+import asyncio
+import base64
+import json
+import time
+from typing import Dict, Optional
+
+import aiohttp
+import structlog
+
+logger = structlog.get_logger()
+
+DEFAULT_TOKEN_TTL_S = 3600
+TOKEN_REFRESH_MARGIN_S = 60
+
+
+class AuthRejected(Exception):
+    """The vendor API answered 401; the source's credentials should be invalidated."""
+
+
+class _Credential:
+    __slots__ = ('fingerprint', 'auth_type', 'config', 'base_url', 'headers',
+                 'expires_at', 'refresh_at', 'refresh_task')
+
+    def __init__(self, fingerprint: tuple, auth_type: str, config: Dict, base_url: str):
+        self.fingerprint = fingerprint
+        self.auth_type = auth_type
+        self.config = config
+        self.base_url = base_url
+        self.headers: Optional[Dict[str, str]] = None
+        self.expires_at = 0.0
+        self.refresh_at = 0.0
+        self.refresh_task: Optional[asyncio.Task] = None
+
+
+def static_headers(auth_type: str, config: Dict) -> Optional[Dict[str, str]]:
+    """Headers for credentials that never expire; None for token-based auth types"""
+    if auth_type == 'ApiKey':
+        return {config['header_name']: config['key']}
+    if auth_type == 'Basic':
+        userpass = f"{config['username']}:{config['password']}".encode()
+        return {'Authorization': f"Basic {base64.b64encode(userpass).decode('ascii')}"}
+    if auth_type == 'OAuth2':
+        return None
+    return {}
+
+
+class CredentialCache:
+    """Per-source authentication headers.
+
+    ApiKey and Basic headers are built once per configuration. OAuth2
+    client-credentials tokens are kept until `expires_in`, refreshed in the
+    background once inside the refresh margin, and fetched by a single
+    request no matter how many pollers are waiting. `configure` re-parses
+    auth_config only when it changes; `invalidate` drops a token the vendor
+    has rejected.
+    """
+
+    def __init__(self, refresh_margin_s: float = TOKEN_REFRESH_MARGIN_S):
+        self.refresh_margin_s = refresh_margin_s
+        self._credentials: Dict[int, _Credential] = {}
+
+    def configure(self, source_id: int, base_url: str, auth_type: str, auth_config: Optional[str]):
+        fingerprint = (base_url, auth_type, auth_config)
+        current = self._credentials.get(source_id)
+        if current is not None and current.fingerprint == fingerprint:
+            return
+        if current is not None and current.refresh_task:
+            current.refresh_task.cancel()
+        config = json.loads(auth_config) if auth_config else {}
+        credential = _Credential(fingerprint, auth_type, config, base_url)
+        credential.headers = static_headers(auth_type, config)
+        self._credentials[source_id] = credential
+
+    def retain(self, source_ids):
+        """Forget sources that are no longer configured"""
+        for source_id in set(self._credentials) - set(source_ids):
+            credential = self._credentials.pop(source_id)
+            if credential.refresh_task:
+                credential.refresh_task.cancel()
+
+    def invalidate(self, source_id: int):
+        credential = self._credentials.get(source_id)
+        if credential is not None and credential.auth_type == 'OAuth2':
+            credential.headers = None
+            credential.expires_at = credential.refresh_at = 0.0
+
+    async def headers(self, session: aiohttp.ClientSession, source_id: int) -> Dict[str, str]:
+        credential = self._credentials[source_id]
+        if credential.auth_type != 'OAuth2':
+            return credential.headers
+        now = time.monotonic()
+        if credential.headers is not None and now < credential.expires_at:
+            if now >= credential.refresh_at and credential.refresh_task is None:
+                credential.refresh_task = asyncio.create_task(self._refresh(session, credential))
+            return credential.headers
+        if credential.refresh_task is None:
+            credential.refresh_task = asyncio.create_task(self._refresh(session, credential))
+        # shield: a cancelled waiter must not cancel the refresh others are awaiting
+        await asyncio.shield(credential.refresh_task)
+        if credential.headers is None:
+            raise RuntimeError(f'token request failed for source {source_id}')
+        return credential.headers
+
+    async def _refresh(self, session: aiohttp.ClientSession, credential: _Credential):
+        config = credential.config
+        try:
+            async with session.post(
+                f"{credential.base_url}{config['token_url']}",
+                data={
+                    'client_id': config['client_id'],
+                    'client_secret': config['client_secret'],
+                    'grant_type': 'client_credentials'
+                }
+            ) as resp:
+                resp.raise_for_status()
+                token_data = await resp.json()
+            ttl = float(token_data.get('expires_in') or DEFAULT_TOKEN_TTL_S)
+            now = time.monotonic()
+            credential.headers = {'Authorization': f"Bearer {token_data['access_token']}"}
+            credential.expires_at = now + ttl
+            credential.refresh_at = now + max(ttl - self.refresh_margin_s, ttl / 2)
+        except Exception as e:
+            # a still-valid token keeps being served until it expires
+            logger.warning("Token refresh failed", token_url=config.get('token_url'), error=str(e))
+            if time.monotonic() >= credential.expires_at:
+                credential.headers = None
+        finally:
+            credential.refresh_task = None
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+from fastapi.testclient import TestClient
+
+from app import ai_agent
+from app.ai_agent import LatestCache, read_ticket_detail
+from app.db import ConnectionPool, set_pool
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self._sets = []
+        self.description = None
+
+    def execute(self, sql, *params):
+        if 'usp_GetTicketDetail' in sql:
+            self._sets = list(self.db.detail.get(params[0], [(('ticket_id',), [])]))
+        elif sql.startswith('INSERT'):
+            self.db.recommendations.append(params)
+            self._sets = []
+        else:
+            self.db.latest_reads += 1
+            rows = [(p[2], p[3], datetime(2026, 3, 1)) for p in self.db.recommendations if p[0] == params[0]]
+            self._sets = [(('recommendations', 'confidence', 'created_at'), rows[-1:])]
+        self._load()
+
+    def _load(self):
+        if self._sets:
+            columns, self._rows = self._sets.pop(0)
+            self.description = [(c,) for c in columns]
+
+    def nextset(self):
+        if not self._sets:
+            return False
+        self._load()
+        return True
+
+    def fetchall(self):
+        return self._rows
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+
+class FakeDB:
+    def __init__(self, detail):
+        self.detail = detail
+        self.recommendations = []
+        self.latest_reads = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+DETAIL = {7: [
+    (('ticket_id', 'status'), [(7, 'Open')]),
+    (('asset_id', 'type', 'model'), [(1, 'HVAC', 'X1'), (2, 'Pump', 'P2')]),
+    (('user_id',), [(3,)]),
+    (('comment_id', 'body'), [(9, 'hot')]),
+    (('attachment_id', 'uri'), []),
+]}
+
+
+def test_read_ticket_detail_reads_every_result_set():
+    detail = read_ticket_detail(FakeCursor(FakeDB(DETAIL)), 7)
+    assert detail['ticket'] == {'ticket_id': 7, 'status': 'Open'}
+    assert [a['asset_id'] for a in detail['assets']] == [1, 2]
+    assert detail['watchers'] == [{'user_id': 3}]
+    assert detail['comments'] == [{'comment_id': 9, 'body': 'hot'}]
+    assert detail['attachments'] == []
+    assert read_ticket_detail(FakeCursor(FakeDB(DETAIL)), 8) is None
+
+
+def test_latest_cache_drops_reads_that_raced_an_invalidation():
+    cache = LatestCache(ttl_s=60, max_entries=2)
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.put(1, {'v': 'stale'}, generation)
+    assert cache.get(1) is None
+
+    cache.put(1, {'v': 1}, cache.generation)
+    cache.put(2, {'v': 2}, cache.generation)
+    cache.get(1)
+    cache.put(3, {'v': 3}, cache.generation)
+    assert cache.get(2) is None
+    assert cache.get(1) == {'v': 1}
+
+    expired = LatestCache(ttl_s=0, max_entries=2)
+    expired.put(1, {'v': 1}, expired.generation)
+    assert expired.get(1) is None
+
+
+def test_latest_is_cached_until_a_recommendation_is_written(monkeypatch):
+    db = FakeDB(DETAIL)
+    monkeypatch.setattr(ai_agent, '_latest_cache', LatestCache(ttl_s=60, max_entries=10))
+    previous = set_pool(ConnectionPool(lambda: db, size=2))
+    try:
+        client = TestClient(ai_agent.app)
+        assert client.get('/ai/ticket/7/latest').status_code == 404
+
+        generated = client.post('/ai/ticket/7/generate').json()
+        assert generated['recommendations'] == [{'asset_id': 1, 'type': 'HVAC'}, {'asset_id': 2, 'type': 'Pump'}]
+        assert client.post('/ai/ticket/8/generate').status_code == 404
+
+        first = client.get('/ai/ticket/7/latest').json()
+        assert client.get('/ai/ticket/7/latest').json() == first
+        assert db.latest_reads == 2
+
+        client.post('/ai/ticket/7/generate')
+        client.get('/ai/ticket/7/latest')
+        assert db.latest_reads == 3
+    finally:
+        set_pool(previous)
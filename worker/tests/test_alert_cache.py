@@ -0,0 +1,51 @@
+from alert_cache import AlertDedupCache, AlertThrottleCache, ThrottleRule, like_to_regex
+
+
+def test_like_to_regex_matches_sql_semantics():
+    assert like_to_regex('Temp%').match('temperatureAlert')
+    assert like_to_regex('Device_ffline').match('DeviceOffline')
+    assert not like_to_regex('Device%').match('NetworkDown')
+    assert like_to_regex('[NP]%Down').match('PowerDown')
+    assert like_to_regex('100[%]').match('100%')
+
+
+def test_throttle_uses_highest_matching_rule_then_source_default():
+    cache = AlertThrottleCache()
+    cache.load([
+        ThrottleRule(1, 'Temp%', 1, 2, True, 60),
+        ThrottleRule(1, None, 3, 2, True, 60),
+    ], {1: 100, 2: 1})
+    assert cache.limit_for(1, 'TemperatureAlert') == (6, 120.0)
+    assert cache.limit_for(2, 'Anything') == (5, 300.0)
+
+    for i in range(5):
+        assert not cache.should_throttle(2, 'Anything', now=1000.0 + i)
+        cache.record(2, 'Anything', 1000.0 + i)
+    assert cache.should_throttle(2, 'Anything', now=1010.0)
+    # the oldest entries slide out of the 5 minute window
+    assert not cache.should_throttle(2, 'Anything', now=1301.0)
+
+
+def test_dedup_cache_expires_signatures():
+    cache = AlertDedupCache()
+    assert not cache.seen(b'a', 60, now=0)
+    assert cache.seen(b'a', 60, now=30)
+    assert not cache.seen(b'a', 60, now=61)
+    assert len(cache) == 1
+
+
+def test_throttle_reserve_counts_in_the_check_and_release_gives_back():
+    cache = AlertThrottleCache()
+    cache.load([ThrottleRule(1, None, 1, 2, True, 60)], {})
+    slots = [cache.reserve(1, 'X', now=100.0 + i) for i in range(3)]
+    assert slots[:2] == [100.0, 101.0] and slots[2] is None
+    cache.release(1, 'X', slots[0])
+    assert cache.reserve(1, 'X', now=103.0) == 103.0
+
+
+def test_dedup_discard_forgets_a_signature():
+    cache = AlertDedupCache()
+    assert not cache.seen(b'a', 60, now=0)
+    cache.discard(b'a')
+    assert not cache.seen(b'a', 60, now=1)
+    assert cache.seen(b'a', 60, now=2)
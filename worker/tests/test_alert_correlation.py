@@ -0,0 +1,106 @@
+import json
+import random
+from datetime import datetime, timedelta
+
+from alert_correlation import AlertCorrelationEngine, SiteAlertIndex, compile_patterns, encode_correlations
+
+T0 = datetime(2026, 3, 1, 12, 0)
+
+PATTERNS = [
+    (1, 'NetworkDown', '["DeviceOffline", "ConnectionLost", "PingTimeout"]', 30),
+    (2, 'PowerFailure', '["BatteryLow", "UPSOnBattery"]', 45),
+    (3, 'Broken', 'not json', 10),
+]
+
+
+def _at(minutes):
+    return T0 + timedelta(minutes=minutes)
+
+
+def test_compile_patterns_groups_by_root_and_skips_bad_json():
+    compiled = compile_patterns(PATTERNS)
+    assert set(compiled) == {'NetworkDown', 'PowerFailure'}
+    assert compiled['NetworkDown'][0].related_alert_types == ('DeviceOffline', 'ConnectionLost', 'PingTimeout')
+    assert compiled['PowerFailure'][0].window == timedelta(minutes=45)
+
+
+def test_site_index_keeps_time_order_for_late_alerts():
+    index = SiteAlertIndex()
+    index.add('b', 'X', _at(5))
+    index.add('a', 'X', _at(1))
+    index.add('c', 'X', _at(9))
+    assert index.between('X', _at(1), _at(5)) == [(_at(1), 'a'), (_at(5), 'b')]
+    assert index.trim(_at(6)) == ['a', 'b']
+    assert len(index) == 1
+
+
+def test_root_matches_related_alerts_of_its_site_after_lateness():
+    engine = AlertCorrelationEngine(lateness_s=60)
+    engine.load_patterns(PATTERNS)
+    engine.add_many([
+        ('old', 1, 'DeviceOffline', _at(-31)),
+        ('d1', 1, 'DeviceOffline', _at(-20)),
+        ('other-site', 2, 'PingTimeout', _at(-5)),
+        ('root', 1, 'NetworkDown', _at(0)),
+    ])
+    assert not engine.add('root', 1, 'NetworkDown', _at(0))
+    assert engine.next_due() == _at(1)
+    assert engine.drain(_at(0.5)) == []
+
+    # arrives after the root but was raised before it
+    engine.add('p1', 1, 'PingTimeout', _at(-1))
+    # raised after the root: outside its window
+    engine.add('c1', 1, 'ConnectionLost', _at(0.2))
+    assert engine.drain(_at(1)) == [{
+        'pattern_id': 1,
+        'root_alert_id': 'root',
+        'correlated_alerts': ['d1', 'p1'],
+        'confidence_score': 85,
+        'correlation_data': {'site_id': 1, 'alert_types': {'DeviceOffline': 1, 'PingTimeout': 1}},
+    }]
+    assert engine.pending == 0
+
+
+def test_root_without_related_alerts_emits_nothing_and_old_alerts_are_trimmed():
+    engine = AlertCorrelationEngine(lateness_s=0)
+    engine.load_patterns(PATTERNS)
+    engine.add('root', 1, 'PowerFailure', _at(0))
+    assert engine.drain(_at(0)) == []
+    engine.add('b1', 1, 'BatteryLow', _at(10))
+    engine.drain(_at(100))
+    assert engine.sites == {}
+    # trimmed alerts may be indexed again
+    assert engine.add('b1', 1, 'BatteryLow', _at(100))
+
+
+def test_engine_matches_a_brute_force_scan_of_the_window():
+    rng = random.Random(7)
+    types = ['NetworkDown', 'DeviceOffline', 'ConnectionLost', 'PingTimeout', 'PowerFailure', 'BatteryLow', 'Noise']
+    alerts = [(f'a{i}', rng.randint(1, 3), rng.choice(types), _at(rng.uniform(0, 240))) for i in range(400)]
+    engine = AlertCorrelationEngine(lateness_s=120)
+    engine.load_patterns(PATTERNS)
+    rows = []
+    # arrival order is roughly time order, up to a minute late
+    arrival = sorted(alerts, key=lambda a: a[3] + timedelta(seconds=rng.uniform(0, 60)))
+    for i, alert in enumerate(arrival):
+        engine.add(*alert)
+        if i % 25 == 0:
+            rows.extend(engine.drain(alert[3]))
+    rows.extend(engine.drain(_at(1000)))
+
+    patterns = compile_patterns(PATTERNS)
+    expected = {}
+    for alert_id, site_id, alert_type, raised_at in alerts:
+        for p in patterns.get(alert_type, ()):
+            related = sorted((t, a) for a, s, ty, t in alerts
+                             if s == site_id and ty in p.related_alert_types and a != alert_id
+                             and raised_at - p.window <= t <= raised_at)
+            if related:
+                expected[(p.pattern_id, alert_id)] = [a for _, a in related]
+    assert {(r['pattern_id'], r['root_alert_id']): r['correlated_alerts'] for r in rows} == expected
+    assert len(rows) == len(expected)
+
+
+def test_encode_correlations_nests_json():
+    encoded = json.loads(encode_correlations([{'pattern_id': 1, 'correlated_alerts': ['a']}]))
+    assert encoded == [{'pattern_id': 1, 'correlated_alerts': ['a']}]
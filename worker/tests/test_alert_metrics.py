@@ -0,0 +1,78 @@
+import socket
+from datetime import datetime, timezone
+
+import aiohttp
+import pytest
+
+from alert_metrics import AlertMetrics, Histogram, start_metrics_server
+from model_registry import ModelRegistry
+
+AT = datetime(2026, 3, 1, 14, 30, tzinfo=timezone.utc)
+
+
+def test_hourly_deltas_drain_and_restore():
+    metrics = AlertMetrics()
+    metrics.count(1, 'received', 5, at=AT)
+    metrics.count(1, 'processed', 4, at=AT)
+    metrics.observe_processing(1, 120, at=AT)
+    metrics.observe_processing(1, 80, at=AT)
+
+    rows, _ = metrics.flush_payload()
+    assert rows == [{
+        'source_id': 1, 'processing_date': '2026-03-01', 'processing_hour': 14,
+        'received': 5, 'processed': 4, 'failed': 0, 'throttled': 0, 'duplicated': 0,
+        'processing_samples': 2, 'processing_ms_sum': 200, 'processing_ms_max': 120,
+    }]
+    assert metrics.flush_payload() == ([], [])
+
+    metrics.restore(rows, [])
+    metrics.count(1, 'received', 1, at=AT)
+    again, _ = metrics.flush_payload()
+    assert again[0]['received'] == 6 and again[0]['processing_samples'] == 2
+
+
+def test_health_rows_only_for_changed_sources():
+    metrics = AlertMetrics()
+    metrics.record_poll(1, True, 100, at=AT)
+    metrics.record_poll(2, False, at=AT)
+    _, health = metrics.flush_payload()
+    assert {h['source_id']: h['error_count'] for h in health} == {1: 0, 2: 1}
+    assert health[0]['last_successful_poll_at'] == '2026-03-01T14:30:00.000'
+
+    metrics.record_poll(2, False, at=AT)
+    _, health = metrics.flush_payload()
+    assert [(h['source_id'], h['error_count']) for h in health] == [(2, 2)]
+
+
+def test_prometheus_rendering():
+    hist = Histogram((10, 100))
+    for value in (5, 50, 500):
+        hist.observe(value)
+    assert hist.cumulative() == [('10', 1), ('100', 2), ('+Inf', 3)]
+
+    metrics = AlertMetrics()
+    metrics.count(3, 'duplicated', 2)
+    metrics.record_poll(3, True, 40)
+    text = metrics.render_prometheus()
+    assert 'opsgraph_alerts_total{source_id="3",outcome="duplicated"} 2' in text
+    assert 'opsgraph_poll_response_ms_bucket{source_id="3",le="50"} 1' in text
+    assert 'opsgraph_poll_response_ms_count{source_id="3"} 1' in text
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_appends_model_registry_metrics():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    metrics = AlertMetrics()
+    metrics.count(3, 'received', 1)
+    runner = await start_metrics_server(metrics, host='127.0.0.1', port=port,
+                                        extra=[ModelRegistry().render_prometheus])
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'http://127.0.0.1:{port}/metrics') as response:
+                text = await response.text()
+    finally:
+        await runner.cleanup()
+    assert 'opsgraph_alerts_total{source_id="3",outcome="received"} 1' in text
+    assert 'opsgraph_models_retired_total 0' in text
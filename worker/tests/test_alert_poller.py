@@ -0,0 +1,197 @@
+import asyncio
+import json
+
+import pytest
+
+import alert_poller
+from alert_poller import AlertPoller, AlertProcessor, MonitoringManager, encode_alert_batch
+
+
+def _alert(n, raw):
+    return {
+        'external_id': n,
+        'external_asset_id': 'dev-1',
+        'alert_type': 'TemperatureAlert',
+        'severity': 'High',
+        'message': 'Temperature 80°F exceeds threshold',
+        'raw_data': raw,
+    }
+
+
+def test_encode_alert_batch_splices_raw_data_and_hex_hash():
+    alerts = [_alert(1, json.dumps({'temp': 80, 'note': 'a "quoted" value'})), _alert(2, '{}')]
+    for alert in alerts:
+        alert['hash_signature'] = AlertProcessor.compute_alert_hash({**alert, 'source_id': 3})
+
+    decoded = json.loads(encode_alert_batch(alerts))
+
+    assert [a['external_id'] for a in decoded] == ['1', '2']
+    assert decoded[0]['raw_data'] == {'temp': 80, 'note': 'a "quoted" value'}
+    assert decoded[1]['raw_data'] == {}
+    assert bytes.fromhex(decoded[0]['hash_signature']) == alerts[0]['hash_signature']
+    assert decoded[0]['hash_signature'] == decoded[1]['hash_signature']
+
+
+def test_next_poll_delay_backs_off_per_consecutive_failure():
+    manager = MonitoringManager('unused')
+    assert manager.next_poll_delay(1, 30) == 30
+    for _ in range(2):
+        manager.record_poll_attempt(1, False)
+    assert manager.next_poll_delay(1, 30) == 120
+    for _ in range(8):
+        manager.record_poll_attempt(1, False)
+    assert manager.next_poll_delay(1, 30) == alert_poller.MAX_POLL_BACKOFF_S
+    manager.record_poll_attempt(1, True, 20)
+    assert manager.next_poll_delay(1, 30) == 30
+
+
+@pytest.mark.asyncio
+async def test_hung_source_times_out_without_blocking_others(monkeypatch):
+    monkeypatch.setattr(alert_poller, 'POLL_TIMEOUT_S', 0.05)
+    poller = AlertPoller('unused')
+    poller.monitor_sources = {
+        1: {'name': 'Hung', 'polling_interval': 60},
+        2: {'name': 'Fast', 'polling_interval': 60},
+    }
+
+    async def fetch_alerts(source_id):
+        if source_id == 1:
+            await asyncio.sleep(10)
+        return [{'alert_type': 'X'}] * 3
+
+    async def insert_alerts(source_id, alerts):
+        return 2, 1
+
+    poller.fetch_alerts = fetch_alerts
+    poller.insert_alerts = insert_alerts
+
+    results = await asyncio.gather(poller.poll_source(1), poller.poll_source(2))
+
+    assert results == [False, True]
+    metrics = poller.monitoring.metrics
+    assert metrics.error_count(1) == 1 and metrics.error_count(2) == 0
+    rows, health = metrics.flush_payload()
+    assert [(r['source_id'], r['received'], r['processed'], r['duplicated'], r['processing_samples']) for r in rows] == [(2, 3, 2, 1, 1)]
+    assert sorted(h['source_id'] for h in health) == [1, 2]
+
+
+class FailingConnect:
+    def __init__(self, fail: bool):
+        self.fail = fail
+
+    async def __aenter__(self):
+        await asyncio.sleep(0)
+        if self.fail:
+            raise RuntimeError('database unavailable')
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return self
+
+    async def execute(self, *args):
+        pass
+
+    async def commit(self):
+        pass
+
+    async def fetchone(self):
+        return (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_alerts_respect_the_throttle_and_failed_inserts_can_retry(monkeypatch):
+    from alert_cache import ThrottleRule
+    fail = {'value': False}
+    monkeypatch.setattr(alert_poller.aioodbc, 'connect', lambda *a, **k: FailingConnect(fail['value']))
+    processor = AlertProcessor('unused')
+    processor.throttle.load([ThrottleRule(1, None, 1, 3, True, 60)], {})
+
+    def alert(i):
+        return {'source_id': 1, 'external_id': str(i), 'external_asset_id': 'a', 'alert_type': 'X',
+                'severity': 'High', 'message': f'm{i}', 'raw_data': b'{}'}
+
+    # a storm processed concurrently is cut at the limit of 3
+    results = await asyncio.gather(*(processor.process_alert(alert(i)) for i in range(10)))
+    assert sum(results) == 3
+
+    processor = AlertProcessor('unused')
+    processor.throttle.load([ThrottleRule(1, None, 1, 1, True, 60)], {})
+    fail['value'] = True
+    with pytest.raises(RuntimeError):
+        await processor.process_alert(alert(0))
+    fail['value'] = False
+    # neither the signature nor the throttle slot of the failed insert is kept
+    assert await processor.process_alert(alert(0))
+
+
+@pytest.mark.asyncio
+async def test_first_poll_jitter_is_capped_for_long_intervals(monkeypatch):
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+        raise asyncio.CancelledError
+
+    monkeypatch.setattr(alert_poller.asyncio, 'sleep', sleep)
+    poller = AlertPoller('unused')
+    poller.monitor_sources = {1: {'name': 'Slow', 'polling_interval': 3600}}
+    with pytest.raises(asyncio.CancelledError):
+        await poller.run_source(1)
+    assert 0 <= delays[0] <= alert_poller.MAX_START_JITTER_S
+
+
+@pytest.mark.asyncio
+async def test_fleet_is_scored_every_interval_despite_failures():
+    poller = AlertPoller('unused')
+    calls = []
+
+    async def predict_fleet():
+        calls.append(len(calls))
+        if len(calls) == 1:
+            raise RuntimeError('db down')
+        return 5
+
+    poller.predictor.predict_fleet = predict_fleet
+    task = asyncio.create_task(poller.run_predictions(interval_s=0.01))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert len(calls) >= 2
+    await poller.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_throttled_alerts_never_reach_the_bulk_insert(monkeypatch):
+    from alert_cache import ThrottleRule
+    fail = {'value': False}
+    monkeypatch.setattr(alert_poller.aioodbc, 'connect', lambda *a, **k: FailingConnect(fail['value']))
+    batches = []
+
+    def encode(chunk):
+        batches.append([a['external_id'] for a in chunk])
+        return '[]'
+
+    monkeypatch.setattr(alert_poller, 'encode_alert_batch', encode)
+    poller = AlertPoller('unused')
+    poller.rules.throttle.load([ThrottleRule(1, None, 2, 1, True, 60)], {})
+
+    alerts = [_alert(i, '{}') for i in range(4)]
+    alerts[1]['message'] = alerts[0]['message'] = 'same'
+    assert await poller.insert_alerts(1, alerts) == (1, 1)
+    # alert 1 duplicates alert 0; alert 3 is past the limit of 2
+    assert batches == [[0, 2]]
+    assert poller.monitoring.metrics.flush_payload()[0][0]['throttled'] == 1
+
+    # a failed insert gives its slots and signatures back
+    poller = AlertPoller('unused')
+    poller.rules.throttle.load([ThrottleRule(1, None, 1, 1, True, 60)], {})
+    fail['value'] = True
+    with pytest.raises(RuntimeError):
+        await poller.insert_alerts(1, [_alert(9, '{}')])
+    fail['value'] = False
+    batches.clear()
+    await poller.insert_alerts(1, [_alert(9, '{}')])
+    assert batches == [[9]]
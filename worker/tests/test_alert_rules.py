@@ -0,0 +1,80 @@
+from datetime import datetime
+
+from alert_cache import LikePatternIndex, like_prefix, like_to_regex
+from alert_rules import AlertRuleRegistry
+
+T0 = datetime(2026, 3, 1, 12, 0)
+
+PROCESSING_RULES = [
+    (5, 1, 'Temp%', 'P2', 'High', 3, 7, 30),
+    (2, 1, 'TemperatureAlert', 'P1', 'Critical', 3, 7, 15),
+    (9, 1, None, 'P4', 'Low', None, None, None),
+    (4, 1, 'Device_ffline', 'P3', 'Medium', None, 8, None),
+    (6, 2, '%Down', 'P2', 'High', None, None, None),
+]
+
+
+def test_like_pattern_index_agrees_with_the_regex_translation():
+    patterns = [None, 'Temp%', 'temp%', 'TemperatureAlert', '%Down', 'Device_ffline', '[NP]%Down',
+                '%', 'T%A%', 'Power', '100[%]']
+    values = ['TemperatureAlert', 'temperaturealert', 'Temp', 'NetworkDown', 'PowerDown', 'DeviceOffline',
+              'Power', 'power', '100%', 'TA', '', 'Other']
+    index = LikePatternIndex()
+    for order, pattern in enumerate(patterns):
+        index.add(pattern, pattern, order)
+    for value in values:
+        expected = [p for p in patterns if p is None or like_to_regex(p).match(value)]
+        assert index.match(value) == expected, value
+
+
+def test_like_prefix_only_accepts_literal_prefixes():
+    assert like_prefix('Temp%') == 'Temp'
+    assert like_prefix('%') == ''
+    assert like_prefix('T_mp%') is None
+    assert like_prefix('Temp') is None
+
+
+def test_registry_resolves_asset_rule_and_throttle_limits():
+    registry = AlertRuleRegistry()
+    registry.load_processing_rules(PROCESSING_RULES, (5, T0))
+    registry.load_source_limits([(1, 10), (2, 4)], (2, T0))
+    registry.load_throttle_rules([(1, 'Temp%', 2, 5, True, 30), (1, None, 1, 10, False, 60)], (2, T0))
+    registry.load_mappings([(1, 'Sensor-9', 42)], (1, T0))
+
+    resolution = registry.resolve(1, 'sensor-9', 'TemperatureAlert')
+    assert resolution.asset_id == 42
+    assert resolution.rule.rule_id == 2
+    assert resolution.duplicate_window_mins == 30
+    assert (resolution.throttle_limit, resolution.throttle_window_s) == (20, 600.0)
+
+    assert registry.processing_rule(1, 'DeviceOffline').rule_id == 4
+    assert registry.processing_rule(1, 'Unknown').rule_id == 9
+    assert registry.processing_rule(2, 'NetworkDown').rule_id == 6
+    assert registry.processing_rule(2, 'Other') is None
+
+    other = registry.resolve(2, 'x', 'Other')
+    assert other.asset_id is None
+    assert other.duplicate_window_mins == 60
+    assert other.throttle_limit == 20
+
+
+def test_changed_tables_and_incremental_mapping_loads():
+    registry = AlertRuleRegistry()
+    probe = [('processing_rules', 5, T0), ('throttle_rules', 2, None), ('sources', 4, T0), ('mappings', 3, T0)]
+    assert set(registry.changed(probe)) == {'processing_rules', 'throttle_rules', 'sources', 'mappings'}
+
+    changed = registry.changed(probe)
+    assert registry.mapping_watermark(changed['mappings']) is None
+    registry.load_mappings([(1, 'a', 1), (1, 'b', 2), (2, 'a', 3)], changed['mappings'])
+    registry.load_processing_rules([], changed['processing_rules'])
+
+    later = datetime(2026, 3, 1, 12, 5)
+    changed = registry.changed([('processing_rules', 5, T0), ('mappings', 4, later)])
+    assert set(changed) == {'mappings'}
+    assert registry.mapping_watermark(changed['mappings']) == T0
+    registry.load_mappings([(1, 'B', 5), (1, 'c', 6)], changed['mappings'], incremental=True)
+    assert registry.asset_id(1, 'b') == 5
+    assert len(registry.mappings) == 4
+
+    # a deleted row forces a full reload
+    assert registry.mapping_watermark((3, later)) is None
@@ -0,0 +1,71 @@
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app.cofail import CofailEngine
+
+T0 = datetime(2026, 3, 1, 8, 0)
+
+
+def _pairs_like_refresh_proc(events, window_minutes):
+    """The self-join of kg.usp_RefreshCofailScores, evaluated in Python"""
+    counts, last = Counter(), {}
+    for id1, site1, asset1, t1 in events:
+        for id2, site2, asset2, t2 in events:
+            if site1 == site2 and id1 != id2 and t1 <= t2 <= t1 + timedelta(minutes=window_minutes):
+                key = (site1, asset1, asset2)
+                counts[key] += 1
+                last[key] = max(last.get(key, t2), t2)
+    return {key: (n, last[key]) for key, n in counts.items()}
+
+
+def _drained(engine):
+    return {(site, a, b): (n, at) for site, a, b, n, at in engine.drain()}
+
+
+def test_incremental_counts_match_full_self_join():
+    rng = random.Random(7)
+    events = [
+        (f'e{i:03}', rng.choice([1, 2]), rng.randint(1, 5), T0 + timedelta(minutes=rng.randint(0, 600)))
+        for i in range(200)
+    ]
+    events.sort(key=lambda e: e[3])
+    engine = CofailEngine(window_minutes=30, lateness_minutes=5)
+
+    totals = {}
+    for start in range(0, len(events), 37):
+        engine.add_many(events[start:start + 37])
+        for key, (n, at) in _drained(engine).items():
+            prev_n, prev_at = totals.get(key, (0, at))
+            totals[key] = (prev_n + n, max(prev_at, at))
+
+    assert totals == _pairs_like_refresh_proc(events, 30)
+
+
+def test_updated_and_late_events_are_not_counted():
+    engine = CofailEngine(window_minutes=30, lateness_minutes=5)
+    engine.add_many([('a', 1, 10, T0), ('b', 1, 20, T0 + timedelta(minutes=10))])
+    assert _drained(engine) == {(1, 10, 20): (1, T0 + timedelta(minutes=10))}
+
+    # same event again after an update, and one arriving 20 minutes late
+    engine.add_many([('a', 1, 10, T0), ('c', 1, 30, T0 - timedelta(minutes=10))])
+    assert _drained(engine) == {}
+    assert engine.late == 1
+
+    # slightly late events still pair in both directions
+    engine.add('d', 1, 40, T0 + timedelta(minutes=7))
+    assert _drained(engine) == {
+        (1, 10, 40): (1, T0 + timedelta(minutes=7)),
+        (1, 40, 20): (1, T0 + timedelta(minutes=10)),
+    }
+
+
+def test_seeded_events_pair_with_new_ones_without_being_counted():
+    engine = CofailEngine(window_minutes=30)
+    engine.add_many([('a', 1, 10, T0), ('b', 1, 20, T0 + timedelta(minutes=1))], count=False)
+    assert _drained(engine) == {}
+
+    engine.add('c', 1, 10, T0 + timedelta(minutes=45))
+    engine.add('d', 2, 10, T0 + timedelta(minutes=2))
+    # 'a' and 'b' are more than a window older than 'c'; site 2 has no partners
+    assert _drained(engine) == {}
@@ -0,0 +1,116 @@
+import pytest
+
+from app.db import ConnectionPool, PoolTimeout
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, *params):
+        if self.conn.broken:
+            raise RuntimeError('connection is broken')
+        self.conn.statements.append(sql)
+
+    def fetchone(self):
+        return (1,)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    def __init__(self):
+        self.statements = []
+        self.broken = False
+        self.closed = False
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.broken:
+            raise RuntimeError('connection is broken')
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    opened = []
+
+    def connect():
+        conn = FakeConn()
+        opened.append(conn)
+        return conn
+
+    def on_connect(conn):
+        conn.cursor().execute('SET CONTEXT')
+
+    return ConnectionPool(connect, on_connect=on_connect, **kwargs), opened
+
+
+def test_reuses_connection_and_applies_session_context_once():
+    pool, opened = make_pool(size=2)
+    for _ in range(3):
+        with pool.connection() as conn:
+            conn.cursor().execute('SELECT 42')
+    assert len(opened) == 1
+    assert opened[0].statements.count('SET CONTEXT') == 1
+
+
+def test_discards_connection_when_rollback_fails():
+    pool, opened = make_pool(size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.broken = True
+            conn.cursor().execute('SELECT 1')
+    assert opened[0].closed
+    with pool.connection():
+        pass
+    assert len(opened) == 2
+
+
+def test_rolls_back_uncommitted_work_on_checkin():
+    pool, opened = make_pool(size=1)
+    with pool.connection() as conn:
+        conn.cursor().execute('UPDATE app.Outbox SET published = 1')
+    assert opened[0].rollbacks == 1
+
+    with pool.connection() as conn:
+        conn.broken = True
+    assert opened[0].closed
+    with pool.connection() as conn:
+        assert conn is opened[1]
+
+
+def test_recycles_connections_past_max_age():
+    pool, opened = make_pool(size=1, max_age_s=0)
+    with pool.connection():
+        pass
+    with pool.connection():
+        pass
+    assert len(opened) == 2
+    assert opened[0].closed
+
+
+def test_health_check_replaces_dead_idle_connection():
+    pool, opened = make_pool(size=1, health_check_s=0)
+    with pool.connection() as conn:
+        pass
+    conn.broken = True
+    with pool.connection() as conn:
+        assert conn is opened[1]
+
+
+def test_bounded_size_times_out():
+    pool, _ = make_pool(size=1, acquire_timeout_s=0.01)
+    with pool.connection():
+        with pytest.raises(PoolTimeout):
+            with pool.connection():
+                pass
@@ -0,0 +1,70 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.delivery import DeliverySkipped, OutboxDelivery
+
+
+@pytest.mark.asyncio
+async def test_deliver_many_runs_concurrently_and_reports_per_event():
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        status = 500 if b'"bad"' in request.content else 200
+        return httpx.Response(status)
+
+    async with OutboxDelivery(concurrency=4, per_target=4, http2=False,
+                              transport=httpx.MockTransport(handler)) as delivery:
+        bodies = [{'event_type': 'bad' if i == 3 else 'ok'} for i in range(10)]
+        results = await delivery.deliver_many('http://sink.local/events', bodies)
+
+    assert peak == 4
+    assert [r is None for r in results] == [i != 3 for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_backpressure_pauses_only_the_throttled_target():
+    calls = []
+
+    async def handler(request):
+        calls.append(request.url.host)
+        if request.url.host == 'slow.local' and calls.count('slow.local') == 1:
+            return httpx.Response(429, headers={'Retry-After': '30'})
+        return httpx.Response(200)
+
+    async with OutboxDelivery(per_target=1, http2=False,
+                              transport=httpx.MockTransport(handler)) as delivery:
+        first = await delivery.deliver_many('http://slow.local/hook', [{}])
+        fast = await delivery.deliver_many('http://fast.local/hook', [{}, {}])
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(delivery.deliver('http://slow.local/hook', {}), 0.05)
+
+    assert isinstance(first[0], httpx.HTTPStatusError)
+    assert fast == [None, None]
+
+
+@pytest.mark.asyncio
+async def test_deliver_ordered_keeps_key_order_and_skips_after_failure():
+    seen = []
+
+    async def handler(request):
+        body = request.content.decode()
+        seen.append(body)
+        return httpx.Response(500 if body == 'a2' else 200)
+
+    items = [('a', b'a1'), ('b', b'b1'), ('a', b'a2'), ('b', b'b2'), ('a', b'a3')]
+    async with OutboxDelivery(http2=False, transport=httpx.MockTransport(handler)) as delivery:
+        results = await delivery.deliver_ordered('http://sink.local/events', items)
+
+    assert [b for b in seen if b.startswith('a')] == ['a1', 'a2']
+    assert [b for b in seen if b.startswith('b')] == ['b1', 'b2']
+    assert results[0] is None and results[1] is None and results[3] is None
+    assert isinstance(results[2], httpx.HTTPStatusError)
+    assert isinstance(results[4], DeliverySkipped)
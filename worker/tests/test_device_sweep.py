@@ -0,0 +1,71 @@
+import aiohttp
+import pytest
+from aiohttp import web
+
+from device_sweep import DeviceStatusSweep
+
+
+class FakeTeamViewer:
+    def __init__(self, bulk: bool):
+        self.bulk = bulk
+        self.online = {'a': True, 'b': False, 'c': True}
+        self.requests = []
+
+    def _respond(self, request, body):
+        etag = f'"{hash(repr(body))}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        return web.json_response(body, headers={'ETag': etag})
+
+    async def list_devices(self, request):
+        self.requests.append('/devices')
+        if not self.bulk:
+            return web.Response(status=404)
+        devices = [{'device_id': d, 'online': o} for d, o in self.online.items()]
+        return self._respond(request, {'devices': devices})
+
+    async def get_device(self, request):
+        device_id = request.match_info['device_id']
+        self.requests.append(f'/devices/{device_id}')
+        return self._respond(request, {'device_id': device_id, 'online': self.online[device_id]})
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/devices', self.list_devices)
+        app.router.add_get('/devices/{device_id}', self.get_device)
+        return app
+
+
+async def _serve(api):
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    return runner, f'http://127.0.0.1:{runner.addresses[0][1]}'
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('bulk', [True, False])
+async def test_sweep_reports_each_outage_once(bulk):
+    api = FakeTeamViewer(bulk)
+    runner, url = await _serve(api)
+    try:
+        async with aiohttp.ClientSession() as session:
+            sweep = DeviceStatusSweep(session, url, concurrency=2)
+
+            first = sweep.offline_transitions(await sweep.sweep(['a', 'b', 'c'], {}))
+            assert [d for d, _, _ in first] == ['b']
+
+            assert sweep.offline_transitions(await sweep.sweep(['a', 'b', 'c'], {})) == []
+
+            api.online.update(a=False, b=True)
+            third = sweep.offline_transitions(await sweep.sweep(['a', 'b', 'c'], {}))
+            assert [d for d, _, _ in third] == ['a']
+    finally:
+        await runner.cleanup()
+
+    if bulk:
+        assert api.requests == ['/devices'] * 3
+    else:
+        assert sweep.bulk_supported is False
+        assert api.requests.count('/devices') == 1
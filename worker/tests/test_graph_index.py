@@ -0,0 +1,91 @@
+import json
+
+import numpy as np
+
+from app.graph_index import CSR, GraphIndex, GraphSnapshot
+
+
+def _pairs(*pairs):
+    arr = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    return arr[:, 0], arr[:, 1]
+
+
+def _index():
+    # site 1: zones 10-11-12 in a line, assets 100/101 in zone 10, 102 in zone 12; ticket 7 on asset 100
+    adjacency = _pairs((10, 11), (12, 11))
+    snapshot = GraphSnapshot(
+        nodes={'site': [1], 'zone': [10, 11, 12], 'asset': [100, 101, 102], 'ticket': [7]},
+        edges={
+            ('site', 'zone'): _pairs((1, 10), (1, 11), (1, 12)),
+            ('site', 'asset'): _pairs((1, 100), (1, 101), (1, 102)),
+            ('asset', 'zone'): _pairs((100, 10), (101, 10), (102, 12)),
+            ('zone', 'zone'): adjacency,
+            ('ticket', 'asset'): _pairs((7, 100)),
+        },
+        zone_adjacency=adjacency,
+        cofail=np.array([
+            (1, 100, 101, 4, 0.5),
+            (1, 102, 100, 9, 2.0),
+            (1, 101, 102, 3, 9.0),   # touches neither of ticket 7's assets
+            (1, 100, 102, 1, np.nan),
+        ]),
+        outbox_position=(50).to_bytes(8, 'big'),
+        ticket_events={7: 50},
+    )
+    return GraphIndex(snapshot)
+
+
+def _described(index, found):
+    return {index.describe(n) + (d,) for n, d in found}
+
+
+def test_csr_gather_concatenates_rows():
+    csr = CSR.from_edges(4, np.array([2, 0, 2, 1]), np.array([5, 6, 7, 8]))
+    assert csr.row(2).tolist() == [5, 7]
+    assert csr.gather(np.array([2, 3, 0])).tolist() == [5, 7, 6]
+    assert csr.gather(np.array([3, 9])).tolist() == []
+
+
+def test_k_hop_and_zone_adjacency():
+    index = _index()
+    asset = index.node('asset', 100)
+    assert _described(index, index.k_hop(asset, 1)) == {('site', 1, 1), ('zone', 10, 1), ('ticket', 7, 1)}
+    two = _described(index, index.k_hop(asset, 2))
+    assert ('asset', 101, 2) in two and ('zone', 11, 2) in two
+    assert len(index.k_hop(asset, 3, limit=4)) == 4
+
+    zone = index.node('zone', 12)
+    assert _described(index, index.k_hop(zone, 2, zones_only=True)) == {('zone', 11, 1), ('zone', 10, 2)}
+
+
+def test_root_cause_candidates_rank_rows_touching_ticket_assets():
+    index = _index()
+    found = index.root_cause_candidates(7, top=10)
+    assert [(r['candidate_asset_id'], r['related_asset_id']) for r in found] == [(102, 100), (100, 101), (100, 102)]
+    assert found[0]['co_count'] == 9 and found[-1]['score'] is None
+    assert [r['score'] for r in index.root_cause_candidates(7, top=1)] == [2.0]
+    assert index.root_cause_candidates(999) == []
+
+
+def test_outbox_ticket_events_update_the_graph():
+    index = _index()
+    index.apply_event(51, 'ticket.created', '8', json.dumps({'asset_ids': [101]}))
+    index.apply_event(52, 'ticket.upserted', '7', json.dumps({'asset_ids': [102]}))
+    index.apply_event(53, 'event.created', 'x', '{}')
+    # replayed from before the snapshot, and read again after a consumer updated its row
+    index.apply_event(40, 'ticket.upserted', '7', json.dumps({'asset_ids': [101]}))
+    index.apply_event(51, 'ticket.upserted', '8', json.dumps({'asset_ids': [100]}))
+
+    index.advance((60).to_bytes(8, 'big'))
+    index.advance((55).to_bytes(8, 'big'))
+    assert index.outbox_position == (60).to_bytes(8, 'big')
+
+    ticket8 = index.node('ticket', 8)
+    assert _described(index, index.k_hop(ticket8, 1)) == {('asset', 101, 1)}
+    asset100 = index.node('asset', 100)
+    assert ('ticket', 7, 1) not in _described(index, index.k_hop(asset100, 1))
+    assert ('ticket', 7, 1) in _described(index, index.k_hop(index.node('asset', 102), 1))
+
+    # ticket 7 now only touches asset 102
+    assert [(r['candidate_asset_id'], r['related_asset_id']) for r in index.root_cause_candidates(7)] == [
+        (101, 102), (102, 100), (100, 102)]
@@ -0,0 +1,156 @@
+import json
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from maintenance_predictor import (
+    EVENT_COLUMNS, EventWindow, MaintenancePredictor, dirty_impact_sites, encode_predictions, evaluate_rule,
+)
+
+NOW = datetime(2026, 3, 1, 12, 0)
+
+
+class FakeCursor:
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.watermarks = []
+        self._rows = []
+
+    def execute(self, sql, *params):
+        if 'MIN_ACTIVE_ROWVERSION' in sql:
+            self._rows = [(len(self.watermarks) + 1).to_bytes(8, 'big')]
+        else:
+            self.watermarks.append(params[2])
+            self._rows = self.batches.pop(0)
+        return self
+
+    def fetchval(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+def _event(event_id, asset_id, level, hours_ago, code='TEMP_HIGH'):
+    return (event_id, asset_id, code, level, NOW - timedelta(hours=hours_ago))
+
+
+def test_refresh_reads_incrementally_and_replaces_updated_events():
+    cursor = FakeCursor([
+        [_event('a', 1, 'Warning', 1), _event('b', 1, 'Error', 30)],
+        [_event('a', 1, 'Critical', 1), _event('c', 2, 'Warning', 2)],
+    ])
+    window = EventWindow('HVAC', horizon_hours=24)
+
+    assert window.refresh(cursor, NOW) == 2
+    # 'b' is older than the horizon
+    assert list(window.events['event_id']) == ['a']
+
+    assert window.refresh(cursor, NOW) == 2
+    assert cursor.watermarks == [bytes(8), (1).to_bytes(8, 'big')]
+    counts = window.asset_counts(NOW - timedelta(hours=24))
+    assert counts.loc[1].tolist() == [1, 0]
+    assert counts.loc[2].tolist() == [0, 1]
+
+
+def test_evaluate_rule_matches_per_asset_scoring():
+    window = EventWindow('HVAC', horizon_hours=48)
+    rows = [_event('e1', 1, 'Error', 1), _event('e2', 1, 'Warning', 2, 'FAN'), _event('e3', 1, 'Error', 3)]
+    rows += [_event(f'w{i}', 2, 'Warning', 1) for i in range(3)]
+    rows += [_event('old', 3, 'Critical', 40), _event('x', 3, 'Info', 1)]
+    window.append(pd.DataFrame.from_records(rows, columns=EVENT_COLUMNS))
+
+    results = dict(evaluate_rule(window, prediction_window_hours=12, confidence_threshold=15, now=NOW))
+
+    assert sorted(results) == [1, 2]
+    first = results[1]
+    assert first['confidence_score'] == 45
+    assert first['predicted_failure_at'] == NOW + timedelta(hours=12)
+    assert first['factors']['error_count'] == 2 and first['factors']['warning_count'] == 1
+    assert sorted((p['code'], p['level'], p['count']) for p in first['factors']['event_patterns']) == [
+        ('FAN', 'Warning', 1), ('TEMP_HIGH', 'Error', 2)]
+    assert results[2]['confidence_score'] == 15
+
+    assert evaluate_rule(window, prediction_window_hours=12, confidence_threshold=50, now=NOW) == []
+
+
+def test_encode_predictions_flags_high_confidence_for_tickets():
+    rule = SimpleNamespace(rule_id=7)
+    factors = {'error_count': 5, 'warning_count': 0, 'event_patterns': []}
+    encoded = json.loads(encode_predictions([
+        (1, rule, {'predicted_failure_at': NOW, 'confidence_score': 100, 'factors': factors}),
+        (2, rule, {'predicted_failure_at': NOW, 'confidence_score': 45, 'factors': factors}),
+    ]))
+    assert [(p['asset_id'], p['rule_id'], p['create_ticket']) for p in encoded] == [(1, 7, True), (2, 7, False)]
+    assert encoded[0]['predicted_failure_at'] == '2026-03-01T12:00:00.000'
+    assert encoded[0]['contributing_factors'] == factors
+
+
+class ImpactCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.params = None
+        self._rows = []
+
+    def execute(self, sql, *params):
+        if 'MIN_ACTIVE_ROWVERSION' in sql:
+            self._rows = [b'\x00' * 7 + b'\x09']
+        else:
+            self.params = params
+            self._rows = self.rows
+        return self
+
+    def fetchval(self):
+        return self._rows[0]
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_dirty_impact_sites_groups_changed_assets_by_site():
+    watermark = b'\x00' * 7 + b'\x02'
+    cursor = ImpactCursor([(1, 10), (2, 20), (1, 11)])
+    high, sites = dirty_impact_sites(cursor, watermark)
+    assert high == b'\x00' * 7 + b'\x09'
+    assert sites == {1: [10, 11], 2: [20]}
+    assert cursor.params == (watermark, high, watermark, high)
+
+    _, sites = dirty_impact_sites(ImpactCursor([(1,), (2,)]), None)
+    assert sites == {1: None, 2: None}
+
+
+@pytest.mark.asyncio
+async def test_update_impact_scores_holds_watermark_until_every_site_succeeds():
+    predictor = MaintenancePredictor('unused')
+    calls = []
+    outcomes = {1: [3, 3], 2: [RuntimeError('deadlock'), 1]}
+
+    def on_connection(fn, *args):
+        if fn is dirty_impact_sites:
+            calls.append(('dirty', args[0]))
+            return b'hi', {1: None, 2: [20]}
+        site_id, asset_ids = args
+        calls.append(('site', site_id, asset_ids))
+        result = outcomes[site_id].pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    predictor._on_impact_connection = on_connection
+
+    await predictor.update_impact_scores()
+    assert predictor._impact_watermark is None and predictor._impact_full_sweep_at is None
+
+    await predictor.update_impact_scores()
+    assert predictor._impact_watermark == b'hi'
+    assert predictor._impact_full_sweep_at is not None
+
+    outcomes[1].append(0)
+    outcomes[2].append(0)
+    calls.clear()
+    await predictor.update_impact_scores()
+    # after a completed full sweep only changes since the watermark are read
+    assert calls[0] == ('dirty', b'hi')
+    predictor._impact_pool.shutdown()
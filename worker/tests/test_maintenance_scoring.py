@@ -0,0 +1,88 @@
+import json
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+
+from maintenance_scoring import (
+    FEATURE_NAMES,
+    encode_model_predictions,
+    explain,
+    feature_matrix,
+    local_importance,
+    prepare_features,
+    score,
+    score_deployment,
+)
+from model_registry import Deployment, artifact_checksum
+
+
+def _training_data(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    features = rng.poisson(3, size=(n, len(FEATURE_NAMES))).astype(float)
+    labels = (features[:, 0] + 2 * features[:, 1] > 9).astype(int)
+    return features, labels
+
+
+def test_batch_scores_match_row_by_row_prediction():
+    features, labels = _training_data()
+    model = RandomForestClassifier(n_estimators=20, random_state=0).fit(features, labels)
+
+    hit, confidence, importance = score(model, features, 0.7)
+    expected = [i for i, row in enumerate(features) if model.predict_proba([row])[0][1] >= 0.7]
+    assert hit.tolist() == expected
+    assert np.allclose(confidence, model.predict_proba(features[hit])[:, 1])
+    assert importance.shape == (len(hit), len(FEATURE_NAMES))
+    assert np.allclose(importance.sum(axis=1), 1.0)
+
+    # models without feature_importances_ still score
+    linear = LogisticRegression(max_iter=500).fit(features, labels)
+    hit, confidence, importance = score(linear, features, 0.7)
+    assert len(hit) and importance is None
+
+
+def test_local_importance_weights_features_by_deviation():
+    importances = np.array([0.5, 0.3, 0.2])
+    features = np.array([[1.0, 1.0, 1.0], [1.0, 1.0, 1.0], [7.0, 1.0, 1.0]])
+    rows = local_importance(importances, features)
+    assert np.allclose(rows[2], [1.0, 0.0, 0.0])
+    # all-constant columns give every row the global importances
+    assert np.allclose(local_importance(importances, np.ones((2, 3))), importances)
+    assert local_importance(None, features) is None
+
+
+def test_feature_rows_and_dicts_become_matrices():
+    asset_ids, features = feature_matrix([(12, 1, 0, 2, 1, 5, 0, 300), (15, 0, 0, 0, 0, 168, 1, 10)])
+    assert asset_ids.tolist() == [12, 15]
+    assert features.shape == (2, len(FEATURE_NAMES))
+    assert feature_matrix([])[1].shape == (0, len(FEATURE_NAMES))
+    assert prepare_features({'warning_count': 4, 'age_days': None}).tolist() == [0, 0, 4, 0, 0, 0, 0]
+
+
+def test_scoring_in_a_process_pool_and_encoding(tmp_path):
+    features, labels = _training_data()
+    path = str(tmp_path / 'model.joblib')
+    joblib.dump(RandomForestClassifier(n_estimators=10, random_state=1).fit(features, labels), path)
+
+    deployment = Deployment(7, 'Chiller', path, artifact_checksum(path))
+    live = frozenset([deployment.key])
+
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        (hit, confidence, importance), load = pool.submit(score_deployment, deployment, features, 0.7, live).result()
+        assert load.load_seconds > 0 and load.artifact_bytes > 0
+        # the worker keeps the model for later calls
+        assert pool.submit(score_deployment, deployment, features, 0.7, live).result()[1] is None
+    assert len(hit)
+
+    asset_ids = np.arange(1000, 1000 + len(features))[hit]
+    payload = json.loads(encode_model_predictions(asset_ids, confidence, importance, datetime(2026, 3, 8)))
+    assert payload[0]['asset_id'] == int(asset_ids[0])
+    assert payload[0]['predicted_failure_at'] == '2026-03-08T00:00:00.000'
+    assert 70 <= payload[0]['confidence_score'] <= 100
+    assert set(payload[0]['feature_importance']) == set(FEATURE_NAMES)
+    assert payload[0]['prediction_explanation'] == explain(importance[:1])[0]
+    assert payload[0]['prediction_explanation'].startswith('Prediction based on: ')
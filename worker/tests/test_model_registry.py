@@ -0,0 +1,78 @@
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+
+import model_registry
+from model_registry import Deployment, ModelCache, ModelRegistry
+
+
+def _dump(path, seed):
+    rng = np.random.default_rng(seed)
+    features = rng.random((50, 3))
+    joblib.dump(LogisticRegression().fit(features, features[:, 0] > 0.5), path)
+    return str(path)
+
+
+def test_sync_swaps_deployments_by_checksum_and_retires_old_ones(tmp_path, monkeypatch):
+    chiller = _dump(tmp_path / 'chiller.joblib', 1)
+    pump = _dump(tmp_path / 'pump.joblib', 2)
+    hashed = []
+    real_checksum = model_registry.artifact_checksum
+    monkeypatch.setattr(model_registry, 'artifact_checksum', lambda p: hashed.append(p) or real_checksum(p))
+
+    registry = ModelRegistry()
+    deployed, retired = registry.sync([(1, 'Chiller', chiller), (2, 'Pump', pump)])
+    assert [d.model_id for d in deployed] == [1, 2] and retired == []
+    first = registry.get('Chiller')
+
+    # unchanged artifacts are not hashed again
+    assert registry.sync([(1, 'Chiller', chiller), (2, 'Pump', pump)]) == ([], [])
+    assert len(hashed) == 2
+
+    # a retrained artifact at the same path is a new deployment
+    _dump(tmp_path / 'chiller.joblib', 3)
+    os.utime(chiller, ns=(1, 1))
+    deployed, retired = registry.sync([(1, 'Chiller', chiller), (2, 'Pump', pump)])
+    assert deployed == [registry.get('Chiller')] and retired == [first]
+    assert registry.get('Chiller').checksum != first.checksum
+
+    # an unreadable artifact keeps the previous deployment; a dropped row retires it
+    current = registry.get('Chiller')
+    deployed, retired = registry.sync([(1, 'Chiller', str(tmp_path / 'missing.joblib'))])
+    assert deployed == [] and registry.get('Chiller') == current
+    assert [d.asset_type for d in retired] == ['Pump']
+    assert registry.live_keys() == frozenset([registry.get('Chiller').key])
+    assert registry.retired_total == 2
+
+
+def test_cache_loads_memory_mapped_and_evicts_retired_models(tmp_path):
+    path = _dump(tmp_path / 'm.joblib', 4)
+    old = Deployment(1, 'Chiller', path, 'aaa')
+    new = Deployment(1, 'Chiller', path, 'bbb')
+    cache = ModelCache()
+
+    model, load = cache.get(old)
+    assert isinstance(model.coef_, np.memmap)
+    assert load.artifact_bytes == os.path.getsize(path)
+    assert cache.get(old) == (model, None)
+
+    cache.get(new)
+    assert cache.retain(frozenset([new.key])) == 1
+    assert len(cache) == 1
+
+
+def test_registry_exposes_load_metrics(tmp_path):
+    path = _dump(tmp_path / 'm.joblib', 5)
+    registry = ModelRegistry()
+    registry.sync([(4, 'Pump', path)])
+    deployment = registry.get('Pump')
+    registry.record_load(deployment.key, model_registry.ModelLoad(0.25, 4096, 1000))
+    registry.record_load((4, 'stale'), model_registry.ModelLoad(9.0, 1, 1))
+
+    [stats] = registry.stats()
+    assert (stats['load_seconds'], stats['rss_bytes'], stats['artifact_bytes']) == (0.25, 4096, 1000)
+    text = registry.render_prometheus()
+    assert 'opsgraph_model_load_seconds{model_id="4",asset_type="Pump"} 0.25' in text
+    assert 'opsgraph_model_rss_bytes{model_id="4",asset_type="Pump"} 4096' in text
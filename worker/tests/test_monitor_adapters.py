@@ -0,0 +1,136 @@
+import json
+import random
+
+import pytest
+
+import monitor_adapters
+from alert_poller import AlertPoller, encode_alert_batch
+from monitor_adapters import JSONArraySplitter, get_adapter, iter_json_array
+from source_auth import AuthRejected
+
+
+def _split(data: bytes, rng: random.Random):
+    splitter = JSONArraySplitter()
+    out = []
+    pos = 0
+    while pos < len(data):
+        step = rng.randint(1, 9)
+        out.extend(splitter.feed(data[pos:pos + step]))
+        pos += step
+    splitter.close()
+    return out
+
+
+def test_splitter_returns_each_element_verbatim_across_chunk_boundaries():
+    rng = random.Random(3)
+    items = [
+        {'id': 1, 'msg': 'quote " and backslash \\ and ]}, [{'},
+        [1, [2, {'a': []}]],
+        'a string, with ] and \\"',
+        12.5, None, True, {}, [],
+        {'unicode': 'Température 80°F'},
+    ]
+    for ensure_ascii in (True, False):
+        data = (' \n' + json.dumps(items, ensure_ascii=ensure_ascii, indent=1)).encode()
+        for _ in range(20):
+            elements = _split(data, rng)
+            assert [json.loads(e) for e in elements] == items
+    assert _split(b'[]', rng) == []
+    assert _split(b'[ {"a": 1} ,\n2 ]', rng) == [b'{"a": 1}', b'2']
+
+
+def test_splitter_rejects_non_arrays_and_truncated_input():
+    with pytest.raises(ValueError):
+        JSONArraySplitter().feed(b' {"alerts": []}')
+    splitter = JSONArraySplitter()
+    splitter.feed(b'[{"a": 1}, {"b"')
+    with pytest.raises(ValueError):
+        splitter.close()
+
+
+async def _chunks(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+@pytest.mark.asyncio
+async def test_iter_json_array_yields_elements_as_they_complete():
+    data = b'[{"id": 1}, {"id": 2}, {"id": 3}]'
+    assert [e async for e in iter_json_array(_chunks(data, 4))] == [b'{"id": 1}', b'{"id": 2}', b'{"id": 3}']
+
+
+class FakeContent:
+    def __init__(self, data):
+        self.data = data
+
+    def iter_chunked(self, size):
+        return _chunks(self.data, 7)
+
+
+class FakeResponse:
+    def __init__(self, status, data):
+        self.status = status
+        self.content = FakeContent(data)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f'HTTP {self.status}')
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.urls = []
+
+    def get(self, url, headers=None):
+        self.urls.append(url)
+        return FakeResponse(*self.responses[url])
+
+
+def _poller(name, base, responses):
+    poller = AlertPoller('unused')
+    poller.session = FakeSession(responses)
+    poller.monitor_sources = {1: {'name': name, 'api_base_url': base, 'auth_type': 'ApiKey', 'polling_interval': 60}}
+
+    async def headers(source_id):
+        return {}
+    poller.get_auth_headers = headers
+    return poller
+
+
+@pytest.mark.asyncio
+async def test_adapters_map_fields_and_pass_raw_bytes_through():
+    raw = [
+        b'{"id": "t1", "sensorId": "s-9", "level": 2, "temp": 91.5, "extra": {"z": [1, 2]}}',
+        b'{"id": "t2", "sensorId": "s-3", "level": 1, "temp": 80}',
+    ]
+    poller = _poller('TempTicks', 'https://tt', {'https://tt/temperatures/alerts': (200, b'[' + b',\n'.join(raw) + b']')})
+    alerts = await poller.fetch_alerts(1)
+    assert [a['raw_data'] for a in alerts] == raw
+    assert alerts[0] == {
+        'external_id': 't1', 'external_asset_id': 's-9', 'alert_type': 'TemperatureAlert',
+        'severity': 'High', 'message': 'Temperature 91.5°F exceeds threshold', 'raw_data': raw[0],
+    }
+    assert alerts[1]['severity'] == 'Medium'
+
+    for alert in alerts:
+        alert['hash_signature'] = b'\x01' * 32
+    decoded = json.loads(encode_alert_batch(alerts))
+    assert decoded[0]['raw_data'] == json.loads(raw[0])
+
+
+@pytest.mark.asyncio
+async def test_rejected_credentials_and_unknown_sources():
+    poller = _poller('Insight360', 'https://i', {'https://i/alerts': (401, b'')})
+    with pytest.raises(AuthRejected):
+        await get_adapter('Insight360').fetch(poller, 1)
+
+    poller = _poller('SomethingElse', 'https://x', {})
+    assert await poller.fetch_alerts(1) is None
+    assert set(monitor_adapters.ADAPTERS) >= {'Insight360', 'FranklinMonitors', 'TempTicks', 'TeamViewer'}
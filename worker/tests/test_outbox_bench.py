@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+
+from bench.outbox_bench import percentile, run_benchmark
+
+
+def test_percentile_picks_nearest_rank():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_fake_backend_delivers_every_seeded_event():
+    result = await run_benchmark(events=300, db='fake', batch_size=50, timeout_s=30)
+    metrics = result['metrics']
+    assert metrics['http_requests_per_event'] == 1.0
+    # one dequeue per batch plus the final empty poll; nothing per event
+    assert metrics['db_round_trips_per_event'] < 0.1
+
+
+@pytest.mark.asyncio
+async def test_benchmark_restores_delivery_settings():
+    from app.settings import settings
+    before = settings.api_sse_post_url, settings.webhook_url
+    await run_benchmark(events=20, db='fake', batch_size=10, timeout_s=30)
+    assert (settings.api_sse_post_url, settings.webhook_url) == before
+
+
+class FlakyDelivery:
+    """Fails the first `failures` deliveries, then accepts everything"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.delivered = []
+
+    async def deliver_many(self, url, bodies):
+        results = []
+        for body in bodies:
+            if self.failures:
+                self.failures -= 1
+                results.append(RuntimeError('sink down'))
+            else:
+                self.delivered.append(body)
+                results.append(None)
+        return results
+
+
+@pytest.mark.asyncio
+async def test_failed_delivery_is_nacked_and_redelivered_after_backoff(monkeypatch):
+    from app import db as app_db
+    from app import outbox_worker
+    from app.settings import settings
+    from bench.fake_db import FakeOutboxDB
+
+    monkeypatch.setattr(settings, 'api_sse_post_url', None)
+    monkeypatch.setattr(settings, 'webhook_url', 'http://sink.invalid/events')
+    monkeypatch.setattr(settings, 'outbox_partitioned', False)
+    monkeypatch.setattr(outbox_worker, 'backoff', lambda attempt: 0.2 * attempt)
+    acks = []
+    write_acks = outbox_worker._write_acks
+    monkeypatch.setattr(outbox_worker, '_write_acks', lambda batch: (acks.extend(batch), write_acks(batch))[1])
+
+    fake = FakeOutboxDB()
+    fake.seed([{'n': 1}])
+    row = fake.rows[1]
+    previous = app_db.set_pool(app_db.ConnectionPool(fake.connect, size=1))
+    try:
+        delivery = FlakyDelivery(failures=1)
+        assert await outbox_worker.process_batch_once(10, delivery=delivery) == 1
+        assert acks == [(1, False, 200)]
+        assert row.try_count == 1 and not row.published
+
+        # held back by the dequeue until next_attempt_at
+        assert await outbox_worker.process_batch_once(10, delivery=delivery) == 0
+        await asyncio.sleep(0.25)
+        assert await outbox_worker.process_batch_once(10, delivery=delivery) == 1
+        assert acks[-1] == (1, True, None)
+        assert row.published and row.try_count == 1
+        assert len(delivery.delivered) == 1
+    finally:
+        app_db.set_pool(previous).close()
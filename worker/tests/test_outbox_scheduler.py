@@ -0,0 +1,55 @@
+import pytest
+
+from app.outbox_scheduler import AdaptiveBatchSizer, drain, drain_and_wait
+
+
+def test_sizer_grows_on_full_batches_and_shrinks_on_sparse_ones():
+    sizer = AdaptiveBatchSizer(min_size=10, max_size=40)
+    assert sizer.observe(10) is True
+    assert sizer.size == 20
+    sizer.observe(20)
+    sizer.observe(40)
+    assert sizer.size == 40
+    assert sizer.observe(15) is False
+    assert sizer.size == 40
+    sizer.observe(2)
+    assert sizer.size == 20
+
+
+def test_drain_runs_until_a_short_batch():
+    backlog = [35]
+    sizes = []
+
+    def run_batch(size):
+        sizes.append(size)
+        taken = min(size, backlog[0])
+        backlog[0] -= taken
+        return taken
+
+    assert drain(run_batch, AdaptiveBatchSizer(min_size=5, max_size=100)) == 35
+    assert sizes == [5, 10, 20, 40]
+
+
+class Stop(BaseException):
+    pass
+
+
+def test_drain_and_wait_long_polls_between_drains_and_survives_errors():
+    calls = []
+
+    def drain_once():
+        calls.append('drain')
+        if len(calls) == 1:
+            raise RuntimeError('db down')
+
+    def wait_for_work():
+        calls.append('wait')
+        if calls.count('wait') == 2:
+            raise RuntimeError('wakeup failed')
+        if calls.count('wait') == 3:
+            raise Stop()
+
+    with pytest.raises(Stop):
+        drain_and_wait(drain_once, wait_for_work, fallback_s=0)
+    # a failed drain skips the wait; a failed wait falls back to the next drain
+    assert calls == ['drain', 'drain', 'wait', 'drain', 'wait', 'drain', 'wait']
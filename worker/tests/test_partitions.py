@@ -0,0 +1,101 @@
+import math
+
+from app.db import ConnectionPool, set_pool
+from app.partitions import LeaseManager
+
+PARTITIONS = 64
+
+
+class LeaseTables:
+    """app.OutboxConsumers / app.OutboxConsumerLeases with usp_Outbox_RenewLeases over them"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.consumers = {}
+        self.leases = {p: (None, None) for p in range(PARTITIONS)}
+
+    def renew(self, owner_id, lease_seconds):
+        now, expires = self.now, self.now + lease_seconds
+        self.consumers[owner_id] = now
+        owned = [p for p, (owner, _) in self.leases.items() if owner == owner_id]
+        for p in owned:
+            self.leases[p] = (owner_id, expires)
+        live = max(1, sum(1 for at in self.consumers.values() if at > now - lease_seconds))
+        share = math.ceil(PARTITIONS / live)
+        if len(owned) > share:
+            for p in sorted(owned, reverse=True)[:len(owned) - share]:
+                self.leases[p] = (None, None)
+        elif len(owned) < share:
+            free = [p for p, (owner, until) in sorted(self.leases.items()) if owner is None or until <= now]
+            for p in free[:share - len(owned)]:
+                self.leases[p] = (owner_id, expires)
+        return [p for p, (owner, _) in sorted(self.leases.items()) if owner == owner_id]
+
+    def release_leases(self, owner_id):
+        for p, (owner, _) in self.leases.items():
+            if owner == owner_id:
+                self.leases[p] = (None, None)
+
+
+class Row:
+    def __init__(self, partition_id):
+        self.partition_id = partition_id
+
+
+class Cursor:
+    def __init__(self, tables):
+        self.tables = tables
+        self.rows = []
+
+    def execute(self, sql, *params):
+        if 'usp_Outbox_RenewLeases' in sql:
+            self.rows = [Row(p) for p in self.tables.renew(*params)]
+        elif 'UPDATE app.OutboxConsumerLeases' in sql:
+            self.tables.release_leases(*params)
+        elif 'DELETE FROM app.OutboxConsumers' in sql:
+            self.tables.consumers.pop(*params)
+
+    def fetchall(self):
+        return self.rows
+
+
+class Conn:
+    def __init__(self, tables):
+        self.tables = tables
+
+    def cursor(self):
+        return Cursor(self.tables)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def test_new_consumer_gets_half_the_partitions_within_one_renewal_cycle():
+    tables = LeaseTables()
+    previous = set_pool(ConnectionPool(lambda: Conn(tables), size=1))
+    try:
+        first, second = LeaseManager('a', lease_seconds=60), LeaseManager('b', lease_seconds=60)
+        assert len(first.renew()) == PARTITIONS
+
+        # b registers while a still holds everything
+        tables.now += 5
+        assert second.renew() == frozenset()
+
+        # one heartbeat interval later: a hands back its excess, b picks it up
+        tables.now += 20
+        assert len(first.renew()) == PARTITIONS // 2
+        assert len(second.renew()) == PARTITIONS // 2
+        assert not first.partitions & second.partitions
+
+        # b leaving frees its partitions and its registration at once
+        second.release()
+        tables.now += 20
+        assert len(first.renew()) == PARTITIONS
+    finally:
+        set_pool(previous)
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from app.site_shards import SiteShardRunner
+
+
+def _wait_idle(runner, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while any(s.running for s in runner.stats.values()):
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_failing_site_backs_off_without_holding_up_others():
+    calls = []
+
+    def task(site_id):
+        calls.append(site_id)
+        if site_id == 2:
+            raise RuntimeError('deadlock victim')
+        return site_id * 10
+
+    runner = SiteShardRunner('test', task, concurrency=2, base_backoff_s=60, sites=lambda: [1, 2, 3])
+    assert runner.run_once() == 3
+    _wait_idle(runner)
+    assert sorted(calls) == [1, 2, 3]
+    assert runner.stats[1].last_rows == 10 and runner.stats[1].last_duration_s is not None
+    assert runner.stats[2].consecutive_failures == 1 and 'deadlock' in runner.stats[2].last_error
+
+    # site 2 is backing off; the others run again
+    assert runner.run_once() == 2
+    _wait_idle(runner)
+    assert calls.count(2) == 1 and calls.count(1) == 2
+    assert runner.backoff(3) == 240
+    runner.close()
+
+
+def test_running_and_slow_sites_are_not_resubmitted():
+    release = threading.Event()
+    seen = []
+
+    def task(site_id):
+        seen.append(site_id)
+        if site_id == 1:
+            release.wait(1)
+        return 0
+
+    sites = [1, 2]
+    retained = []
+    runner = SiteShardRunner('test', task, slow_s=0.05, sites=lambda: sites, on_sites=retained.append)
+    runner.run_once()
+    time.sleep(0.1)
+    # site 1 is still running, site 2 finished quickly
+    assert runner.run_once() == 1
+    release.set()
+    _wait_idle(runner)
+    # site 1 took longer than slow_s, so it waits its own duration
+    assert runner.stats[1].next_run_at > time.monotonic()
+    assert runner.run_once() == 1
+
+    sites = [2]
+    _wait_idle(runner)
+    runner.run_once()
+    assert set(runner.stats) == {2}
+    assert retained[-1] == [2]
+    runner.close()
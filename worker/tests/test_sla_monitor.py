@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import sla_monitor
+from sla_monitor import DeadlineQueue, SLAMonitor, json_list, read_changes
+
+T0 = datetime(2026, 3, 1, 12, 0)
+
+
+def test_queue_orders_deadlines_and_skips_rescheduled_entries():
+    queue = DeadlineQueue()
+    queue.set(1, 10, T0 + timedelta(minutes=5))
+    queue.set(2, 11, T0 + timedelta(minutes=1))
+    queue.set(3, 10, T0 + timedelta(minutes=3))
+    assert queue.next_deadline() == T0 + timedelta(minutes=1)
+
+    queue.set(2, 11, T0 + timedelta(minutes=10))
+    queue.discard(3)
+    assert len(queue) == 2
+    assert queue.next_deadline() == T0 + timedelta(minutes=5)
+
+    assert queue.pop_due(T0 + timedelta(minutes=4)) == []
+    assert queue.pop_due(T0 + timedelta(minutes=10)) == [
+        (1, 10, T0 + timedelta(minutes=5)), (2, 11, T0 + timedelta(minutes=10)),
+    ]
+    assert len(queue) == 0
+    assert queue.next_deadline() is None
+
+
+def test_replace_tickets_drops_slas_missing_from_the_reload():
+    queue = DeadlineQueue()
+    queue.set(1, 10, T0)
+    queue.set(2, 10, T0 + timedelta(minutes=1))
+    queue.set(3, 11, T0 + timedelta(minutes=2))
+
+    # Ticket 10 was closed; ticket 11's target moved
+    queue.replace_tickets([10, 11], [(3, 11, T0 + timedelta(minutes=30))])
+    assert len(queue) == 1
+    assert queue.pop_due(T0 + timedelta(minutes=29)) == []
+    assert queue.pop_due(T0 + timedelta(minutes=30)) == [(3, 11, T0 + timedelta(minutes=30))]
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self.results = list(results)
+        self.executed = []
+        self._rows = []
+
+    def execute(self, sql, *params):
+        self.executed.append(params)
+        self._rows = self.results.pop(0)
+
+    def fetchall(self):
+        return self._rows
+
+
+def test_read_changes_collects_tickets_from_events_and_slas():
+    low, high = bytes(8), (5).to_bytes(8, 'big')
+    cursor = FakeCursor([
+        [('7',), ('x',), ('9',)],
+        [(12,), (7,)],
+    ])
+    assert read_changes(cursor, low, high) == {7, 9, 12}
+    assert cursor.executed == [(low, high), (low, high)]
+
+    assert read_changes(FakeCursor([[], []]), high, high) == set()
+
+
+def test_json_list():
+    assert json_list([3, 1]) == '[3,1]'
+
+
+class FakeMonitor(SLAMonitor):
+    """SLAMonitor with the database replaced by an in-memory TicketSLAs table"""
+
+    def __init__(self, slas, server_clock):
+        super().__init__('unused', poll_seconds=0.01)
+        self.slas = slas  # sla_id -> [ticket_id, target_at, breached]
+        self.rowversions = {sla_id: i for i, sla_id in enumerate(slas, 1)}
+        self.uncommitted = set()
+        self.closed = set()
+        self.server_clock = server_clock
+        self.escalations = []
+
+    def _pending(self, ticket_ids=None):
+        return [(sla_id, ticket_id, target_at) for sla_id, (ticket_id, target_at, breached) in self.slas.items()
+                if not breached and ticket_id not in self.closed and sla_id not in self.uncommitted
+                and (ticket_ids is None or ticket_id in ticket_ids)]
+
+    def add(self, sla_id, ticket_id, target_at, rowversion, committed=True):
+        self.slas[sla_id] = [ticket_id, target_at, False]
+        self.rowversions[sla_id] = rowversion
+        if not committed:
+            self.uncommitted.add(sla_id)
+
+    def _min_active_rowversion(self):
+        return min((self.rowversions[sla_id] for sla_id in self.uncommitted),
+                   default=max(self.rowversions.values(), default=0) + 1)
+
+    async def _run_db(self, fn, *args):
+        if fn is sla_monitor.read_positions:
+            return self.server_clock(), self._min_active_rowversion().to_bytes(8, 'big')
+        if fn is sla_monitor.load_pending:
+            return self._pending()
+        if fn is sla_monitor.load_ticket_pending:
+            return self._pending(set(args[0]))
+        if fn is sla_monitor.read_changes:
+            after, before = (int.from_bytes(v, 'big') for v in args)
+            return {self.slas[sla_id][0] for sla_id, rv in self.rowversions.items() if after <= rv < before}
+        ticket_ids, = args
+        now = self.server_clock()
+        breached = 0
+        for sla_id, (ticket_id, target_at, _) in list(self.slas.items()):
+            if ticket_id in ticket_ids and target_at <= now and ticket_id not in self.closed:
+                self.slas[sla_id][2] = True
+                breached += 1
+        self.escalations.append(list(ticket_ids))
+        return breached, self._pending(set(ticket_ids))
+
+
+@pytest.mark.asyncio
+async def test_monitor_escalates_when_each_deadline_passes():
+    base = sla_monitor._utcnow()
+    monitor = FakeMonitor({
+        1: [10, base - timedelta(minutes=1), False],
+        2: [11, base + timedelta(milliseconds=150), False],
+        3: [12, base + timedelta(hours=1), False],
+    }, sla_monitor._utcnow)
+    await monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+        assert monitor.escalations == [[10]]
+        await asyncio.sleep(0.3)
+        assert monitor.escalations == [[10], [11]]
+        assert [s[2] for s in monitor.slas.values()] == [True, True, False]
+        assert monitor.queue.next_deadline() == base + timedelta(hours=1)
+    finally:
+        await monitor.stop()
+
+
+@pytest.mark.asyncio
+async def test_deadline_not_yet_reached_on_server_is_retried():
+    # The server clock lags the deadline, so the first escalation is a no-op
+    lag = [timedelta(seconds=5)]
+    base = sla_monitor._utcnow()
+    monitor = FakeMonitor({1: [10, base, False]}, lambda: sla_monitor._utcnow() - lag[0])
+    assert await monitor.escalate([(1, 10, base)]) == 0
+    assert monitor.queue.next_deadline() >= base + sla_monitor.RETRY_DELAY
+
+    lag[0] = timedelta(0)
+    assert await monitor.escalate(monitor.queue.pop_due(base + timedelta(seconds=2))) == 1
+    assert len(monitor.queue) == 0
+
+
+@pytest.mark.asyncio
+async def test_sla_committed_after_a_later_one_is_not_skipped():
+    # SLA 5 takes its id and rowversion first but commits after SLA 6
+    far = sla_monitor._utcnow() + timedelta(hours=1)
+    monitor = FakeMonitor({}, sla_monitor._utcnow)
+    await monitor.seed()
+    monitor.add(5, 10, far, rowversion=1, committed=False)
+    monitor.add(6, 11, far, rowversion=2)
+
+    await monitor.poll_changes()
+    assert len(monitor.queue) == 0
+
+    monitor.uncommitted.clear()
+    assert await monitor.poll_changes() == 2
+    assert len(monitor.queue) == 2
@@ -0,0 +1,55 @@
+import asyncio
+import base64
+import json
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from source_auth import CredentialCache
+
+
+def test_static_headers_are_built_once_per_config():
+    cache = CredentialCache()
+    config = json.dumps({'username': 'ops', 'password': 'p:w'})
+    cache.configure(1, 'http://x', 'Basic', config)
+    first = cache._credentials[1]
+    cache.configure(1, 'http://x', 'Basic', config)
+    assert cache._credentials[1] is first
+    assert first.headers == {'Authorization': 'Basic ' + base64.b64encode(b'ops:p:w').decode()}
+
+    cache.configure(2, 'http://x', 'ApiKey', json.dumps({'header_name': 'X-Key', 'key': 'k'}))
+    assert asyncio.run(cache.headers(None, 2)) == {'X-Key': 'k'}
+
+
+@pytest.mark.asyncio
+async def test_oauth_token_is_cached_shared_and_invalidated():
+    issued = []
+
+    async def token(request):
+        issued.append(1)
+        await asyncio.sleep(0.05)
+        return web.json_response({'access_token': f'tok{len(issued)}', 'expires_in': 3600})
+
+    app = web.Application()
+    app.router.add_post('/oauth/token', token)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    url = f'http://127.0.0.1:{runner.addresses[0][1]}'
+    try:
+        cache = CredentialCache()
+        cache.configure(1, url, 'OAuth2', json.dumps({'token_url': '/oauth/token', 'client_id': 'c', 'client_secret': 's'}))
+        async with aiohttp.ClientSession() as session:
+            headers = await asyncio.gather(*(cache.headers(session, 1) for _ in range(5)))
+            assert len(issued) == 1
+            assert all(h == {'Authorization': 'Bearer tok1'} for h in headers)
+
+            assert await cache.headers(session, 1) == {'Authorization': 'Bearer tok1'}
+            assert len(issued) == 1
+
+            cache.invalidate(1)
+            assert await cache.headers(session, 1) == {'Authorization': 'Bearer tok2'}
+    finally:
+        await runner.cleanup()